@@ -0,0 +1,428 @@
+# Simple IPTV thing - benchmarks
+# github.com/tugbaot/simple-iptv
+#
+# Times the hot paths on synthetic playlists and records seconds (best of
+# --repeat) and peak Python memory (tracemalloc) per benchmark and size.
+#
+#   python bench/bench.py                                  # 1k, 10k, 200k channels
+#   python bench/bench.py --sizes 1000,1000000 --only parse
+#   python bench/bench.py --save base.json                 # keep a baseline
+#   python bench/bench.py --baseline base.json --threshold 20
+#
+# With --baseline the exit status is 1 when anything got slower (or
+# bigger) than the baseline by more than the threshold.
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from iptv.diff import diff_playlist
+from iptv.diskstore import DiskStore
+from iptv.export import export
+from iptv.m3u import Channel, parse_m3u, write_m3u
+from iptv.state import StateStore, write_snapshot
+from iptv.xtream import ResponseCache, XtreamClient
+
+GROUPS = ["UK | News", "UK | Sport", "UK | Entertainment", "US | Movies", "US | Sports",
+          "DE | Kids", "FR | Général", "ES | Deportes", "IT | Cinema", "NL | Nieuws"]
+WORDS = ["BBC", "Sky", "Sport", "News", "Cinema", "Kids", "Arena", "Premier", "Discovery",
+         "History", "Action", "Comedy", "Drama", "Music", "Live", "Euro", "World", "One"]
+XTREAM_URL = "http://bench.invalid"
+
+
+# ------- Fixtures ------------------------------
+def make_channels(n):
+    # deterministic for a given n, shaped like a big Xtream export
+    rnd = random.Random(n)
+    channels = []
+    for i in range(n):
+        group = GROUPS[i * len(GROUPS) // n]
+        name = f"{group[:2]}: {rnd.choice(WORDS)} {rnd.choice(WORDS)} {i} {rnd.choice(('HD', 'FHD', 'SD', ''))}".strip()
+        attrs = {"tvg-id": f"{name.split()[1].lower()}{i % 5000}.{group[:2].lower()}",
+                 "tvg-name": name, "tvg-logo": f"http://logos.example/{i % 2000}.png",
+                 "group-title": group}
+        channels.append(Channel(name, f"http://provider.example:8080/live/user/pass/{i}.ts", -1, attrs))
+    return channels
+
+
+class Fixtures:
+    # files for one size, written once into a temp directory
+    def __init__(self, root, n):
+        self.n = n
+        self.dir = Path(root) / str(n)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.channels = make_channels(n)
+        self.m3u = self.dir / "playlist.m3u"
+        with self.m3u.open("w", encoding="utf-8") as f:
+            write_m3u(f, self.channels)
+        self.state = self.dir / "state.json"
+        write_snapshot(self.state, ([ch.name, ch.url, i % 100 == 0, ch.attrs]
+                                    for i, ch in enumerate(self.channels)), {"show_favourites": False})
+        self.xtream = ResponseCache(self.dir / "xtream", 1 << 40)
+        self._write_xtream()
+
+    def _write_xtream(self):
+        # player_api.php responses as the client caches them, no server needed
+        client = XtreamClient(XTREAM_URL, "user", "pass", self.xtream)
+        categories = [{"category_id": str(i), "category_name": g} for i, g in enumerate(GROUPS)]
+        streams = {c["category_id"]: [] for c in categories}
+        for i, ch in enumerate(self.channels):
+            streams[str(GROUPS.index(ch.attrs["group-title"]))].append(
+                {"num": i + 1, "name": ch.name, "stream_id": i, "stream_icon": ch.attrs["tvg-logo"],
+                 "epg_channel_id": ch.attrs["tvg-id"], "category_id": str(i)})
+        responses = [(client.cache_key("get_live_categories"), categories)]
+        responses += [(client.cache_key("get_live_streams", category_id=cid), s) for cid, s in streams.items()]
+        for key, data in responses:
+            writer = self.xtream.writer(key)
+            writer.write(json.dumps(data).encode())
+            writer.commit()
+
+
+# ------- The app -------------------------------
+_app = None
+
+
+def app_module():
+    # simple-iptv.py, imported once; it chdirs to the repo and reads config.txt
+    global _app
+    if _app is None:
+        from PySide6.QtWidgets import QApplication
+        cwd = os.getcwd()
+        spec = importlib.util.spec_from_file_location("simple_iptv", ROOT / "simple-iptv.py")
+        _app = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_app)
+        os.chdir(cwd)
+        _app.qapp = QApplication.instance() or QApplication([])
+    return _app
+
+
+def filled_model(fx):
+    app = app_module()
+    model = app.PlaylistModel()
+    for i in range(0, fx.n, 5000):
+        model.append_items(fx.channels[i:i + 5000])
+    for rid in range(0, fx.n, 100):
+        model._store.set_fav(rid, True)
+    return model
+
+
+# ------- Benchmarks ----------------------------
+# Each takes the Fixtures and returns run() to time, or (prepare, run)
+# where prepare() makes a fresh argument for run() outside the timing.
+BENCHMARKS = []
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS.append((name, fn))
+        return fn
+    return register
+
+
+@benchmark("parse_m3u")
+def bench_parse(fx):
+    def run():
+        with fx.m3u.open("rb") as f:
+            for _ in parse_m3u(f):
+                pass
+    return run
+
+
+@benchmark("xtream_load")
+def bench_xtream(fx):
+    def run():
+        client = XtreamClient(XTREAM_URL, "user", "pass", fx.xtream, ttl=1 << 40)
+        for _ in client.load_live():
+            pass
+    return run
+
+
+@benchmark("load_state")
+def bench_load_state(fx):
+    return lambda: StateStore(fx.state).load()
+
+
+@benchmark("append_items")
+def bench_append(fx):
+    app = app_module()
+
+    def run(model):
+        for i in range(0, fx.n, 5000):  # the loaders' batch size
+            model.append_items(fx.channels[i:i + 5000])
+    return app.PlaylistModel, run
+
+
+@benchmark("filter_favourites")
+def bench_favourites(fx):
+    app = app_module()
+    model = filled_model(fx)
+    proxy = app.FavouriteFilterProxy()
+    proxy.setSourceModel(model)
+
+    def run():
+        proxy.show_only_favourites = True
+        proxy.show_only_favourites = False
+    return run
+
+
+@benchmark("filter_search")
+def bench_search(fx):
+    app = app_module()
+    model = filled_model(fx)
+    proxy = app.FavouriteFilterProxy()
+    proxy.setSourceModel(model)
+    index = model.search_index
+    index.catch_up()  # built by the search worker while loading
+
+    def run():
+        proxy.set_search("sport", index.search("sport"))
+        proxy.set_search("", None)
+    return run
+
+
+@benchmark("filter_query")
+def bench_query(fx):
+    # a structured query from the search box, through the proxy
+    app = app_module()
+    model = filled_model(fx)
+    proxy = app.FavouriteFilterProxy()
+    proxy.setSourceModel(model)
+    index = model.query_index
+    index.catch_up()
+    text = "group:sport country:uk -sd (bbc | sky) -fav:yes name:/hd$/"
+
+    def run():
+        proxy.set_search(text, index.search(text))
+        proxy.set_search("", None)
+    return run
+
+
+@benchmark("paint")
+def bench_paint(fx):
+    # full viewport repaints at 20 scroll positions
+    app = app_module()
+    from PySide6.QtWidgets import QListView
+    model = filled_model(fx)
+    proxy = app.FavouriteFilterProxy()
+    proxy.setSourceModel(model)
+    view = QListView()
+    view.setUniformItemSizes(True)
+    view.setModel(proxy)
+    view.setItemDelegate(app.PlaylistDelegate(app.ROW_HEIGHT, app.qta.icon(app.PLAYLIST_ICON), view))
+    view.resize(480, 800)
+    view.show()
+    app.qapp.processEvents()
+
+    def run():
+        bar = view.verticalScrollBar()
+        for i in range(20):
+            bar.setValue(bar.maximum() * i // 19)
+            view.viewport().grab()
+    return run
+
+
+@benchmark("drop_move")
+def bench_drop(fx):
+    # drag 100 scattered rows to the middle, as the list view would
+    app = app_module()
+    from PySide6.QtCore import QModelIndex, Qt
+    model = filled_model(fx)
+    rows = range(0, fx.n, max(1, fx.n // 100))
+
+    def run():
+        mime = model.mimeData([model.index(r) for r in rows])
+        model.dropMimeData(mime, Qt.MoveAction, fx.n // 2, 0, QModelIndex())
+    return run
+
+
+@benchmark("save_m3u")
+def bench_save_m3u(fx):
+    model = filled_model(fx)
+    path = fx.dir / "saved.m3u"
+
+    def run():
+        with path.open("w", encoding="utf-8") as f:
+            write_m3u(f, model.iter_channels())
+    return run
+
+
+@benchmark("save_json")
+def bench_save_json(fx):
+    model = filled_model(fx)
+    path = fx.dir / "saved.json"
+    return lambda: write_snapshot(path, model.iter_rows(), {"show_favourites": False})
+
+
+def export_benchmark(suffix):
+    # what the Save button's worker does: copy the store, write it out
+    @benchmark("export_" + suffix.replace(".", "_"))
+    def bench_export(fx):
+        model = filled_model(fx)
+        path = fx.dir / f"export.{suffix}"
+        return lambda: export(path, model.snapshot().channels())
+
+
+for suffix in ("m3u", "m3u.gz", "jsonl", "xspf"):
+    export_benchmark(suffix)
+
+
+def disk_store(fx):
+    # the fixture list in a DiskStore file, flushed as the app leaves it
+    path = fx.dir / "store.db"
+    if not path.exists():
+        store = DiskStore(path)
+        for i in range(0, fx.n, 5000):
+            store.append(fx.channels[i:i + 5000])
+        for rid in range(0, fx.n, 100):
+            store.set_fav(rid, True)
+        store.flush()
+        store.close()
+    return path
+
+
+@benchmark("disk_open")
+def bench_disk_open(fx):
+    # startup with disk_store set: everything up to a row count
+    path = disk_store(fx)
+
+    def run():
+        store = DiskStore(path)
+        store.close()
+        return len(store)
+    return run
+
+
+@benchmark("disk_window")
+def bench_disk_window(fx):
+    # 40 visible rows at 20 scroll positions, from a cold page cache
+    path = disk_store(fx)
+
+    def prepare():
+        return DiskStore(path)
+
+    def run(store):
+        for i in range(20):
+            first = (len(store) - 40) * i // 19
+            for rid in store.order[first:first + 40]:
+                store.name(rid), store.url(rid), store.logo(rid)
+        store.close()
+    return prepare, run
+
+
+@benchmark("refresh_diff")
+def bench_diff(fx):
+    # a refresh where 1% went away, 1% is new and 1% was renamed
+    model = filled_model(fx)
+    store = model.snapshot()
+    fresh = [ch._replace(name=ch.name + " +") if i % 100 == 50 else ch
+             for i, ch in enumerate(fx.channels) if i % 100 != 0]
+    fresh += make_channels(fx.n // 100 + 1)[:fx.n // 100]
+    return lambda: diff_playlist(store, fresh)
+
+
+# ------- Runner --------------------------------
+def measure(fn, fx, repeat, memory):
+    made = fn(fx)
+    prepare, run = made if isinstance(made, tuple) else (None, made)
+    best = None
+    for _ in range(repeat):
+        arg = prepare() if prepare else None
+        gc.collect()
+        start = perf_counter()
+        run(arg) if prepare else run()
+        took = perf_counter() - start
+        best = took if best is None else min(best, took)
+    peak = None
+    if memory:
+        arg = prepare() if prepare else None
+        gc.collect()
+        tracemalloc.start()
+        run(arg) if prepare else run()
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return best, peak
+
+
+def compare(results, baseline, threshold, min_seconds):
+    # -> list of regression messages
+    failures = []
+    for key, now in results.items():
+        then = baseline.get(key)
+        if then is None:
+            continue
+        limit = 1 + threshold / 100
+        if now["seconds"] > then["seconds"] * limit and now["seconds"] > min_seconds:
+            failures.append(f"{key}: {then['seconds']:.4f}s -> {now['seconds']:.4f}s")
+        if now.get("peak_mb") and then.get("peak_mb") and now["peak_mb"] > then["peak_mb"] * limit \
+                and now["peak_mb"] - then["peak_mb"] > 1:
+            failures.append(f"{key}: {then['peak_mb']:.1f} MB -> {now['peak_mb']:.1f} MB")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the playlist hot paths on synthetic playlists.")
+    parser.add_argument("--sizes", default="1000,10000,200000",
+                        help="comma separated channel counts (default 1000,10000,200000)")
+    parser.add_argument("--only", metavar="NAME", action="append",
+                        help="run benchmarks whose name contains NAME (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the best counts")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare with earlier --save results")
+    parser.add_argument("--threshold", type=float, default=25,
+                        help="percent slower/bigger than the baseline that fails (default 25)")
+    parser.add_argument("--min-seconds", type=float, default=0.005,
+                        help="timings under this never fail, they are mostly noise (default 0.005)")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    chosen = [(name, fn) for name, fn in BENCHMARKS
+              if not args.only or any(part in name for part in args.only)]
+    if args.list:
+        print("\n".join(name for name, _ in chosen))
+        return 0
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="iptv-bench-") as tmp:
+        for n in sizes:
+            fx = Fixtures(tmp, n)
+            for name, fn in chosen:
+                seconds, peak = measure(fn, fx, args.repeat, not args.no_memory)
+                key = f"{name}/{n}"
+                results[key] = {"seconds": seconds, "peak_mb": peak}
+                memory = f"{peak:9.1f} MB" if peak is not None else ""
+                print(f"{key:<28}{seconds * 1000:12.2f} ms{memory}", flush=True)
+            del fx
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "results": results}, f, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        failures = compare(results, baseline, args.threshold, args.min_seconds)
+        if failures:
+            print(f"\nSlower than the baseline by more than {args.threshold:g}%:")
+            print("\n".join(f"  {line}" for line in failures))
+            return 1
+        print(f"\nWithin {args.threshold:g}% of the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
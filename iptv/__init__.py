@@ -0,0 +1,2 @@
+# Simple IPTV thing - Qt-free core
+# github.com/tugbaot/simple-iptv
@@ -0,0 +1,8 @@
+# Simple IPTV thing - python -m iptv
+# github.com/tugbaot/simple-iptv
+
+import sys
+
+from iptv.cli import main
+
+sys.exit(main())
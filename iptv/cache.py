@@ -0,0 +1,168 @@
+# Simple IPTV thing - on-disk playlist cache
+# github.com/tugbaot/simple-iptv
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+INDEX_FILE = "index.json"
+
+
+# ------- Cache ---------------------------------
+class PlaylistCache:
+    # Remote playlist bodies stored gzipped, keyed by URL, together with the
+    # ETag / Last-Modified validators needed to revalidate them. Entries are
+    # evicted least recently used first once the total exceeds max_bytes.
+
+    SUFFIX = ".m3u.gz"
+
+    def __init__(self, directory, max_bytes=200 * 2**20):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = {}
+        try:
+            with (self.directory / INDEX_FILE).open(encoding="utf-8") as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.directory / f"{key}{self.SUFFIX}"
+
+    def lookup(self, url):
+        key = self.key(url)
+        with self._lock:
+            entry = self._index.get(key)
+        if entry and self._path(key).exists():
+            return entry
+        return None
+
+    def fresh(self, url, ttl):
+        # the entry if it was downloaded less than ttl seconds ago
+        entry = self.lookup(url)
+        if entry and time.time() - entry.get("fetched", 0) < ttl:
+            return entry
+        return None
+
+    def validators(self, url):
+        entry = self.lookup(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def open(self, url):
+        # decompressed binary stream of the cached body
+        self.touch(url)
+        return gzip.open(self._path(self.key(url)), "rb")
+
+    def touch(self, url):
+        key = self.key(url)
+        with self._lock:
+            if key in self._index:
+                self._index[key]["used"] = time.time()
+                self._save_index()
+
+    def writer(self, url):
+        return CacheWriter(self, url)
+
+    def _commit(self, url, tmp, length, digest, etag, last_modified):
+        # returns True when the body differs from the one it replaces
+        key = self.key(url)
+        path = self._path(key)
+        os.replace(tmp, path)
+        with self._lock:
+            old = self._index.get(key)
+            self._index[key] = {
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "length": length,
+                "digest": digest,
+                "size": path.stat().st_size,
+                "fetched": time.time(),
+                "used": time.time(),
+            }
+            self._evict(keep=key)
+            self._save_index()
+        return old is None or old.get("digest") != digest
+
+    def _evict(self, keep=None):
+        total = sum(e["size"] for e in self._index.values())
+        for key, entry in sorted(self._index.items(), key=lambda kv: kv[1]["used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= entry["size"]
+            del self._index[key]
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+
+    def _save_index(self):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, self.directory / INDEX_FILE)
+
+
+class CacheWriter:
+    # Compresses a body into a temp file as it streams past; commit() swaps
+    # it into the cache, discard() drops it (cancelled or failed download)
+
+    def __init__(self, cache, url):
+        cache.directory.mkdir(parents=True, exist_ok=True)
+        self.cache = cache
+        self.url = url
+        fd, self.tmp = tempfile.mkstemp(dir=cache.directory, suffix=".tmp")
+        self._raw = os.fdopen(fd, "wb")
+        self._gz = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=1)
+        self._sha = hashlib.sha1()
+        self.length = 0
+
+    def write(self, chunk):
+        self.length += len(chunk)
+        self._sha.update(chunk)
+        self._gz.write(chunk)
+
+    def commit(self, etag=None, last_modified=None):
+        self._gz.close()
+        self._raw.close()
+        return self.cache._commit(self.url, self.tmp, self.length, self._sha.hexdigest(),
+                                  etag, last_modified)
+
+    def discard(self):
+        self._gz.close()
+        self._raw.close()
+        try:
+            os.unlink(self.tmp)
+        except OSError:
+            pass
+
+
+# ------- HTTP ----------------------------------
+def conditional_get(url, cache=None, timeout=15):
+    # Streaming GET that asks for a compressed transfer and, when the URL is
+    # cached, sends its validators. 304 means the cached copy is current.
+    import requests  # slow to import, only needed once something is fetched
+    headers = {"Accept-Encoding": "gzip, deflate"}
+    if cache is not None:
+        headers.update(cache.validators(url))
+    r = requests.get(url, headers=headers, timeout=timeout, stream=True)
+    r.raise_for_status()
+    return r
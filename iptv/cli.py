@@ -0,0 +1,186 @@
+# Simple IPTV thing - command line, no Qt
+# github.com/tugbaot/simple-iptv
+#
+#   python -m iptv big.m3u.gz -o uk.m3u --group "^UK" --exclude "\bSD\b"
+#   python -m iptv a.m3u https://host/b.m3u --xtream URL USER PASS --dedup -o all.m3u.gz
+#   python -m iptv playlist.json --favourites -o favs.m3u
+
+import argparse
+import gzip
+import io
+import json
+import re
+import sys
+from itertools import islice
+from time import perf_counter
+
+from iptv.export import export
+from iptv.m3u import CHUNK_SIZE, Channel, parse_m3u, write_m3u
+from iptv.sources import SOURCE_ATTR, Deduper
+from iptv.state import write_snapshot
+from iptv.xtream import XtreamClient, XtreamError
+
+BATCH = 5000
+
+
+# ------- Inputs --------------------------------
+def maybe_gunzip(stream):
+    # gzipped or not, told apart by the magic bytes
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream, CHUNK_SIZE)
+    if stream.peek(2)[:2] == b"\x1f\x8b":
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def read_input(source):
+    # yields (Channel, favourite) from an M3U file, URL or '-' (stdin), or
+    # from a saved .json state file (read whole, it is a single document)
+    if source == "-":
+        yield from ((ch, False) for ch in parse_m3u(maybe_gunzip(sys.stdin.buffer)))
+    elif source.startswith(("http://", "https://")):
+        from iptv.cache import conditional_get
+        with conditional_get(source, timeout=60) as r:
+            r.raw.decode_content = True
+            r.raw.auto_close = False  # else a short body reads as closed under the buffer
+            yield from ((ch, False) for ch in parse_m3u(maybe_gunzip(r.raw)))
+    elif source.lower().endswith(".json"):
+        with open(source, encoding="utf-8") as f:
+            data = json.load(f)
+        rows = data if isinstance(data, list) else data.get("playlist", [])
+        for row in rows:
+            fav = len(row) > 2 and bool(row[2])
+            attrs = row[3] if len(row) > 3 else None
+            duration, extras = (row[4], tuple(row[5])) if len(row) > 5 else (-1, ())
+            yield Channel(row[0], row[1], duration, attrs or None, extras), fav
+    else:
+        with open(source, "rb") as f:
+            yield from ((ch, False) for ch in parse_m3u(maybe_gunzip(f)))
+
+
+def read_xtream(url, username, password, connections):
+    client = XtreamClient(url, username, password, connections=connections)
+    try:
+        client.authenticate()
+        for channels in client.load_live():
+            yield from ((ch, False) for ch in channels)
+    finally:
+        client.close()
+
+
+# ------- Pipeline ------------------------------
+class Counts:
+    def __init__(self):
+        self.read = 0
+        self.filtered = 0
+        self.duplicates = 0
+        self.written = 0
+
+
+def matcher(args):
+    name = re.compile(args.name, re.I) if args.name else None
+    group = re.compile(args.group, re.I) if args.group else None
+    exclude = re.compile(args.exclude, re.I) if args.exclude else None
+
+    def accepts(channel, fav):
+        if args.favourites and not fav:
+            return False
+        if name is not None and not name.search(channel.name):
+            return False
+        if group is not None and not group.search(channel.group or ""):
+            return False
+        return exclude is None or not exclude.search(channel.name)
+    return accepts
+
+
+def pipeline(inputs, accepts, dedup, counts):
+    # (source name, iterator of (Channel, fav)) -> filtered, de-duplicated
+    # (Channel, fav), one batch in memory at a time
+    for source, items in inputs:
+        items = iter(items)
+        while True:
+            batch = list(islice(items, BATCH))
+            if not batch:
+                break
+            counts.read += len(batch)
+            kept = [(ch, fav) for ch, fav in batch if accepts(ch, fav)]
+            counts.filtered += len(batch) - len(kept)
+            if dedup is not None and kept:
+                favs = {id(ch) for ch, fav in kept if fav}
+                channels, dropped = dedup.filter(source, [ch for ch, _ in kept], tagged=False)
+                counts.duplicates += dropped
+                kept = [(ch, id(ch) in favs) for ch in channels]
+            yield from kept
+
+
+def write_output(path, items, counts):
+    def channels():
+        for ch, _ in items:
+            counts.written += 1
+            yield ch
+
+    if path.lower().endswith(".json"):
+        def rows():
+            for ch, fav in items:
+                counts.written += 1
+                if ch.duration != -1 or ch.extras:
+                    yield [ch.name, ch.url, fav, ch.attrs or {}, ch.duration, list(ch.extras)]
+                else:
+                    yield [ch.name, ch.url, fav, ch.attrs] if ch.attrs else [ch.name, ch.url, fav]
+        write_snapshot(path, rows(), {})
+    elif path == "-":
+        write_m3u(sys.stdout, channels(), skip=(SOURCE_ATTR,))
+    else:
+        export(path, channels(), skip=(SOURCE_ATTR,))
+
+
+# ------- Entry point ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m iptv",
+        description="Convert, filter and merge IPTV playlists. Inputs are read "
+                    "as they stream in, so memory stays flat however long they are.")
+    parser.add_argument("inputs", nargs="*", metavar="INPUT",
+                        help="M3U file or URL (gzipped is fine), '-' for stdin, or a saved .json playlist")
+    parser.add_argument("-o", "--output", default="-",
+                        help="M3U (.m3u, .m3u8), JSON Lines (.jsonl) or XSPF (.xspf), add .gz to "
+                             "compress, or a .json playlist; default: M3U on stdout")
+    parser.add_argument("--xtream", nargs=3, action="append", default=[],
+                        metavar=("URL", "USER", "PASS"), help="also read an Xtream account's live channels")
+    parser.add_argument("--connections", type=int, default=2,
+                        help="connections per Xtream account (default 2)")
+    parser.add_argument("--name", metavar="REGEX", help="keep channels whose name matches")
+    parser.add_argument("--group", metavar="REGEX", help="keep channels whose group matches")
+    parser.add_argument("--exclude", metavar="REGEX", help="drop channels whose name matches")
+    parser.add_argument("--favourites", action="store_true", help="keep favourites only (.json inputs)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="drop repeated streams, and tvg-ids another input already had")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no summary on stderr")
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.xtream:
+        parser.error("nothing to read, give an INPUT or --xtream")
+
+    inputs = [(source, read_input(source)) for source in args.inputs]
+    inputs += [(url, read_xtream(url, user, password, args.connections))
+               for url, user, password in args.xtream]
+    try:
+        accepts = matcher(args)
+    except re.error as e:
+        parser.error(f"bad regex: {e}")
+    counts = Counts()
+    start = perf_counter()
+    try:
+        items = pipeline(inputs, accepts, Deduper() if args.dedup else None, counts)
+        write_output(args.output, items, counts)
+    except BrokenPipeError:
+        sys.stdout = None  # e.g. piped into head, nothing left to flush to
+        return 0
+    except (OSError, ValueError, XtreamError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    if not args.quiet:
+        print(f"{counts.read:,} read, {counts.filtered:,} filtered out, {counts.duplicates:,} duplicates, "
+              f"{counts.written:,} written in {perf_counter() - start:.2f}s", file=sys.stderr)
+    return 0
@@ -0,0 +1,140 @@
+# Simple IPTV thing - playlist refresh diff
+# github.com/tugbaot/simple-iptv
+
+import re
+from collections import deque
+
+_XTREAM_LIVE = re.compile(r"/live/[^/]+/[^/]+/(\d+)(?:\.\w+)?$")
+_URL = re.compile(r"([A-Za-z][\w+.-]*)://([^/?#]*)([^#]*)")
+_DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+
+
+# ------- Channel identity ----------------------
+def normalise_url(url):
+    # scheme and host lower-cased, default port and fragment dropped
+    # (a regex rather than urlsplit, this runs for every row)
+    url = url.strip()
+    m = _URL.match(url)
+    if not m:
+        return url
+    scheme, netloc, rest = m.groups()
+    scheme = scheme.lower()
+    user, at, host = netloc.rpartition("@")
+    host = host.lower()
+    port = _DEFAULT_PORTS.get(scheme)
+    if port and host.endswith(port):
+        host = host[:-len(port)]
+    return f"{scheme}://{user}{at}{host}{rest}"
+
+
+def url_key(url, tvg_id):
+    return normalise_url(url)
+
+
+def stream_key(url, tvg_id):
+    # Xtream live URLs carry the login, the stream id survives a new password
+    m = _XTREAM_LIVE.search(url)
+    return m.group(1) if m else None
+
+
+def tvg_key(url, tvg_id):
+    return tvg_id or None
+
+
+# tried in turn, each only on the channels the earlier ones left unmatched
+KEYS = (url_key, stream_key, tvg_key)
+
+
+# ------- Diff ----------------------------------
+class PlaylistDiff:
+    # What turns the store's rows into a freshly loaded playlist while
+    # keeping the user's order and favourites:
+    #   removed  - rids with no counterpart in the new list, in row order
+    #              when diffed; rids, as the user may move rows meanwhile
+    #   updated  - (rid, Channel) for kept records whose details changed
+    #   added    - (anchor rid, [Channel, ...]): new channels that follow
+    #              `anchor` in the new list, None = at the top
+
+    def __init__(self):
+        self.removed = []
+        self.updated = []
+        self.added = []
+
+    @property
+    def added_count(self):
+        return sum(len(channels) for _, channels in self.added)
+
+    def __bool__(self):
+        return bool(self.removed or self.updated or self.added)
+
+    def summary(self):
+        return f"{self.added_count} added, {len(self.removed)} removed, {len(self.updated)} changed"
+
+
+def _same(store, rid, ch):
+    if store.names[rid] != ch.name or store.url(rid) != ch.url:
+        return False
+    duration, _, extras = store.sparse.get(rid) or (-1, None, ())
+    return (duration == ch.duration and tuple(extras) == tuple(ch.extras)
+            and store.attrs(rid) == (ch.attrs or {}))
+
+
+def diff_playlist(store, channels):
+    # Matches each new Channel to at most one existing record, first by
+    # normalised URL, then Xtream stream id, then tvg-id. Duplicate keys
+    # pair up in row order. O(rows + channels) per key.
+    old = [(rid, store.url(rid), store.tvg_ids[rid]) for rid in store.order]
+    matched = [None] * len(channels)   # new index -> rid
+    left = range(len(channels))
+    for key in KEYS:
+        if not old or not left:
+            break
+        index = {}   # key -> rid, or a list of rids (last = first in row order)
+        for rid, url, tvg_id in reversed(old):
+            k = key(url, tvg_id)
+            if k is not None:
+                prev = index.get(k)
+                if prev is None:
+                    index[k] = rid
+                elif type(prev) is list:
+                    prev.append(rid)
+                else:
+                    index[k] = [prev, rid]
+        rest = []
+        kept = set()
+        for i in left:
+            ch = channels[i]
+            k = key(ch.url, ch.tvg_id)
+            rid = index.get(k)
+            if rid is None:
+                rest.append(i)
+                continue
+            if type(rid) is list:
+                rids = rid
+                rid = rids.pop()
+                if not rids:
+                    del index[k]
+            else:
+                del index[k]
+            matched[i] = rid
+            kept.add(rid)
+        left = rest
+        if kept:
+            old = [o for o in old if o[0] not in kept]
+
+    diff = PlaylistDiff()
+    gone = {o[0] for o in old}
+    diff.removed = [rid for rid in store.order if rid in gone]
+    anchor = None
+    run = None
+    for ch, rid in zip(channels, matched):
+        if rid is None:
+            if run is None:
+                run = []
+                diff.added.append((anchor, run))
+            run.append(ch)
+        else:
+            anchor, run = rid, None
+            if not _same(store, rid, ch):
+                diff.updated.append((rid, ch))
+    return diff
@@ -0,0 +1,478 @@
+# Simple IPTV thing - channel storage on disk, for lists larger than memory
+# github.com/tugbaot/simple-iptv
+
+import copy
+import json
+import sqlite3
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+from iptv.m3u import Channel
+from iptv.search import normalise
+from iptv.sources import SOURCE_ATTR
+from iptv.store import ChannelStore, StringTable
+
+PAGE_BITS = 8            # 256 records per page
+CACHE_PAGES = 64         # pages kept, 16k records
+READ_AHEAD = 2           # extra pages read after a miss
+COMMIT_ROWS = 1000       # replace() commits after this many
+
+_EMPTY = ("", "", -1, None, ())
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    rid INTEGER PRIMARY KEY, name TEXT, norm TEXT, url TEXT, grp INTEGER,
+    fav INTEGER, duration INTEGER, attrs TEXT, extras TEXT);
+CREATE INDEX IF NOT EXISTS channels_fav ON channels (rid) WHERE fav;
+CREATE TABLE IF NOT EXISTS groups (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+"""
+
+
+def connect(path):
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode = WAL")   # readers on other threads don't block the GUI
+    db.execute("PRAGMA synchronous = NORMAL")
+    return db
+
+
+class _Column:
+    # store.names[rid] and friends, read through the page cache
+    def __init__(self, store, field):
+        self._store = store
+        self._field = field
+
+    def __getitem__(self, rid):
+        return self._store._record(rid)[self._field]
+
+    def __len__(self):
+        return self._store._count
+
+
+class _AttrColumn(_Column):
+    def __getitem__(self, rid):
+        attrs = self._store._record(rid)[3]
+        return attrs.get(self._field) if attrs else None
+
+
+class _Sparse:
+    # store.sparse.get(rid) for iptv.diff: (duration, attrs, extras)
+    def __init__(self, store):
+        self._store = store
+
+    def get(self, rid, default=None):
+        _, _, duration, attrs, extras = self._store._record(rid)
+        if duration == -1 and not extras:
+            return default
+        return duration, attrs, extras
+
+
+# ------- Store ---------------------------------
+class DiskStore(ChannelStore):
+    # ChannelStore with the channels in a SQLite file. Names, URLs and
+    # attributes are read a page of records at a time through a small LRU
+    # cache, reading ahead on a miss, so memory stays flat however long
+    # the list is. What stays in memory is a few bytes per channel: the
+    # row order, favourite and health flags and the group id, so the row
+    # count, reordering, favourites and the group view need no queries.
+    #
+    # The order and group ids are written back by flush(); a file not
+    # flushed since its last append or removal has them rebuilt on open.
+    # Copies open their own connection on first use, so they can be read
+    # on another thread.
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._conn = None
+        self._pages = OrderedDict()
+        self._uncommitted = 0
+        self.names = _Column(self, 0)
+        self.tvg_ids = _AttrColumn(self, "tvg-id")
+        self.tvg_names = _AttrColumn(self, "tvg-name")
+        self.sparse = _Sparse(self)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.db.executescript(SCHEMA)
+        self._open()
+
+    @property
+    def db(self):
+        if self._conn is None:
+            self._conn = connect(self.path)
+        return self._conn
+
+    def _meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def _set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def _open(self):
+        db = self.db
+        self.groups = StringTable()
+        for gid, name in db.execute("SELECT id, name FROM groups ORDER BY id"):
+            self.groups.strings.append(name)
+            self.groups._ids[name] = gid
+        last = db.execute("SELECT max(rid) FROM channels").fetchone()[0]
+        self._count = 0 if last is None else last + 1
+        order, group_id = self._meta("order"), self._meta("group_id")
+        if self._meta("clean") == 1 and self._meta("count") == self._count and order is not None:
+            self.order = array("I", order)
+            self.group_id = array("I", group_id)
+        else:
+            # appended or removed since the last flush: the saved order for
+            # the records still there, the rest after it by rid
+            alive = bytearray(self._count)
+            self.group_id = array("I", bytes(4 * self._count))
+            for rid, gid in db.execute("SELECT rid, grp FROM channels"):
+                alive[rid] = 1
+                self.group_id[rid] = gid
+            self.order = array("I", (rid for rid in array("I", order or b"")
+                                     if rid < self._count and alive[rid]))
+            for rid in self.order:
+                alive[rid] = 0
+            self.order.extend(rid for rid in range(self._count) if alive[rid])
+        self._clean = self._meta("clean") == 1
+        self._pos = None
+        self.fav = bytearray(self._count)
+        self.favs = set()
+        for rid, in db.execute("SELECT rid FROM channels WHERE fav"):
+            self.fav[rid] = 1
+            self.favs.add(rid)
+        self.health = bytearray(self._count)
+        self.dead = set()
+
+    def _dirty(self):
+        # the saved order / group ids no longer match the table
+        if self._clean:
+            self._set_meta("clean", 0)
+            self._clean = False
+
+    def _commit(self):
+        self.db.commit()
+        self._uncommitted = 0
+
+    def flush(self):
+        self._set_meta("order", self.order.tobytes())
+        self._set_meta("group_id", self.group_id.tobytes())
+        self._set_meta("count", self._count)
+        self._set_meta("clean", 1)
+        self._clean = True
+        self._commit()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def clear(self):
+        self._dirty()
+        self.db.execute("DELETE FROM channels")
+        self.db.execute("DELETE FROM groups")
+        self._commit()
+        self._pages.clear()
+        self._open()
+
+    def __len__(self):
+        return len(self.order)
+
+    def copy(self):
+        # the in-memory columns copied, the records shared through the file
+        self._commit()  # the copy reads through a connection of its own
+        new = DiskStore.__new__(DiskStore)
+        new.__dict__.update(self.__dict__)
+        new._conn = None
+        new._pages = OrderedDict()
+        for key in ("order", "group_id", "fav", "health"):
+            setattr(new, key, getattr(self, key)[:])
+        new.favs, new.dead = set(self.favs), set(self.dead)
+        new.groups = copy.copy(self.groups)
+        new._pos = None
+        new.names = _Column(new, 0)
+        new.tvg_ids = _AttrColumn(new, "tvg-id")
+        new.tvg_names = _AttrColumn(new, "tvg-name")
+        new.sparse = _Sparse(new)
+        return new
+
+    # ------- page cache -------
+    def _record(self, rid):
+        # (name, url, duration, attrs, extras) of one record
+        pages = self._pages
+        page = pages.get(rid >> PAGE_BITS)
+        if page is None:
+            page = self._load(rid >> PAGE_BITS)
+        else:
+            pages.move_to_end(rid >> PAGE_BITS)
+        return page[rid & ((1 << PAGE_BITS) - 1)]
+
+    def _load(self, first):
+        pages = self._pages
+        last = first + 1
+        while last <= first + READ_AHEAD and last not in pages:
+            last += 1
+        size = 1 << PAGE_BITS
+        loaded = {p: [_EMPTY] * size for p in range(first, last)}
+        for rid, name, url, duration, attrs, extras in self.db.execute(
+                "SELECT rid, name, url, duration, attrs, extras FROM channels WHERE rid >= ? AND rid < ?",
+                (first * size, last * size)):
+            loaded[rid >> PAGE_BITS][rid & (size - 1)] = (
+                name, url, duration, json.loads(attrs) if attrs else None,
+                tuple(json.loads(extras)) if extras else ())
+        pages.update(loaded)
+        while len(pages) > CACHE_PAGES:
+            pages.popitem(last=False)
+        return loaded[first]
+
+    def _forget(self, rid):
+        self._pages.pop(rid >> PAGE_BITS, None)
+
+    # ------- reading by rid -------
+    def name(self, rid):
+        return self._record(rid)[0]
+
+    def url(self, rid):
+        return self._record(rid)[1]
+
+    def source(self, rid):
+        attrs = self._record(rid)[3]
+        return attrs.get(SOURCE_ATTR) if attrs else None
+
+    def tvg_id(self, rid):
+        return self.tvg_ids[rid]
+
+    def logo(self, rid):
+        attrs = self._record(rid)[3]
+        return attrs.get("tvg-logo") if attrs else None
+
+    def attrs(self, rid):
+        attrs = self._record(rid)[3]
+        return dict(attrs) if attrs else {}
+
+    def channel(self, rid):
+        name, url, duration, attrs, extras = self._record(rid)
+        return Channel(name, url, duration, dict(attrs) if attrs else None, extras)
+
+    # ------- writing -------
+    def _group_id(self, name):
+        if not name:
+            return 0
+        gid = self.groups._ids.get(name)
+        if gid is None:
+            gid = self.groups.id(name)
+            self.db.execute("INSERT INTO groups VALUES (?, ?)", (gid, name))
+        return gid
+
+    def _values(self, item):
+        if isinstance(item, Channel):
+            name, url, duration, attrs, extras = item
+            is_fav = False
+        else:
+            name, url, is_fav = item[0], item[1], item[2]
+            attrs = item[3] if len(item) > 3 else None
+            duration, extras = (item[4], item[5]) if len(item) > 5 else (-1, ())
+        gid = self._group_id(attrs.get("group-title")) if attrs else 0
+        return (name, normalise(name), url, gid, 1 if is_fav else 0, duration,
+                _dumps(attrs) if attrs else None, _dumps(list(extras)) if extras else None)
+
+    def append(self, items):
+        first = self._count
+        rows = [(first + i,) + self._values(item) for i, item in enumerate(items)]
+        if not rows:
+            return 0
+        self._dirty()
+        self.db.executemany("INSERT INTO channels VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self._commit()
+        count = len(rows)
+        self._count += count
+        self._forget(first)  # a cached page may end in empty slots
+        for row in rows:
+            self.group_id.append(row[4])
+            if row[5]:
+                self.fav.append(1)
+                self.favs.add(row[0])
+            else:
+                self.fav.append(0)
+        self.health.extend(bytes(count))
+        start = len(self.order)
+        self.order.extend(range(first, first + count))
+        if self._pos is not None:
+            self._pos.extend(range(start, start + count))
+        return count
+
+    def remove_block(self, first, last):
+        rids = self.order[first:last + 1]
+        self._dirty()
+        self.db.executemany("DELETE FROM channels WHERE rid = ?", ((rid,) for rid in rids))
+        self._commit()
+        for rid in rids:
+            self.fav[rid] = 0
+            self.favs.discard(rid)
+            self.group_id[rid] = 0
+            self.set_health(rid, self.UNCHECKED)
+        self._pages.clear()
+        del self.order[first:last + 1]
+        self._pos = None
+
+    def compact(self):
+        # removed records are gone from the file, what stays behind is a
+        # few bytes of fav/health/group per rid: not worth renumbering
+        return None
+
+    def replace(self, rid, channel):
+        if channel.url != self.url(rid):
+            self.set_health(rid, self.UNCHECKED)  # checked a different stream
+        name, norm, url, gid, _, duration, attrs, extras = self._values(channel)
+        self._dirty()
+        self.db.execute("UPDATE channels SET name = ?, norm = ?, url = ?, grp = ?, duration = ?, "
+                        "attrs = ?, extras = ? WHERE rid = ?",
+                        (name, norm, url, gid, duration, attrs, extras, rid))
+        self.group_id[rid] = gid
+        self._forget(rid)
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_ROWS:
+            self._commit()
+
+    def set_fav(self, rid, value):
+        super().set_fav(rid, value)
+        self.db.execute("UPDATE channels SET fav = ? WHERE rid = ?", (1 if value else 0, rid))
+        self._commit()
+
+    def set_name(self, rid, name):
+        self.db.execute("UPDATE channels SET name = ?, norm = ? WHERE rid = ?", (name, normalise(name), rid))
+        self._commit()
+        self._forget(rid)
+
+    def scan(self, start, stop):
+        # for the query index on the search thread, so through a
+        # connection of its own
+        groups = self.groups.strings
+        db = connect(self.path)
+        try:
+            for rid, gid, source, tvg_id, country in db.execute(
+                    "SELECT rid, grp, json_extract(attrs, ?), json_extract(attrs, '$.\"tvg-id\"'), "
+                    "json_extract(attrs, '$.\"tvg-country\"') FROM channels WHERE rid >= ? AND rid < ?",
+                    (f'$."{SOURCE_ATTR}"', start, stop)):
+                yield rid, groups[gid], source, tvg_id, country
+        finally:
+            db.close()
+
+    # ------- iterating in row order -------
+    def rows(self):
+        for rid in self.order:
+            name, url, duration, attrs, extras = self._record(rid)
+            row = [name, url, self.fav[rid] != 0]
+            if duration != -1 or extras:
+                row += [dict(attrs) if attrs else {}, duration, list(extras)]
+            elif attrs:
+                row.append(dict(attrs))
+            yield row
+
+
+# ------- Search --------------------------------
+class DiskSearch:
+    # SearchIndex's interface over the normalised names in the file: a
+    # substring scan in SQLite rather than trigrams held in memory. Used
+    # from the search thread, with a connection of its own.
+
+    def __init__(self, store):
+        self.path = store.path
+        self._conn = None
+        self._pattern = None   # what matches() in SQL tests names against
+
+    @property
+    def db(self):
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.create_function("matches", 1, self._matches)
+        return self._conn
+
+    def _matches(self, name):
+        return self._pattern.search(name or "") is not None
+
+    def reset(self, names=None):
+        pass
+
+    def rename(self, rid):
+        pass  # the store keeps the normalised name up to date
+
+    def drop(self, rid):
+        pass
+
+    def catch_up(self, cancelled=None):
+        pass
+
+    def _rids(self, sql, params, cancelled):
+        db = self.db
+        if cancelled is not None:
+            db.set_progress_handler(lambda: 1 if cancelled() else 0, 100000)
+        try:
+            return {rid for rid, in db.execute(sql, params)}
+        except sqlite3.OperationalError:
+            return None   # interrupted by a newer query
+        finally:
+            db.set_progress_handler(None, 0)
+
+    def search(self, text, cancelled=None, rids=None):
+        query = normalise(text.strip())
+        if not query:
+            return None
+        found = self._rids("SELECT rid FROM channels WHERE instr(norm, ?) > 0", (query,), cancelled)
+        return found if rids is None or found is None else found & rids
+
+    def regex(self, pattern, rids=None, cancelled=None):
+        self._pattern = pattern
+        found = self._rids("SELECT rid FROM channels WHERE matches(name)", (), cancelled)
+        return found if rids is None or found is None else found & rids
+
+
+# ------- State ---------------------------------
+class DiskState:
+    # StateStore's interface for a DiskStore: favourites and renames are
+    # already in the file, so the journal only tracks whether the order or
+    # the view settings need flushing.
+
+    def __init__(self, store):
+        self.store = store
+        self.path = Path(store.path)
+        self.ops = 0
+        self.dirty = False
+        meta = store._meta("state")
+        self.meta = json.loads(meta) if meta else {}
+
+    def load(self):
+        # the rows are already in the store; called from the loader thread,
+        # so nothing here touches the store's connection
+        return [], dict(self.meta)
+
+    def record(self, op):
+        if op[0] == "meta":
+            self.meta[op[1]] = op[2]
+            self.store._set_meta("state", _dumps(self.meta))
+            self.store._commit()
+        elif op[0] == "move":
+            self.ops += 1
+
+    def reset(self):
+        # after a bulk change: its rows go to the file now, for the search
+        # and export connections, the order at the next save
+        self.store._commit()
+        self.dirty = True
+
+    def save(self, rows, meta):
+        # rows are ignored, they are in the file already
+        self.meta = dict(meta)
+        self.store._set_meta("state", _dumps(meta))
+        self.store.flush()
+        self.ops = 0
+        self.dirty = False
+
+    save_async = save   # a flush is a few blob writes
+
+    def wait(self):
+        pass
+
+    def close(self):
+        self.store.flush()
+        self.store.close()
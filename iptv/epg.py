@@ -0,0 +1,187 @@
+# Simple IPTV thing - XMLTV guide data
+# github.com/tugbaot/simple-iptv
+
+import calendar
+import gzip
+import io
+import os
+import sqlite3
+import time
+from typing import NamedTuple
+from xml.etree.ElementTree import iterparse
+
+INSERT_ROWS = 5000
+NO_GUIDE_RECHECK = 600   # seconds before a channel without programmes is asked again
+
+
+class Programme(NamedTuple):
+    start: int    # unix time
+    stop: int
+    title: str
+
+
+# ------- XMLTV parsing -------------------------
+def xmltv_time(text):
+    # '20260118203000 +0100' -> unix time; missing offset means UTC
+    text = text.strip()
+    digits = text[:14].ljust(14, "0")
+    t = calendar.timegm((int(digits[0:4]), int(digits[4:6]), int(digits[6:8]),
+                         int(digits[8:10]), int(digits[10:12]), int(digits[12:14]), 0, 0, 0))
+    offset = text[14:].strip()
+    if len(offset) == 5 and offset[0] in "+-" and offset[1:].isdigit():
+        minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+        t -= minutes * 60 if offset[0] == "+" else -minutes * 60
+    return t
+
+
+def open_xmltv(stream):
+    # plain or gzipped, told apart by the magic bytes rather than the name
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream, 1 << 16)
+    if stream.peek(2)[:2] == b"\x1f\x8b":
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def parse_xmltv(stream, since=None):
+    # Yields ("channel", id, display name) and ("programme", channel, start,
+    # stop, title) as the file streams past. Every element is cleared once
+    # read and dropped from the root, so memory stays flat however big the
+    # guide is. Programmes that ended before `since` are skipped.
+    root = None
+    for event, elem in iterparse(open_xmltv(stream), events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            continue
+        tag = elem.tag
+        if tag == "programme":
+            channel = elem.get("channel")
+            start, stop = elem.get("start"), elem.get("stop")
+            if channel and start:
+                try:
+                    start = xmltv_time(start)
+                    stop = xmltv_time(stop) if stop else start
+                except ValueError:
+                    start = None
+                if start is not None and (since is None or stop > since):
+                    title = elem.findtext("title") or ""
+                    yield "programme", channel, start, stop, title.strip()
+        elif tag == "channel":
+            channel = elem.get("id")
+            name = elem.findtext("display-name")
+            if channel and name:
+                yield "channel", channel, name.strip()
+        else:
+            continue
+        elem.clear()
+        root.clear()
+
+
+def build_epg(path, stream, cancelled=lambda: False, progress=None):
+    # Parses XMLTV into a fresh SQLite file at `path`, programmes indexed
+    # by (channel, stop). Channel ids are matched case-insensitively.
+    # Returns the number of programmes, or None if cancelled.
+    if os.path.exists(path):
+        os.remove(path)
+    db = sqlite3.connect(path)
+    try:
+        db.execute("PRAGMA journal_mode = OFF")
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute("CREATE TABLE channels (id TEXT, name TEXT)")
+        db.execute("CREATE TABLE programmes (channel TEXT, start INTEGER, stop INTEGER, title TEXT)")
+        programmes = []
+        channels = []
+        count = 0
+        for item in parse_xmltv(stream, since=time.time()):
+            if item[0] == "programme":
+                programmes.append((item[1].lower(), item[2], item[3], item[4]))
+                if len(programmes) >= INSERT_ROWS:
+                    if cancelled():
+                        return None
+                    db.executemany("INSERT INTO programmes VALUES (?, ?, ?, ?)", programmes)
+                    count += len(programmes)
+                    programmes = []
+                    if progress is not None:
+                        progress(count)
+            else:
+                channels.append((item[1].lower(), item[2]))
+        db.executemany("INSERT INTO programmes VALUES (?, ?, ?, ?)", programmes)
+        db.executemany("INSERT INTO channels VALUES (?, ?)", channels)
+        count += len(programmes)
+        # built after the bulk insert, far quicker than keeping it up to date
+        db.execute("CREATE INDEX programmes_by_stop ON programmes (channel, stop)")
+        db.commit()
+        return count
+    finally:
+        db.close()
+
+
+# ------- Lookup --------------------------------
+class EpgGuide:
+    # Now/next lookups for the delegate. Each channel's answer is cached
+    # until the current programme ends, so painting a row is a dict lookup
+    # and the database is only asked when a programme changes. Use from
+    # one thread.
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+        self._now_next = {}   # channel -> (valid until, now, next)
+        self._names = None    # lower-cased display name -> channel id
+        self.open()
+
+    def open(self):
+        self._now_next.clear()
+        self._names = None
+        if os.path.exists(self.path):
+            self._db = sqlite3.connect(self.path)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def replace(self, built):
+        # swap in a database made by build_epg()
+        self.close()
+        os.replace(built, self.path)
+        self.open()
+
+    def __bool__(self):
+        return self._db is not None
+
+    def channel_for_name(self, name):
+        if self._names is None:
+            self._names = {}
+            if self._db is not None:
+                for channel, display in self._db.execute("SELECT id, name FROM channels"):
+                    self._names.setdefault(display.lower(), channel)
+        return self._names.get(name.lower())
+
+    def now_next(self, channel, now=None):
+        # (Programme or None, Programme or None)
+        if now is None:
+            now = time.time()
+        cached = self._now_next.get(channel)
+        if cached is not None and now < cached[0]:
+            return cached[1], cached[2]
+        if self._db is None:
+            return None, None
+        rows = self._db.execute(
+            "SELECT start, stop, title FROM programmes WHERE channel = ? AND stop > ? "
+            "ORDER BY stop LIMIT 2", (channel.lower(), now)).fetchall()
+        progs = [Programme(*row) for row in rows]
+        current = nxt = None
+        if progs and progs[0].start <= now:
+            current = progs.pop(0)
+        if progs:
+            nxt = progs[0]
+        if current is not None:
+            until = current.stop
+        elif nxt is not None:
+            until = nxt.start
+        else:
+            until = now + NO_GUIDE_RECHECK
+        self._now_next[channel] = (until, current, nxt)
+        return current, nxt
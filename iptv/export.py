@@ -0,0 +1,97 @@
+# Simple IPTV thing - playlist export: M3U, JSON Lines, XSPF, optionally gzipped
+# github.com/tugbaot/simple-iptv
+
+import gzip
+import io
+import json
+from xml.sax.saxutils import escape
+
+from iptv.m3u import write_m3u
+from iptv.state import atomic_write
+
+BATCH = 512          # channels formatted per write() call
+GZIP_LEVEL = 6       # 9 is much slower for a few percent
+
+
+def write_jsonl(f, channels, skip=()):
+    # one object per line: name, url, attrs, plus duration and directives
+    # when the channel has them; returns the number written
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    count = 0
+    buf = []
+    for name, url, duration, attrs, extras in channels:
+        row = {"name": name, "url": url}
+        if attrs:
+            row["attrs"] = {k: v for k, v in attrs.items() if k not in skip} if skip else attrs
+        if duration != -1:
+            row["duration"] = duration
+        if extras:
+            row["extras"] = list(extras)
+        buf.append(dumps(row))
+        if len(buf) >= BATCH:
+            f.write("\n".join(buf) + "\n")
+            count += len(buf)
+            buf = []
+    if buf:
+        f.write("\n".join(buf) + "\n")
+    return count + len(buf)
+
+
+def write_xspf(f, channels, skip=()):
+    # XSPF for VLC and friends: title, location, logo as image and group as
+    # album; other attributes have nowhere to go
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<playlist version="1" xmlns="http://xspf.org/ns/0/">\n<trackList>\n')
+    count = 0
+    buf = []
+    for channel in channels:
+        track = f"<track><location>{escape(channel.url)}</location><title>{escape(channel.name)}</title>"
+        logo = channel.tvg_logo
+        if logo:
+            track += f"<image>{escape(logo)}</image>"
+        group = channel.group
+        if group:
+            track += f"<album>{escape(group)}</album>"
+        buf.append(track + "</track>\n")
+        if len(buf) >= BATCH:
+            f.write("".join(buf))
+            count += len(buf)
+            buf = []
+    f.write("".join(buf))
+    f.write("</trackList>\n</playlist>\n")
+    return count + len(buf)
+
+
+WRITERS = {"m3u": write_m3u, "jsonl": write_jsonl, "xspf": write_xspf}
+SUFFIXES = {".m3u": "m3u", ".m3u8": "m3u", ".jsonl": "jsonl", ".xspf": "xspf"}
+
+
+def export_format(path):
+    # 'list.jsonl.gz' -> ("jsonl", True); anything unknown is M3U
+    name = str(path).lower()
+    gz = name.endswith(".gz")
+    if gz:
+        name = name[:-3]
+    for suffix, kind in SUFFIXES.items():
+        if name.endswith(suffix):
+            return kind, gz
+    return "m3u", gz
+
+
+def export(path, channels, skip=()):
+    # streams `channels` straight into a temp file swapped in at the end,
+    # so a failed or cancelled export leaves any old file alone; returns
+    # the number of channels written
+    kind, gz = export_format(path)
+    writer = WRITERS[kind]
+    written = []
+
+    def write(f):
+        if gz:
+            with gzip.GzipFile(fileobj=f.buffer, mode="wb", compresslevel=GZIP_LEVEL) as raw, \
+                    io.TextIOWrapper(raw, encoding="utf-8") as text:
+                written.append(writer(text, channels, skip))
+        else:
+            written.append(writer(f, channels, skip))
+    atomic_write(path, write)
+    return written[0]
@@ -0,0 +1,264 @@
+# Simple IPTV thing - stream health checks
+# github.com/tugbaot/simple-iptv
+
+import asyncio
+import json
+import ssl
+import time
+from collections import deque
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import urljoin, urlsplit
+
+from iptv.state import atomic_write
+
+TIMEOUT = 8.0          # per stream, connect to first segment
+PLAYLIST_LIMIT = 1 << 18
+MAX_REDIRECTS = 5
+USER_AGENT = "Mozilla/5.0 (simple-iptv)"
+
+
+class Health(NamedTuple):
+    alive: bool
+    status: int = 0          # last HTTP status, 0 = no response
+    ttfb: float = None       # seconds to the first response line
+    error: str = ""
+    checked: float = 0.0     # time.time() of the check
+
+
+# ------- Cache ---------------------------------
+class HealthCache:
+    # Results keyed by URL, reused for ttl seconds. One JSON file,
+    # url -> [alive, status, ttfb, error, checked].
+
+    def __init__(self, path, ttl=6 * 3600):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._entries = {}
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, url):
+        entry = self._entries.get(url)
+        if entry and time.time() - entry[4] < self.ttl:
+            return Health(*entry)
+        return None
+
+    def put(self, url, health):
+        self._entries[url] = list(health)
+
+    def save(self):
+        now = time.time()
+        entries = {url: e for url, e in self._entries.items() if now - e[4] < self.ttl}
+        self._entries = entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, lambda f: json.dump(entries, f))
+
+
+# ------- HTTP ----------------------------------
+# a few lines of HTTP/1.1 over asyncio streams rather than a new
+# dependency: only the status, headers and the first bytes are needed
+
+_ssl_context = None
+
+
+def _ssl():
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+async def _read_body(reader, headers, limit):
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        body = b""
+        while len(body) < limit:
+            size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if not size:
+                break
+            body += await reader.readexactly(size)
+            await reader.readline()
+        return body[:limit]
+    length = headers.get("content-length")
+    limit = min(limit, int(length)) if length and length.isdigit() else limit
+    body = b""
+    while len(body) < limit:
+        chunk = await reader.read(limit - len(body))
+        if not chunk:
+            break
+        body += chunk
+    return body
+
+
+def _is_hls(url, headers):
+    # by extension or content type, both are common on their own
+    return (urlsplit(url).path.lower().endswith(".m3u8")
+            or "mpegurl" in headers.get("content-type", "").lower())
+
+
+async def fetch(url, limit):
+    # (status, headers, first `limit` body bytes, seconds to the status line)
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"can't check {parts.scheme or 'this'} URLs")
+    https = parts.scheme == "https"
+    start = time.monotonic()
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, parts.port or (443 if https else 80),
+        ssl=_ssl() if https else None)
+    try:
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        writer.write((f"GET {target} HTTP/1.1\r\nHost: {parts.netloc.rpartition('@')[2]}\r\n"
+                      f"User-Agent: {USER_AGENT}\r\nAccept: */*\r\nConnection: close\r\n\r\n").encode())
+        await writer.drain()
+        line = await reader.readline()
+        ttfb = time.monotonic() - start
+        fields = line.split(None, 2)
+        if len(fields) < 2 or not fields[0].startswith(b"HTTP/"):
+            raise ValueError("not an HTTP response")
+        status = int(fields[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        body = b""
+        if status < 300:
+            # a playlist is read (up to limit), a stream only has to start
+            body = await _read_body(reader, headers, limit if _is_hls(url, headers) else 1)
+            if not body:
+                raise ValueError("no data")
+        return status, headers, body, ttfb
+    finally:
+        writer.close()
+
+
+async def _get(url, limit):
+    # fetch() following redirects, returns the final URL too
+    for _ in range(MAX_REDIRECTS + 1):
+        status, headers, body, ttfb = await fetch(url, limit)
+        if status in (301, 302, 303, 307, 308) and headers.get("location"):
+            url = urljoin(url, headers["location"])
+            continue
+        return status, headers, body, ttfb, url
+    raise ValueError("too many redirects")
+
+
+def _first_uri(playlist):
+    # first URI line of an HLS playlist: a variant playlist or a segment
+    for line in playlist.decode("utf-8", "replace").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            return line
+    return None
+
+
+async def probe(url):
+    # GET the stream and read its first bytes (plenty of IPTV servers
+    # answer HEAD wrongly); for HLS follow the playlist down to the first
+    # segment, a live playlist whose segments 404 is as dead as a 404
+    ttfb = None
+    status = 0
+    try:
+        for _ in range(3):  # master playlist -> media playlist -> segment
+            status, headers, body, took, url = await _get(url, PLAYLIST_LIMIT)
+            ttfb = took if ttfb is None else ttfb
+            if not 200 <= status < 300:
+                return Health(False, status, ttfb, f"HTTP {status}", time.time())
+            if not _is_hls(url, headers):
+                return Health(True, status, ttfb, "", time.time())
+            uri = _first_uri(body)
+            if uri is None:
+                return Health(False, status, ttfb, "empty playlist", time.time())
+            url = urljoin(url, uri)
+        return Health(False, status, ttfb, "playlist loop", time.time())
+    except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+        return Health(False, status, ttfb, str(e) or type(e).__name__, time.time())
+
+
+# ------- Checker -------------------------------
+class HealthChecker:
+    # Probes many URLs from one event loop: `concurrency` at a time overall
+    # and at most `per_host` against any one server (providers cap
+    # connections per login). on_result(key, url, Health) is called on the
+    # checker's thread, cached results first.
+
+    def __init__(self, cache=None, concurrency=50, per_host=4, timeout=TIMEOUT):
+        self.cache = cache
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+
+    def run(self, items, on_result, cancelled=lambda: False):
+        # items: iterable of (key, url); blocks until done or cancelled
+        asyncio.run(self.check(items, on_result, cancelled))
+        if self.cache is not None:
+            self.cache.save()
+
+    async def check(self, items, on_result, cancelled):
+        pending = []
+        for key, url in items:
+            health = self.cache.get(url) if self.cache is not None else None
+            if health is not None:
+                on_result(key, url, health)
+            else:
+                pending.append((key, url))
+        if not pending:
+            return
+
+        # queued per server; a worker only takes a URL whose server has a
+        # free slot, so one big provider can't tie up every worker waiting
+        queues = {}    # host -> deque of (key, url), servers take turns
+        for key, url in pending:
+            queues.setdefault(urlsplit(url).netloc, deque()).append((key, url))
+        busy = {}      # host -> probes running
+        freed = asyncio.Condition()
+        stopping = False
+
+        def take():
+            for host in queues:
+                if busy.get(host, 0) < self.per_host:
+                    queue = queues.pop(host)
+                    item = queue.popleft()
+                    if queue:
+                        queues[host] = queue  # to the back of the line
+                    busy[host] = busy.get(host, 0) + 1
+                    return host, item
+            return None
+
+        async def worker():
+            while not stopping:  # 3.11's wait_for can swallow a cancel
+                async with freed:
+                    while (task := take()) is None:
+                        if not queues or stopping:
+                            return
+                        await freed.wait()
+                host, (key, url) = task
+                try:
+                    health = await asyncio.wait_for(probe(url), self.timeout)
+                except asyncio.TimeoutError:
+                    health = Health(False, 0, None, "timed out", time.time())
+                finally:
+                    busy[host] -= 1
+                    async with freed:
+                        freed.notify_all()
+                if self.cache is not None:
+                    self.cache.put(url, health)
+                on_result(key, url, health)
+
+        tasks = [asyncio.ensure_future(worker()) for _ in range(min(self.concurrency, len(pending)))]
+        while not all(task.done() for task in tasks):
+            if cancelled():
+                stopping = True
+                for task in tasks:  # don't sit out the probes in flight
+                    task.cancel()
+                break
+            await asyncio.wait(tasks, timeout=0.1)
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                raise result
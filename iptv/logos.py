@@ -0,0 +1,215 @@
+# Simple IPTV thing - channel logos: fetch threads and thumbnail cache
+# github.com/tugbaot/simple-iptv
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from iptv.metrics import metrics
+
+MAX_BYTES = 2 * 2**20     # bigger than this is not a logo
+USER_AGENT = "Mozilla/5.0 (simple-iptv)"
+
+
+# ------- Cache ---------------------------------
+class ThumbnailCache:
+    # Downscaled logos as small files keyed by URL and size. Each read
+    # touches the file, and once more than a tenth of max_bytes has been
+    # written the least recently used are dropped. There is no index, so
+    # any number of threads can use it.
+
+    SUFFIX = ".png"
+
+    def __init__(self, directory, size, max_bytes=50 * 2**20):
+        self.directory = Path(directory)
+        self.size = size
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._written = None  # since the last prune, None = not pruned yet
+
+    def _path(self, url):
+        key = hashlib.sha1(f"{self.size}:{url}".encode("utf-8")).hexdigest()
+        return self.directory / key[:2] / (key + self.SUFFIX)
+
+    def get(self, url):
+        path = self._path(url)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def put(self, url, data):
+        path = self._path(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._written is not None:
+                self._written += len(data)
+            prune = self._written is None or self._written > self.max_bytes // 10
+            if prune:
+                self._written = 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        files = []
+        total = 0
+        for path in self.directory.glob("*/*" + self.SUFFIX):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+
+# ------- Fetcher -------------------------------
+class LogoFetcher:
+    # Makes thumbnails on up to `connections` threads, from the cache or
+    # the network, with at most `per_host` downloads from any one server.
+    # The newest request goes first, and want() drops queued ones that
+    # have scrolled away, so a fast scroll leaves no backlog behind it.
+    # thumbnail(data) -> bytes or None is the app's decode and downscale;
+    # on_ready(url, thumbnail or None) is called on the fetching thread.
+    # A URL that failed is not tried again.
+
+    def __init__(self, cache, thumbnail, on_ready, connections=6, per_host=2, timeout=10):
+        self.cache = cache
+        self.thumbnail = thumbnail
+        self.on_ready = on_ready
+        self.connections = max(1, connections)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self._queue = []        # newest last
+        self._queued = set()
+        self._active = set()
+        self._failed = set()
+        self._hosts = {}        # host -> downloads running
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopped = False
+        self._session = None
+
+    def session(self):
+        if self._session is None:
+            import requests  # slow to import, only needed once something is fetched
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            session.headers["User-Agent"] = USER_AGENT
+            adapter = HTTPAdapter(pool_connections=self.connections, pool_maxsize=self.per_host)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+        return self._session
+
+    def _wanted(self, url):
+        return url not in self._queued and url not in self._active and url not in self._failed
+
+    def request(self, url):
+        with self._cond:
+            if self._stopped or not self._wanted(url):
+                return
+            self._queue.append(url)
+            self._queued.add(url)
+            self._start()
+            self._cond.notify()
+
+    def want(self, urls):
+        # the URLs around the view, most wanted first: anything else still
+        # queued is dropped
+        with self._cond:
+            keep = set(urls)
+            self._queue = [url for url in self._queue if url in keep]
+            self._queued = set(self._queue)
+            for url in reversed(urls):
+                if self._wanted(url):
+                    self._queue.append(url)
+                    self._queued.add(url)
+            if self._queue:
+                self._start()
+                self._cond.notify_all()
+
+    def _start(self):
+        if len(self._threads) < min(self.connections, len(self._queue) + len(self._active)):
+            thread = threading.Thread(target=self._run, name="logos", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _next(self):
+        # newest queued URL whose server has a free slot
+        for i in range(len(self._queue) - 1, -1, -1):
+            host = urlsplit(self._queue[i]).netloc
+            if self._hosts.get(host, 0) < self.per_host:
+                url = self._queue.pop(i)
+                self._queued.discard(url)
+                return url, host
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                task = None
+                while not self._stopped and (task := self._next()) is None:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                url, host = task
+                self._hosts[host] = self._hosts.get(host, 0) + 1
+                self._active.add(url)
+            thumb = None
+            try:
+                thumb = self._load(url)
+            except Exception:
+                pass  # unreachable or not an image, the row keeps its icon
+            finally:
+                with self._cond:
+                    self._hosts[host] -= 1
+                    self._active.discard(url)
+                    if thumb is None:
+                        self._failed.add(url)
+                    self._cond.notify_all()
+            if not self._stopped:
+                self.on_ready(url, thumb)
+
+    def _load(self, url):
+        thumb = self.cache.get(url)
+        if thumb is not None:
+            return thumb
+        start = perf_counter()
+        with self.session().get(url, timeout=self.timeout, stream=True) as r:
+            r.raise_for_status()
+            data = r.raw.read(MAX_BYTES + 1, decode_content=True)
+        if len(data) > MAX_BYTES:
+            return None
+        thumb = self.thumbnail(data)
+        if thumb is not None:
+            self.cache.put(url, thumb)
+            metrics.record("logo.fetch", perf_counter() - start)
+        return thumb
+
+    def stop(self):
+        # threads still downloading finish on their own, their results dropped
+        with self._cond:
+            self._stopped = True
+            self._queue.clear()
+            self._queued.clear()
+            self._cond.notify_all()
+        if self._session is not None:
+            self._session.close()
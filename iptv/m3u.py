@@ -0,0 +1,194 @@
+# Simple IPTV thing - streaming M3U parser
+# github.com/tugbaot/simple-iptv
+
+import codecs
+import os
+import re
+import sys
+from typing import NamedTuple
+
+CHUNK_SIZE = 1 << 16
+
+# directive lines kept with the channel that follows them
+KEPT_DIRECTIVES = ("#EXTVLCOPT", "#EXTGRP", "#KODIPROP")
+
+# up to and including the first comma that is not inside a quoted value
+_TITLE = re.compile(r'[^,"]*(?:"[^"]*"[^,"]*)*,')
+_ATTR = re.compile(r'([A-Za-z0-9_-]+)=(?:"([^"]*)"|\'([^\']*)\'|([^\s,"\']*))')
+_intern = sys.intern
+_new = tuple.__new__
+
+# attribute names repeat on every line, map them to one shared lower-case str
+_keys = {}
+_key = _keys.get
+
+
+def _new_key(key):
+    _keys[key] = value = _intern(key.lower())
+    return value
+
+
+# ------- Channel record ------------------------
+class Channel(NamedTuple):
+    name: str
+    url: str
+    duration: int = -1
+    attrs: dict = None     # #EXTINF attributes, e.g. tvg-id, group-title
+    extras: tuple = ()     # raw #EXTVLCOPT / #EXTGRP / #KODIPROP lines
+
+    def attr(self, key, default=None):
+        return self.attrs.get(key, default) if self.attrs else default
+
+    @property
+    def tvg_id(self):
+        return self.attr("tvg-id")
+
+    @property
+    def tvg_name(self):
+        return self.attr("tvg-name")
+
+    @property
+    def tvg_logo(self):
+        return self.attr("tvg-logo")
+
+    @property
+    def group(self):
+        group = self.attr("group-title")
+        if group:
+            return group
+        for line in self.extras:
+            if line.startswith("#EXTGRP:"):
+                return line[8:].strip()
+        return None
+
+
+# ------- Reading -------------------------------
+def _read_chunks(source, chunk_size):
+    if hasattr(source, "read"):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        # any iterable of str/bytes chunks, e.g. requests' iter_content()
+        yield from source
+
+
+def iter_lines(source, chunk_size=CHUNK_SIZE, encoding="utf-8-sig"):
+    # Yields text lines from a byte or text stream without reading it all
+    # into memory. Bytes are decoded incrementally so multi-byte characters
+    # split across chunks survive; a trailing '\r' is left for the caller
+    # to strip.
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    tail = ""
+    for chunk in _read_chunks(source, chunk_size):
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            chunk = decoder.decode(chunk)
+        if not chunk:
+            continue
+        lines = (tail + chunk).split("\n")
+        tail = lines.pop()
+        yield from lines
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+# ------- Parsing -------------------------------
+def parse_extinf(line):
+    # '#EXTINF:-1 tvg-id="x" group-title="A, B",Channel name'
+    # -> (duration, attrs, name). Commas inside quoted values are not
+    # taken as the title separator.
+    start = 8 if line[7:8] == ":" else 7
+    m = _TITLE.match(line, start)
+    if m is not None:
+        end = m.end()
+    else:
+        # an unbalanced quote: the last comma, or with none at all the
+        # URL basename is used instead
+        end = line.rfind(",", start) + 1
+        if not end:
+            return -1, None, ""
+    name = line[end:].strip()
+    head = line[start:end - 1].split(None, 1)
+    raw = head[1] if len(head) > 1 else None
+    try:
+        duration = int(float(head[0])) if head else -1
+    except ValueError:
+        # attributes straight after the tag, no duration
+        duration, raw = -1, line[start:end - 1]
+    attrs = None
+    if raw:
+        attrs = {_key(key) or _new_key(key): dq or sq or bare
+                 for key, dq, sq, bare in _ATTR.findall(raw)}
+        group = attrs.get("group-title")
+        if group:
+            attrs["group-title"] = _intern(group)
+    return duration, attrs, name
+
+
+def parse_lines(lines):
+    # Generator over already split lines (str), yields Channel records
+    duration, attrs, name = -1, None, None
+    extras = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] == "#":
+            if line.startswith("#EXTINF"):
+                duration, attrs, name = parse_extinf(line)
+            elif line.startswith(KEPT_DIRECTIVES):
+                extras.append(line)
+            continue
+        if not name:
+            name = os.path.basename(line) or "Untitled"
+        if extras:
+            yield _new(Channel, (name, line, duration, attrs, tuple(extras)))
+            extras = []
+        else:
+            yield _new(Channel, (name, line, duration, attrs, ()))
+        duration, attrs, name = -1, None, None
+
+
+def parse_m3u(source, chunk_size=CHUNK_SIZE):
+    # Generator over a byte/text stream (file object, response.raw) or an
+    # iterable of chunks (response.iter_content()), yields Channel records
+    return parse_lines(iter_lines(source, chunk_size))
+
+
+# ------- Writing -------------------------------
+def _attr(key, value):
+    value = str(value)
+    if '"' in value:
+        value = value.replace('"', "'")  # M3U has no escaping, it would end the value
+    return f' {key}="{value}"'
+
+
+def format_channel(channel, skip=()):
+    # the #EXTINF line, kept directives and URL of one channel; attribute
+    # names in `skip` are left out
+    name, url, duration, attrs, extras = channel
+    head = ""
+    if attrs:
+        head = "".join([_attr(key, value) for key, value in attrs.items() if key not in skip])
+    if extras:
+        return f"#EXTINF:{duration}{head},{name}\n" + "\n".join(extras) + f"\n{url}\n"
+    return f"#EXTINF:{duration}{head},{name}\n{url}\n"
+
+
+def write_m3u(f, channels, skip=()):
+    # writes to a text stream as it goes, a few hundred channels per
+    # write() call; returns the number written
+    f.write("#EXTM3U\n")
+    count = 0
+    buf = []
+    for channel in channels:
+        buf.append(format_channel(channel, skip))
+        if len(buf) >= 512:
+            f.write("".join(buf))
+            count += len(buf)
+            buf = []
+    f.write("".join(buf))
+    return count + len(buf)
@@ -0,0 +1,192 @@
+# Simple IPTV thing - timings, errors and on-demand profiling
+# github.com/tugbaot/simple-iptv
+
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+
+from iptv.state import atomic_write
+
+WINDOW = 512          # recent samples kept per span
+ERRORS = 100          # recent errors kept
+# histogram bucket upper bounds in ms, the last bucket is everything above
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def rss_bytes():
+    # resident memory of this process, 0 when it can't be had cheaply
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        if os.name == "nt":
+            import ctypes
+            from ctypes import wintypes
+
+            class Counters(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + \
+                           [(name, ctypes.c_size_t) for name in (
+                               "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                               "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage",
+                               "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+            counters = Counters()
+            counters.cb = ctypes.sizeof(counters)
+            ctypes.windll.psapi.GetProcessMemoryInfo(
+                ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+            return counters.WorkingSetSize
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # peak, bytes on macOS
+    except Exception:
+        return 0
+
+
+# ------- Spans ---------------------------------
+class Span:
+    # one named operation: lifetime count/total/max plus the last WINDOW
+    # durations for percentiles and the histogram
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.recent = array("d", bytes(8 * WINDOW))
+        self._next = 0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent[self._next] = seconds
+        self._next = (self._next + 1) % WINDOW
+
+    def summary(self):
+        samples = sorted(self.recent[:min(self.count, WINDOW)])
+        buckets = [0] * (len(BUCKETS_MS) + 1)
+        for s in samples:
+            ms = s * 1000
+            i = 0
+            while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+                i += 1
+            buckets[i] += 1
+        labels = [f"<={b:g}ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]:g}ms"]
+
+        def pct(p):
+            return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000 if samples else 0.0
+        return {"count": self.count, "total_ms": self.total * 1000,
+                "mean_ms": self.total * 1000 / self.count if self.count else 0.0,
+                "last_ms": self.last * 1000, "p50_ms": pct(0.5), "p95_ms": pct(0.95),
+                "max_ms": self.max * 1000,
+                "histogram": {label: n for label, n in zip(labels, buckets) if n}}
+
+
+# ------- Metrics -------------------------------
+class Metrics:
+    # Process-wide collector: timing spans from any thread, gauges, recent
+    # errors, and a cProfile + tracemalloc capture that can be switched on
+    # and off while running. Cheap enough to leave on: a span is two
+    # perf_counter() calls and a lock.
+
+    def __init__(self):
+        self.started = time.time()
+        self.spans = {}
+        self.gauges = {}
+        self.errors = deque(maxlen=ERRORS)
+        self._lock = threading.Lock()
+        self._profile = None
+
+    def record(self, name, seconds):
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                span = self.spans[name] = Span()
+            span.add(seconds)
+
+    @contextmanager
+    def span(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter() - start)
+
+    def last_ms(self, name):
+        span = self.spans.get(name)
+        return span.last * 1000 if span is not None else None
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def error(self, where, message):
+        # kept for the trace as well as printed, stdout may be os.devnull
+        self.errors.append({"time": time.time(), "where": where, "message": str(message)})
+        print(f"{where}: {message}")
+
+    def excepthook(self, kind, value, tb):
+        # uncaught exceptions in slots land here instead of a lost stderr
+        self.errors.append({"time": time.time(), "where": "uncaught",
+                            "message": "".join(traceback.format_exception(kind, value, tb))})
+        sys.__excepthook__(kind, value, tb)
+
+    # ------- profiling -------
+    @property
+    def profiling(self):
+        return self._profile is not None
+
+    def start_profile(self):
+        # cProfile sees the calling thread only, the GUI thread here
+        import cProfile
+        import tracemalloc
+        if self._profile is not None:
+            return
+        tracemalloc.start(10)
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def stop_profile(self, prof_path=None, top=40):
+        # -> {"functions": [...], "memory": [...]}; the raw profile goes to
+        # prof_path for snakeviz / pstats when given
+        import pstats
+        import tracemalloc
+        profile, self._profile = self._profile, None
+        if profile is None:
+            return None
+        profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        if prof_path is not None:
+            profile.dump_stats(prof_path)
+        stats = pstats.Stats(profile)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+        functions = [{"function": f"{path}:{line}({name})", "calls": calls,
+                      "tottime_ms": tottime * 1000, "cumtime_ms": cumtime * 1000}
+                     for (path, line, name), (_, calls, tottime, cumtime, _) in rows]
+        memory = [{"where": str(stat.traceback[0]), "kb": stat.size / 1024, "blocks": stat.count}
+                  for stat in snapshot.statistics("lineno")[:top]]
+        return {"functions": functions, "memory": memory}
+
+    # ------- output -------
+    def snapshot(self):
+        with self._lock:
+            spans = {name: span.summary() for name, span in sorted(self.spans.items())}
+        return {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "uptime_s": time.time() - self.started,
+                "python": sys.version.split()[0], "platform": sys.platform, "rss_mb": rss_bytes() / 2**20,
+                "gauges": dict(self.gauges), "spans": spans, "errors": list(self.errors)}
+
+    def dump(self, path, profile=None):
+        trace = self.snapshot()
+        if profile is not None:
+            trace["profile"] = profile
+        atomic_write(path, lambda f: json.dump(trace, f, indent=1, default=str))
+        return trace
+
+
+metrics = Metrics()
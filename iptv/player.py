@@ -0,0 +1,228 @@
+# Simple IPTV thing - one long-lived mpv, driven over its JSON IPC
+# github.com/tugbaot/simple-iptv
+
+import json
+import os
+import socket
+import subprocess
+import tempfile
+import threading
+from time import monotonic, sleep
+
+# pushed to on_event as {"event": "property-change", "name": ..., "data": ...}
+OBSERVED = ("pause", "idle-active", "media-title", "demuxer-cache-duration",
+            "video-bitrate", "audio-bitrate")
+
+
+def default_ipc_path():
+    if os.name == "nt":
+        return rf"\\.\pipe\simple-iptv-mpv-{os.getpid()}"
+    return os.path.join(tempfile.gettempdir(), f"simple-iptv-mpv-{os.getpid()}.sock")
+
+
+# ------- IPC transports ------------------------
+class _SocketStream:
+    def __init__(self, path):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.connect(path)
+        except OSError:
+            self._sock.close()
+            raise
+
+    def recv(self, size):
+        return self._sock.recv(size)
+
+    def send(self, data):
+        self._sock.sendall(data)
+
+    def close(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+
+class _PipeStream:
+    # Windows named pipe opened for overlapped I/O, so the reader thread's
+    # pending read does not block writes (the way multiprocessing does it)
+    def __init__(self, path):
+        import _winapi
+        self._winapi = _winapi
+        self._handle = _winapi.CreateFile(
+            path, _winapi.GENERIC_READ | _winapi.GENERIC_WRITE, 0, _winapi.NULL,
+            _winapi.OPEN_EXISTING, _winapi.FILE_FLAG_OVERLAPPED, _winapi.NULL)
+
+    def recv(self, size):
+        try:
+            ov, _ = self._winapi.ReadFile(self._handle, size, overlapped=True)
+            _, err = ov.GetOverlappedResult(True)
+        except OSError:
+            return b""  # pipe closed
+        return ov.getbuffer() if err == 0 else b""
+
+    def send(self, data):
+        ov, _ = self._winapi.WriteFile(self._handle, data, overlapped=True)
+        ov.GetOverlappedResult(True)
+
+    def close(self):
+        handle, self._handle = self._handle, None
+        if handle is not None:
+            self._winapi.CloseHandle(handle)
+
+
+def connect_ipc(path):
+    return _PipeStream(path) if os.name == "nt" else _SocketStream(path)
+
+
+# ------- Controller ----------------------------
+class MpvController:
+    # Starts mpv once with --idle and --input-ipc-server and switches
+    # channels with loadfile. Replies and events are read on a background
+    # thread and handed to on_event(dict) there; zap latency (loadfile to
+    # first frame) arrives as {"event": "zap", "latency": seconds}. With
+    # no executable it only attaches to an existing IPC server.
+
+    CONNECT_TIMEOUT = 5.0
+
+    def __init__(self, executable=None, args=(), ipc_path=None, on_event=None):
+        self.executable = executable
+        self.args = list(args)
+        self.ipc_path = ipc_path or default_ipc_path()
+        self.on_event = on_event or (lambda event: None)
+        self.last_zap = None     # seconds, most recent loadfile -> first frame
+        self._proc = None
+        self._stream = None
+        self._lock = threading.Lock()
+        self._queue = []         # commands sent before the connection is up
+        self._callbacks = {}     # request_id -> callback(reply)
+        self._next_id = 0
+        self._zap_start = None
+        self._connecting = False
+
+    @property
+    def connected(self):
+        return self._stream is not None
+
+    def play(self, url):
+        # first call starts the player on the URL, later ones reuse it
+        # until it is closed
+        self._zap_start = monotonic()
+        if self._stream is not None or self._connecting:
+            self.command("loadfile", url, "replace")
+            return
+        if self.executable:
+            self._proc = subprocess.Popen(
+                [self.executable, *self.args, "--idle=yes", "--force-window=yes",
+                 f"--input-ipc-server={self.ipc_path}", url])
+        else:
+            self.command("loadfile", url, "replace")  # sent once attached
+        self.connect()
+
+    def connect(self):
+        with self._lock:
+            if self._stream is not None or self._connecting:
+                return
+            self._connecting = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def command(self, *args, callback=None):
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            if callback is not None:
+                self._callbacks[request_id] = callback
+            line = json.dumps({"command": list(args), "request_id": request_id}).encode() + b"\n"
+            if self._stream is None:
+                self._queue.append(line)
+                return request_id
+            stream = self._stream
+        try:
+            stream.send(line)
+        except OSError:
+            self._disconnect(stream)
+        return request_id
+
+    def get_property(self, name, callback):
+        # callback(value or None) on the reader thread
+        self.command("get_property", name,
+                     callback=lambda reply: callback(reply.get("data") if reply.get("error") == "success" else None))
+
+    def close(self):
+        # drops the connection, the player itself keeps going
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.close()
+
+    # ------- reader thread -------
+    def _run(self):
+        stream = None
+        deadline = monotonic() + self.CONNECT_TIMEOUT
+        while stream is None:
+            try:
+                stream = connect_ipc(self.ipc_path)
+            except OSError:
+                if monotonic() > deadline or (self._proc is not None and self._proc.poll() is not None):
+                    with self._lock:
+                        self._connecting = False
+                        self._queue = []
+                        self._callbacks.clear()
+                    self.on_event({"event": "ipc-failed", "path": self.ipc_path})
+                    return
+                sleep(0.05)
+        with self._lock:
+            self._stream = stream
+            self._connecting = False
+            queued, self._queue = self._queue, []
+        observe = [json.dumps({"command": ["observe_property", i, name]}).encode() + b"\n"
+                   for i, name in enumerate(OBSERVED, 1)]
+        queued = observe + queued
+        try:
+            stream.send(b"".join(queued))
+        except OSError:
+            self._disconnect(stream)
+            return
+        self.on_event({"event": "ipc-connected"})
+        self._read(stream)
+
+    def _read(self, stream):
+        buf = b""
+        while True:
+            try:
+                chunk = stream.recv(65536)
+            except OSError:
+                chunk = b""
+            if not chunk:
+                self._disconnect(stream)
+                return
+            buf += chunk
+            *lines, buf = buf.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    try:
+                        self._handle(json.loads(line))
+                    except ValueError:
+                        pass
+
+    def _handle(self, msg):
+        if "request_id" in msg and "event" not in msg:
+            callback = self._callbacks.pop(msg["request_id"], None)
+            if callback is not None:
+                callback(msg)
+            return
+        event = msg.get("event")
+        if event == "playback-restart" and self._zap_start is not None:
+            self.last_zap = monotonic() - self._zap_start
+            self._zap_start = None
+            self.on_event({"event": "zap", "latency": self.last_zap})
+        self.on_event(msg)
+
+    def _disconnect(self, stream):
+        with self._lock:
+            if self._stream is not stream:
+                return
+            self._stream = None
+            self._callbacks.clear()
+        stream.close()
+        self.on_event({"event": "ipc-closed"})
@@ -0,0 +1,396 @@
+# Simple IPTV thing - filter queries: parsing and evaluation to record ids
+# github.com/tugbaot/simple-iptv
+
+import re
+import threading
+from array import array
+from itertools import compress
+from typing import NamedTuple
+
+from iptv.search import normalise
+
+FIELDS = {"name": "name", "n": "name", "group": "group", "g": "group",
+          "source": "source", "src": "source", "country": "country", "c": "country",
+          "fav": "fav", "favourite": "fav", "favorite": "fav", "status": "status", "health": "status"}
+YES = {"yes", "y", "true", "1", "on"}
+NO = {"no", "n", "false", "0", "off"}
+STATUSES = {"alive", "dead", "unchecked"}
+SCAN_STEP = 5000
+
+_FIELD = re.compile(r"(\w+):(?=\S)")
+_BARE = re.compile(r'[^\s()|"]+')
+_GROUP_COUNTRY = re.compile(r"\s*([A-Za-z]{2,3})\s*[|:\-]")
+
+
+class QueryError(ValueError):
+    pass
+
+
+class Term(NamedTuple):
+    field: str          # one of FIELDS' values
+    text: str           # the value as typed, lower-cased where it is a keyword
+    regex: object       # compiled /pattern/, or None
+    plain: bool         # a bare word, no field, quotes or slashes
+
+
+# ------- Parsing -------------------------------
+# query   := or
+# or      := and (("OR" | "|") and)*
+# and     := not ("AND"? not)*
+# not     := ("-" | "!" | "NOT") not | "(" or ")" | term
+# term    := [field ":"] (word | "quoted text" | /regex/)
+
+def _closing(text, i):
+    # index of the quote or slash closing the one at i
+    j = i + 1
+    while j < len(text):
+        if text[j] == "\\":
+            j += 2
+            continue
+        if text[j] == text[i]:
+            return j
+        j += 1
+    raise QueryError(f"missing closing {text[i]}")
+
+
+def _term(field, text, regex, plain):
+    if field == "fav":
+        text = text.lower()
+        if text not in YES | NO:
+            raise QueryError("fav: takes yes or no")
+    elif field == "status":
+        text = text.lower()
+        if text not in STATUSES:
+            raise QueryError("status: takes alive, dead or unchecked")
+    elif field == "country" and regex is None:
+        text = text.lower()
+    return Term(field, text, regex, plain)
+
+
+def tokens(text):
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c.isspace():
+            i += 1
+            continue
+        if c in "()|":
+            yield c
+            i += 1
+            continue
+        if c in "-!" and i + 1 < n and not text[i + 1].isspace():
+            yield "-"
+            i += 1
+            continue
+        field = None
+        m = _FIELD.match(text, i)
+        if m and m.group(1).lower() in FIELDS:
+            field = FIELDS[m.group(1).lower()]
+            i = m.end()
+        if text[i] in '"/':
+            end = _closing(text, i)
+            value = text[i + 1:end].replace("\\" + text[i], text[i])
+            regex = None
+            if text[i] == "/":
+                try:
+                    regex = re.compile(value, re.IGNORECASE)
+                except re.error as e:
+                    raise QueryError(f"bad pattern /{value}/: {e}") from None
+            i = end + 1
+            yield _term(field or "name", value, regex, False)
+            continue
+        m = _BARE.match(text, i)
+        if m is None:
+            raise QueryError(f"{field}: needs a value before {text[i]}")
+        value = m.group()
+        i = m.end()
+        if field is None and value in ("OR", "AND", "NOT"):
+            yield value
+        else:
+            yield _term(field or "name", value, None, field is None)
+
+
+class _Parser:
+    def __init__(self, items):
+        self.items = items
+        self.i = 0
+
+    def peek(self):
+        return self.items[self.i] if self.i < len(self.items) else None
+
+    def next(self):
+        item = self.peek()
+        self.i += 1
+        return item
+
+    def parse(self):
+        node = self.or_()
+        if self.peek() is not None:
+            raise QueryError(f"unexpected {self.peek()}")
+        return node
+
+    def or_(self):
+        nodes = [self.and_()]
+        while self.peek() in ("|", "OR"):
+            self.next()
+            nodes.append(self.and_())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def and_(self):
+        nodes = []
+        while self.peek() not in (None, ")", "|", "OR"):
+            if self.peek() == "AND":
+                self.next()
+                continue
+            nodes.append(self.not_())
+        if not nodes:
+            raise QueryError("missing a term")
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def not_(self):
+        if self.peek() in ("-", "NOT"):
+            self.next()
+            return ("not", self.not_())
+        item = self.next()
+        if item == "(":
+            node = self.or_()
+            if self.next() != ")":
+                raise QueryError("missing )")
+            return node
+        if isinstance(item, Term):
+            return item
+        raise QueryError(f"unexpected {item or 'end'}")
+
+
+def parse(text):
+    # -> query tree, or None for an empty query. Text with no query syntax
+    # at all is one name substring, spaces included, as search always was.
+    text = text.strip()
+    if not text:
+        return None
+    items = list(tokens(text))
+    if all(isinstance(item, Term) and item.plain for item in items):
+        return Term("name", text, None, True)
+    return _Parser(items).parse()
+
+
+def highlight(text):
+    # the name text worth highlighting in the rows: the first name term
+    # not under a NOT
+    try:
+        node = parse(text)
+    except QueryError:
+        return ""
+    stack = [node]
+    while stack:
+        node = stack.pop(0)
+        if isinstance(node, Term):
+            if node.field == "name" and node.regex is None:
+                return node.text
+        elif node is not None and node[0] != "not":
+            stack[:0] = node[1]  # in the order written
+    return ""
+
+
+def country_of(country, tvg_id, group):
+    # tvg-country when there is one ('UK,IE'), else the tvg-id's country
+    # suffix ('bbcone.uk'), else a code leading the group ('UK | News')
+    if country:
+        return [c.strip().lower() for c in country.split(",") if c.strip()]
+    if tvg_id:
+        head, _, tail = tvg_id.rpartition(".")
+        if head and len(tail) == 2 and tail.isalpha():
+            return [tail.lower()]
+    if group:
+        m = _GROUP_COUNTRY.match(group)
+        if m:
+            return [m.group(1).lower()]
+    return []
+
+
+# ------- Index ---------------------------------
+class QueryIndex:
+    # Evaluates queries against one store to sets of record ids. Name
+    # terms go to the name index (SearchIndex or DiskSearch); group, source
+    # and country have posting lists, the rids of each distinct value,
+    # built off the GUI thread a slice at a time like the name index.
+    # Favourites and health come from the store's live sets. Terms are
+    # combined smallest set first, so a narrow term keeps the rest cheap.
+    # Removed records are never in the postings (the model resets the
+    # index on removals), so only NOT needs the set of every row.
+    #
+    # The store is read on the search thread under `lock`, a slice or a
+    # term at a time; the model holds it while it swaps the store's
+    # columns for new ones (clear, compaction). Appends and in-place
+    # changes need no lock, a slice only reads records already there.
+
+    def __init__(self, store, names):
+        self.names = names
+        self.lock = threading.RLock()
+        self.reset(store)
+
+    def reset(self, store=None):
+        # after a bulk change: rebuilt on the next query
+        with self.lock:
+            if store is not None:
+                self.store = store
+                # health byte -> 1 for ALIVE, 0 otherwise, for bytes.translate
+                self._alive = bytes(1 if value == store.ALIVE else 0 for value in range(256))
+            self._postings = {"group": {}, "source": {}, "country": {}}
+            self._norm = {}
+            self._built = 0
+            self._universe = (-1, None)
+
+    def catch_up(self, cancelled=None):
+        self.names.catch_up(cancelled)
+        while not (cancelled and cancelled()):
+            with self.lock:
+                start = self._built
+                stop = min(len(self.store.health), start + SCAN_STEP)  # health grows last
+                if start >= stop:
+                    return
+                groups, sources, countries = (self._postings[k] for k in ("group", "source", "country"))
+                for rid, group, source, tvg_id, country in self.store.scan(start, stop):
+                    if group:
+                        self._add(groups, group, rid)
+                    if source:
+                        self._add(sources, source, rid)
+                    for code in country_of(country, tvg_id, group):
+                        self._add(countries, code, rid)
+                self._built = stop
+
+    @staticmethod
+    def _add(postings, value, rid):
+        rids = postings.get(value)
+        if rids is None:
+            postings[value] = array("I", (rid,))
+        else:
+            rids.append(rid)
+
+    def search(self, text, cancelled=None):
+        # set of matching record ids, None for an empty (or cancelled)
+        # query; QueryError for one that doesn't parse
+        node = parse(text)
+        if node is None:
+            return None
+        self.catch_up(cancelled)
+        try:
+            return self._eval(node, self._everything, cancelled)  # only this thread adds to the postings
+        except _Cancelled:
+            return None
+
+    def _everything(self):
+        # every rid on show; rows only come and go by appends and by
+        # removals, which reset the index, so the count says when to rebuild
+        with self.lock:
+            count, rids = self._universe
+            order = self.store.order
+            if count != len(order):
+                rids = set(order)
+                self._universe = (len(order), rids)
+            return rids
+
+    def _eval(self, node, everything, cancelled):
+        if cancelled and cancelled():
+            raise _Cancelled
+        if isinstance(node, Term):
+            return self._term(node, everything, cancelled)
+        kind, children = node
+        if kind == "not":
+            return everything() - self._eval(children, everything, cancelled)
+        if kind == "or":
+            rids = set()
+            for child in children:
+                rids |= self._eval(child, everything, cancelled)
+            return rids
+        # and: the other terms smallest first, then names and NOTs checked
+        # against what is left rather than every row, patterns last
+        positive, names, negative, patterns = [], [], [], []
+        for child in children:
+            if not isinstance(child, Term) and child[0] == "not":
+                negative.append(child[1])
+            elif isinstance(child, Term) and child.field == "name":
+                (names if child.regex is None else patterns).append(child)
+            else:
+                positive.append(child)
+        if not positive:
+            positive.append(names.pop(0) if names else patterns.pop(0) if patterns else None)
+        if positive[0] is None:
+            rids = set(everything())
+        else:
+            sets = sorted((self._eval(c, everything, cancelled) for c in positive), key=len)
+            rids = set(sets[0])
+            for other in sets[1:]:
+                rids &= other
+        for term in names:
+            rids = self._name(term.text, rids, cancelled)
+        for child in negative:
+            if not rids:
+                return rids
+            if isinstance(child, Term) and child.field == "name" and child.regex is None:
+                rids -= self._name(child.text, rids, cancelled)
+            else:
+                rids -= self._eval(child, everything, cancelled)
+        for term in patterns:
+            if not rids:
+                return rids
+            rids = self._regex(term.regex, rids, cancelled)
+        return rids
+
+    def _name(self, text, rids, cancelled):
+        found = self.names.search(text, cancelled, rids)
+        if found is None:
+            raise _Cancelled
+        return found
+
+    def _regex(self, pattern, rids, cancelled):
+        found = self.names.regex(pattern, rids, cancelled)
+        if found is None:
+            raise _Cancelled
+        return found
+
+    def _term(self, term, everything, cancelled):
+        if term.field == "name":
+            if term.regex is not None:
+                return self._regex(term.regex, None, cancelled)
+            return self._name(term.text, None, cancelled)
+        with self.lock:
+            return self._store_term(term, everything)
+
+    def _store_term(self, term, everything):
+        store = self.store
+        if term.field == "fav":
+            favs = set(store.favs)
+            return favs if term.text in YES else everything() - favs
+        if term.field == "status":
+            dead = set(store.dead)
+            if term.text == "dead":
+                return dead
+            health = store.health
+            alive = set(compress(range(len(health)), health.translate(self._alive)))
+            return alive if term.text == "alive" else everything() - alive - dead
+        postings = self._postings[term.field]
+        if term.regex is not None:
+            match = term.regex.search
+        elif term.field == "country":
+            match = term.text.__eq__
+        else:
+            text = normalise(term.text)
+
+            def match(value):
+                return text in self._normalised(value)
+        rids = set()
+        for value, values in postings.items():
+            if match(value):
+                rids.update(values)
+        return rids
+
+    def _normalised(self, value):
+        norm = self._norm.get(value)
+        if norm is None:
+            norm = self._norm[value] = normalise(value)
+        return norm
+
+
+class _Cancelled(Exception):
+    pass
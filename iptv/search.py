@@ -0,0 +1,127 @@
+# Simple IPTV thing - channel name search index
+# github.com/tugbaot/simple-iptv
+
+import threading
+import unicodedata
+from array import array
+
+GRAM = 3
+CATCH_UP_STEP = 5000
+SCAN_STEP = 20000  # names scanned between looks at the cancel flag
+
+
+def normalise(text):
+    # case- and accent-folded form used for matching, 'Télé 5' -> 'tele 5'
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+# ------- Index ---------------------------------
+class SearchIndex:
+    # Trigram index over channel names, keyed by record id. It shares the
+    # store's names list and indexes whatever was appended since the last
+    # query, so inserting rows costs nothing on the GUI thread. Postings
+    # are only candidates, every hit is checked against the normalised
+    # name, so a rename just adds the new trigrams.
+
+    def __init__(self, names=None):
+        self._lock = threading.Lock()
+        self.reset(names if names is not None else [])
+
+    def reset(self, names):
+        with self._lock:
+            self._names = names
+            self._norm = []
+            self._grams = {}
+
+    def rename(self, rid):
+        with self._lock:
+            if rid < len(self._norm):
+                norm = self._norm[rid] = normalise(self._names[rid])
+                self._add_grams(rid, norm)
+
+    def drop(self, rid):
+        # a removed record: its stale postings are filtered out by the
+        # normalised-name check, names not indexed yet are already empty
+        with self._lock:
+            if rid < len(self._norm):
+                self._norm[rid] = ""
+
+    def _add_grams(self, rid, norm):
+        grams = self._grams
+        for gram in {norm[i:i + GRAM] for i in range(len(norm) - GRAM + 1)}:
+            postings = grams.get(gram)
+            if postings is None:
+                grams[gram] = array("I", (rid,))
+            else:
+                postings.append(rid)
+
+    def catch_up(self, cancelled=None):
+        # index names appended since last time, a slice at a time so the
+        # GUI thread is never locked out for long
+        while not (cancelled and cancelled()):
+            with self._lock:
+                names, norm = self._names, self._norm
+                start = len(norm)
+                end = min(len(names), start + CATCH_UP_STEP)
+                if start >= end:
+                    return
+                for rid in range(start, end):
+                    n = normalise(names[rid])
+                    norm.append(n)
+                    self._add_grams(rid, n)
+
+    def _scan(self, rids, test, cancelled):
+        # rids passing `test`, None if cancelled, which is looked up every
+        # SCAN_STEP records
+        found = set()
+        for start in range(0, len(rids), SCAN_STEP):
+            if cancelled and cancelled():
+                return None
+            found.update(rid for rid in rids[start:start + SCAN_STEP] if test(rid))
+        return found
+
+    def regex(self, pattern, rids=None, cancelled=None):
+        # record ids whose name matches a compiled pattern, out of `rids`
+        # when given, None if cancelled; a scan, trigrams can't help with
+        # a pattern
+        names = self._names
+        search = pattern.search
+        rids = range(len(names)) if rids is None else sorted(rids)
+        return self._scan(rids, lambda rid: names[rid] and search(names[rid]), cancelled)  # removed records are ""
+
+    def search(self, text, cancelled=None, rids=None):
+        # set of matching record ids, None for an empty (or cancelled) query;
+        # with `rids`, only those are of interest and a few are just checked
+        query = normalise(text.strip())
+        if not query:
+            return None
+        self.catch_up(cancelled)
+        if cancelled and cancelled():
+            return None  # the index may be short of names
+        # the lock is only held to take the postings: a rename or drop on
+        # the GUI thread replaces one list item or appends to a posting,
+        # which a reader here can't see half done
+        with self._lock:
+            norm = self._norm
+            count = len(norm)
+            if len(query) >= GRAM:
+                postings = sorted((self._grams.get(query[i:i + GRAM], ())
+                                   for i in range(len(query) - GRAM + 1)), key=len)
+        if len(query) < GRAM:
+            rids = range(count) if rids is None else sorted(rid for rid in rids if rid < count)
+            return self._scan(rids, lambda rid: query in norm[rid], cancelled)
+        if rids is not None and len(rids) < len(postings[0]):
+            return {rid for rid in rids if rid < count and query in norm[rid]}
+        candidates = set(postings[0])
+        if rids is not None:
+            candidates &= rids
+        for other in postings[1:]:
+            if not candidates or (cancelled and cancelled()):
+                break
+            candidates.intersection_update(other)
+        if cancelled and cancelled():
+            return None
+        return {rid for rid in candidates if query in norm[rid]}
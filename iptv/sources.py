@@ -0,0 +1,100 @@
+# Simple IPTV thing - several playlists merged into one
+# github.com/tugbaot/simple-iptv
+
+import threading
+from time import monotonic
+
+from iptv.diff import normalise_url
+
+SOURCE_ATTR = "x-source"   # which source a channel came from, kept with its attributes
+XTREAM = "xtream"          # a source line naming the [xtream] account
+
+
+def parse_sources(text):
+    # 'name = url, path or xtream' per line -> [(name, location)]
+    sources = []
+    seen = set()
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        name, sep, location = line.partition("=")
+        name, location = name.strip(), location.strip()
+        if not sep or not name or not location:
+            raise ValueError(f"expected 'name = url, path or {XTREAM}': {line}")
+        if name.lower() in seen:
+            raise ValueError(f"source named twice: {name}")
+        seen.add(name.lower())
+        sources.append((name, location))
+    return sources
+
+
+def tag(channel, source):
+    attrs = dict(channel.attrs) if channel.attrs else {}
+    attrs[SOURCE_ATTR] = source
+    return channel._replace(attrs=attrs)
+
+
+# ------- De-duplication ------------------------
+class Deduper:
+    # Drops repeats as channels arrive from several sources at once: the
+    # same stream (normalised URL) from anywhere, and a tvg-id already
+    # delivered by another source. Keys are kept as 64-bit hashes rather
+    # than the strings. Safe to call from the loading threads.
+
+    def __init__(self):
+        self._urls = set()
+        self._tvg_ids = {}   # hash(tvg-id) -> source that has it
+        self._lock = threading.Lock()
+
+    def filter(self, source, channels, tagged=True):
+        # channels that are new, tagged with `source` unless tagged is
+        # False; returns (kept, dropped)
+        keys = [(hash(normalise_url(ch.url)), hash(ch.tvg_id) if ch.tvg_id else None)
+                for ch in channels]
+        kept = []
+        with self._lock:
+            urls, tvg_ids = self._urls, self._tvg_ids
+            for ch, (url, tvg_id) in zip(channels, keys):
+                if url in urls:
+                    continue
+                if tvg_id is not None:
+                    owner = tvg_ids.setdefault(tvg_id, source)
+                    if owner != source:
+                        continue
+                urls.add(url)
+                kept.append(tag(ch, source) if tagged else ch)
+        return kept, len(channels) - len(kept)
+
+
+# ------- Per-source stats ----------------------
+class SourceStats:
+    def __init__(self, name, location):
+        self.name = name
+        self.location = location
+        self.started = monotonic()
+        self.first = None       # seconds to the first channels
+        self.elapsed = None     # seconds to done
+        self.channels = 0       # kept after de-duplication
+        self.duplicates = 0
+        self.stale = False      # came from the cache
+        self.error = None
+
+    def batch(self, kept, dropped):
+        if self.first is None:
+            self.first = monotonic() - self.started
+        self.channels += kept
+        self.duplicates += dropped
+
+    def done(self, error=None, stale=False):
+        self.elapsed = monotonic() - self.started
+        self.error = error
+        self.stale = stale
+
+    def summary(self):
+        if self.error:
+            return f"{self.name}: failed ({self.error})"
+        cached = ", cached" if self.stale else ""
+        first = f", first after {self.first:.1f}s" if self.first is not None else ""
+        return (f"{self.name}: {self.channels:,} channels, {self.duplicates:,} duplicates "
+                f"in {self.elapsed:.1f}s{first}{cached}")
@@ -0,0 +1,238 @@
+# Simple IPTV thing - crash-safe playlist state
+# github.com/tugbaot/simple-iptv
+
+import json
+import os
+import tempfile
+import threading
+from bisect import bisect_left
+from pathlib import Path
+
+
+# ------- Files ---------------------------------
+def atomic_write(path, write):
+    # write(f) into a temp file next to path, fsync, then swap it in, so a
+    # crash leaves either the old or the new file, never half of one
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_snapshot(path, rows, meta):
+    # {"show_favourites": ..., "playlist": [[name, url, fav(, attrs(,
+    # duration, extras))], ...]} with one channel per line
+    def write(f):
+        f.write("{")
+        for key, value in meta.items():
+            f.write(f"{json.dumps(key)}: {json.dumps(value)}, ")
+        f.write('"playlist": [')
+        sep = "\n"
+        for row in rows:
+            f.write(sep)
+            f.write(json.dumps(row, ensure_ascii=False))
+            sep = ",\n"
+        f.write("\n]}\n")
+    atomic_write(path, write)
+
+
+def move_list(rows, moved, dest):
+    # same semantics as ChannelStore.move_rows, on a plain list
+    moved = sorted(set(moved))
+    block = [rows[r] for r in moved]
+    for r in reversed(moved):
+        del rows[r]
+    dest -= bisect_left(moved, dest)
+    rows[dest:dest] = block
+
+
+# ------- State store ---------------------------
+class StateStore:
+    # The playlist lives in a JSON snapshot (STATE_FILE) plus journal
+    # segments (STATE_FILE.journal.<gen>) of small ops recorded as they
+    # happen: ["fav", row, 0|1], ["name", row, text], ["move", rows, dest],
+    # ["meta", key, value]. A bulk change (load, clear) writes ["reset"]:
+    # later ops only make sense against the next snapshot, so replay stops
+    # there. Each snapshot records the first journal gen it does not
+    # include; saving rotates to a new segment first so ops recorded while
+    # the snapshot is written are never lost. Snapshots are fsynced; journal
+    # ops are flushed to the OS as they come, which survives the app
+    # crashing, and fsynced when a segment is closed, so a power cut or OS
+    # crash can lose the ops since the last snapshot or rotation.
+
+    def __init__(self, path, on_error=None):
+        self.path = Path(path)
+        self.on_error = on_error  # (where, message), also from the save thread
+        self.gen = 0
+        self.ops = 0          # ops recorded since the last snapshot
+        self.dirty = False    # a bulk change is waiting for a snapshot
+        self._journal = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = None
+
+    def _segment(self, gen):
+        return self.path.with_name(f"{self.path.name}.journal.{gen}")
+
+    def _segments(self):
+        prefix = f"{self.path.name}.journal."
+        found = []
+        for p in self.path.parent.glob(prefix + "*"):
+            suffix = p.name[len(prefix):]
+            if suffix.isdigit():
+                found.append((int(suffix), p))
+        return sorted(found)
+
+    def load(self):
+        # -> (rows, meta); rows as [name, url, fav(, attrs(, duration,
+        # extras))] lists, what ChannelStore.append takes
+        rows, meta, first = [], {}, 0
+        if self.path.exists():
+            with self.path.open(encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, list):
+                rows = [[n, u, False] for n, u in data]
+            else:
+                rows = data.pop("playlist", [])
+                first = data.pop("journal", 0)
+                meta = data
+
+        replayed = False
+        skipped = 0
+        last = first
+        stopped = False
+        for gen, p in self._segments():
+            if gen < first:
+                p.unlink()
+                continue
+            last = max(last, gen)
+            if stopped:
+                continue
+            with p.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        break  # torn last line from a crash
+                    if op[0] == "reset":
+                        stopped = True
+                        break
+                    if not self._apply(rows, meta, op):
+                        skipped += 1
+                    replayed = True
+
+        if skipped:
+            self._error("State journal", f"skipped {skipped} ops that no longer fit the playlist")
+        self.gen = last
+        self.dirty = replayed or stopped  # fold the journal into a fresh snapshot
+        return rows, meta
+
+    @staticmethod
+    def _apply(rows, meta, op):
+        kind = op[0]
+        try:
+            if kind == "fav":
+                rows[op[1]][2] = bool(op[2])
+            elif kind == "name":
+                rows[op[1]][0] = op[2]
+            elif kind == "move":
+                move_list(rows, op[1], op[2])
+            elif kind == "meta":
+                meta[op[1]] = op[2]
+        except IndexError:
+            return False
+        return True
+
+    def _error(self, where, message):
+        if self.on_error is not None:
+            self.on_error(where, str(message))
+        else:
+            print(f"{where}: {message}")
+
+    def record(self, op):
+        with self._lock:
+            if self._journal is None:
+                self._journal = self._segment(self.gen).open("a", encoding="utf-8")
+            self._journal.write(json.dumps(op, ensure_ascii=False) + "\n")
+            self._journal.flush()  # no fsync: a bulk favourite is an op per row
+            self.ops += 1
+
+    def reset(self):
+        if not self.dirty:
+            self.record(["reset"])
+            self.dirty = True
+
+    def _close_journal(self):
+        if self._journal is not None:
+            os.fsync(self._journal.fileno())
+            self._journal.close()
+            self._journal = None
+
+    def _rotate(self):
+        with self._lock:
+            self._close_journal()
+            self.gen += 1
+            self.ops = 0
+            self.dirty = False
+            return self.gen
+
+    def save(self, rows, meta):
+        # synchronous snapshot + compaction
+        self._write(self._rotate(), rows, meta)
+
+    def _write(self, gen, rows, meta):
+        try:
+            write_snapshot(self.path, rows, {**meta, "journal": gen})
+        except Exception:
+            self.dirty = True
+            raise
+        for old, p in self._segments():
+            if old < gen:
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+
+    def save_async(self, rows, meta):
+        # rows must be a private copy taken just now, it is consumed on the
+        # worker thread. The journal rotates here, at copy time, so ops
+        # recorded from now on land in a segment the snapshot won't claim.
+        gen = self._rotate()
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._pending = (gen, rows, meta)  # supersedes a queued save
+                return
+            self._thread = threading.Thread(target=self._save_loop, args=(gen, rows, meta),
+                                            daemon=True)
+            self._thread.start()
+
+    def _save_loop(self, gen, rows, meta):
+        while True:
+            try:
+                self._write(gen, rows, meta)
+            except Exception as e:
+                self._error("State save failed", e)
+            with self._lock:
+                if self._pending is None:
+                    return
+                (gen, rows, meta), self._pending = self._pending, None
+
+    def wait(self):
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def close(self):
+        self.wait()
+        with self._lock:
+            self._close_journal()
@@ -0,0 +1,391 @@
+# Simple IPTV thing - compact channel storage
+# github.com/tugbaot/simple-iptv
+
+import copy
+import sys
+from array import array
+from bisect import bisect_left
+
+from iptv.m3u import Channel
+from iptv.sources import SOURCE_ATTR
+
+_intern = sys.intern
+NO_RID = 0xFFFFFFFF  # a removed record in compact()'s remap
+
+
+# ------- String table --------------------------
+class StringTable:
+    # Each distinct string stored once and addressed by a small int id,
+    # id 0 is the empty string / missing value
+
+    def __init__(self):
+        self.strings = [""]
+        self._ids = {"": 0}
+
+    def id(self, value):
+        if not value:
+            return 0
+        i = self._ids.get(value)
+        if i is None:
+            i = self._ids[value] = len(self.strings)
+            self.strings.append(value)
+        return i
+
+    def __getitem__(self, i):
+        return self.strings[i]
+
+    def __copy__(self):
+        table = StringTable.__new__(StringTable)
+        table.strings = self.strings[:]
+        table._ids = self._ids  # lookups only matter to the live table
+        return table
+
+    def __len__(self):
+        return len(self.strings)
+
+
+def split_url(url):
+    # 'http://host/live/user/pass/123.ts' -> ('http://host/live/user/pass/', '123.ts')
+    head, sep, tail = url.rpartition("/")
+    return head + sep, tail
+
+
+# ------- Channel store -------------------------
+class ChannelStore:
+    # Channels kept column-wise, addressed by record id (rid). Rows are a
+    # view over the records through the `order` array so reordering never
+    # touches the columns. URLs and logos share one prefix table, groups
+    # are interned, favourites are one byte per channel.
+
+    COLUMN_ATTRS = ("tvg-id", "tvg-name", "tvg-logo", "group-title", SOURCE_ATTR)
+    UNCHECKED, ALIVE, DEAD = 0, 1, 2
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.order = array("I")         # row -> rid
+        self._pos = None                # rid -> row, built on demand
+        self.names = []
+        self.prefixes = StringTable()   # shared by urls and logos
+        self.url_prefix = array("I")
+        self.url_tail = []
+        self.fav = bytearray()
+        self.favs = set()               # rids of favourites, kept in step with fav
+        self.groups = StringTable()
+        self.group_id = array("I")
+        self.sources = StringTable()    # where each channel came from, see iptv.sources
+        self.source_id = array("I")
+        self.tvg_ids = []
+        self.tvg_names = []
+        self.logo_prefix = array("I")
+        self.logo_tail = []
+        self.sparse = {}                # rid -> (duration, other attrs, extras)
+        self.health = bytearray()       # UNCHECKED / ALIVE / DEAD per channel
+        self.dead = set()               # rids of dead channels, kept in step with health
+
+    def __len__(self):
+        return len(self.order)
+
+    def copy(self):
+        # point-in-time copy for a background reader; each column is one
+        # C-level shallow copy, the strings themselves are shared
+        new = ChannelStore.__new__(ChannelStore)
+        for key, value in self.__dict__.items():
+            new.__dict__[key] = copy.copy(value)
+        return new
+
+    # ------- reading by rid -------
+    def rid(self, row):
+        return self.order[row]
+
+    def row_of(self, rid):
+        pos = self._pos
+        if pos is None:
+            pos = self._pos = array("I", bytes(4 * len(self.names)))
+            for row, r in enumerate(self.order):
+                pos[r] = row
+        return pos[rid]
+
+    def find_row(self, rid):
+        # row_of without building the inverse, for a handful of lookups
+        if self._pos is not None:
+            return self._pos[rid]
+        return self.order.index(rid)
+
+    def order_changed(self):
+        # call after permuting `order` in place
+        self._pos = None
+
+    def move_block(self, first, last, dest):
+        # rows first..last go before row `dest` (pre-move numbering); two
+        # slice memmoves of 4-byte ids, the columns are untouched
+        order = self.order
+        block = order[first:last + 1]
+        del order[first:last + 1]
+        if dest > last:
+            dest -= len(block)
+        order[dest:dest] = block
+        self._pos = None
+
+    def move_rows(self, rows, dest):
+        # all `rows` (any order, need not be contiguous) end up together,
+        # in their current relative order, before row `dest`
+        order = self.order
+        rows = sorted(set(rows))
+        block = array("I", (order[r] for r in rows))
+        rest = array("I")
+        start = 0
+        for r in rows:
+            rest.extend(order[start:r])  # the gaps between moved rows, as slices
+            start = r + 1
+        rest.extend(order[start:])
+        dest -= bisect_left(rows, dest)
+        rest[dest:dest] = block
+        self.order = rest
+        self._pos = None
+
+    def name(self, rid):
+        return self.names[rid]
+
+    def url(self, rid):
+        return self.prefixes.strings[self.url_prefix[rid]] + self.url_tail[rid]
+
+    def is_fav(self, rid):
+        return self.fav[rid] != 0
+
+    def group(self, rid):
+        return self.groups.strings[self.group_id[rid]] or None
+
+    def source(self, rid):
+        return self.sources.strings[self.source_id[rid]] or None
+
+    def tvg_id(self, rid):
+        return self.tvg_ids[rid]
+
+    def logo(self, rid):
+        tail = self.logo_tail[rid]
+        if tail is None:
+            return None
+        return self.prefixes.strings[self.logo_prefix[rid]] + tail
+
+    def attrs(self, rid):
+        attrs = {}
+        if self.tvg_ids[rid] is not None:
+            attrs["tvg-id"] = self.tvg_ids[rid]
+        if self.tvg_names[rid] is not None:
+            attrs["tvg-name"] = self.tvg_names[rid]
+        logo = self.logo(rid)
+        if logo is not None:
+            attrs["tvg-logo"] = logo
+        if self.group_id[rid]:
+            attrs["group-title"] = self.groups.strings[self.group_id[rid]]
+        if self.source_id[rid]:
+            attrs[SOURCE_ATTR] = self.sources.strings[self.source_id[rid]]
+        extra = self.sparse.get(rid)
+        if extra and extra[1]:
+            attrs.update(extra[1])
+        return attrs
+
+    def channel(self, rid):
+        duration, _, extras = self.sparse.get(rid) or (-1, None, ())
+        return Channel(self.names[rid], self.url(rid), duration, self.attrs(rid) or None, extras)
+
+    # ------- writing -------
+    def append(self, items):
+        # items are Channel records or [name, url, fav(, attrs(, duration,
+        # extras))] rows, returns the number appended
+        first = len(self.names)
+        names = self.names
+        prefix_id = self.prefixes.id
+        url_prefix, url_tail = self.url_prefix, self.url_tail
+        group_id = self.group_id
+        groups = self.groups.id
+        source_id = self.source_id
+        sources = self.sources.id
+        tvg_ids, tvg_names = self.tvg_ids, self.tvg_names
+        logo_prefix, logo_tail = self.logo_prefix, self.logo_tail
+        fav = self.fav
+        sparse = self.sparse
+        for item in items:
+            rid = len(names)
+            if isinstance(item, Channel):
+                name, url, duration, attrs, extras = item
+                is_fav = False
+            else:
+                name, url, is_fav = item[0], item[1], item[2]
+                attrs = item[3] if len(item) > 3 else None
+                duration, extras = (item[4], tuple(item[5])) if len(item) > 5 else (-1, ())
+            names.append(name)
+            head, tail = split_url(url)
+            url_prefix.append(prefix_id(head))
+            url_tail.append(tail)
+            if is_fav:
+                fav.append(1)
+                self.favs.add(rid)
+            else:
+                fav.append(0)
+            if attrs:
+                tvg_ids.append(attrs.get("tvg-id"))
+                tvg_name = attrs.get("tvg-name")
+                tvg_names.append(name if tvg_name == name else tvg_name)
+                group_id.append(groups(attrs.get("group-title")))
+                source_id.append(sources(attrs.get(SOURCE_ATTR)))
+                logo = attrs.get("tvg-logo")
+                if logo:
+                    head, tail = split_url(logo)
+                    logo_prefix.append(prefix_id(head))
+                    logo_tail.append(tail)
+                else:
+                    logo_prefix.append(0)
+                    logo_tail.append(None)
+                rest = {k: v for k, v in attrs.items() if k not in self.COLUMN_ATTRS} or None
+            else:
+                tvg_ids.append(None)
+                tvg_names.append(None)
+                group_id.append(0)
+                source_id.append(0)
+                logo_prefix.append(0)
+                logo_tail.append(None)
+                rest = None
+            if rest or extras or duration != -1:
+                sparse[rid] = (duration, rest, extras)
+        count = len(names) - first
+        self.health.extend(bytes(count))
+        rows = len(self.order)
+        self.order.extend(range(first, first + count))
+        if self._pos is not None:
+            self._pos.extend(range(rows, rows + count))
+        return count
+
+    def insert(self, row, items):
+        # append the records, then slot their rids in before `row`
+        count = self.append(items)
+        if count and row < len(self.order) - count:
+            order = self.order
+            block = order[-count:]
+            del order[-count:]
+            order[row:row] = block
+            self._pos = None
+        return count
+
+    def remove_block(self, first, last):
+        # drop rows first..last; their rids stay allocated as empty
+        # tombstones so every other rid (and the search index) stays valid
+        order = self.order
+        for rid in order[first:last + 1]:
+            self.names[rid] = ""
+            self.url_prefix[rid] = 0
+            self.url_tail[rid] = ""
+            self.set_fav(rid, False)
+            self.group_id[rid] = 0
+            self.source_id[rid] = 0
+            self.tvg_ids[rid] = self.tvg_names[rid] = None
+            self.logo_prefix[rid] = 0
+            self.logo_tail[rid] = None
+            self.sparse.pop(rid, None)
+            self.set_health(rid, self.UNCHECKED)
+        del order[first:last + 1]
+        self._pos = None
+
+    def tombstones(self):
+        return len(self.names) - len(self.order)
+
+    def compact(self):
+        # rewrite the columns in row order without the tombstones, so rid
+        # == row afterwards; returns old rid -> new rid (NO_RID for removed
+        # records) for whoever keeps rids, the string tables are kept
+        order = self.order
+        remap = array("I", (NO_RID,)) * len(self.names)
+        for row, rid in enumerate(order):
+            remap[rid] = row
+        for key in ("names", "url_tail", "tvg_ids", "tvg_names", "logo_tail"):
+            column = getattr(self, key)
+            setattr(self, key, [column[rid] for rid in order])
+        for key in ("url_prefix", "group_id", "source_id", "logo_prefix"):
+            column = getattr(self, key)
+            setattr(self, key, array("I", (column[rid] for rid in order)))
+        self.fav = bytearray(self.fav[rid] for rid in order)
+        self.health = bytearray(self.health[rid] for rid in order)
+        self.favs = {remap[rid] for rid in self.favs}
+        self.dead = {remap[rid] for rid in self.dead}
+        self.sparse = {remap[rid]: extra for rid, extra in self.sparse.items()}
+        self.order = array("I", range(len(order)))
+        self._pos = None
+        return remap
+
+    def replace(self, rid, channel):
+        # new name, url and attributes for an existing record, keeping its
+        # row and favourite flag
+        name, url, duration, attrs, extras = channel
+        attrs = attrs or {}
+        self.names[rid] = name
+        if url != self.url(rid):
+            self.set_health(rid, self.UNCHECKED)  # checked a different stream
+        head, tail = split_url(url)
+        self.url_prefix[rid] = self.prefixes.id(head)
+        self.url_tail[rid] = tail
+        self.tvg_ids[rid] = attrs.get("tvg-id")
+        tvg_name = attrs.get("tvg-name")
+        self.tvg_names[rid] = name if tvg_name == name else tvg_name
+        self.group_id[rid] = self.groups.id(attrs.get("group-title"))
+        self.source_id[rid] = self.sources.id(attrs.get(SOURCE_ATTR))
+        logo = attrs.get("tvg-logo")
+        if logo:
+            head, tail = split_url(logo)
+            self.logo_prefix[rid] = self.prefixes.id(head)
+            self.logo_tail[rid] = tail
+        else:
+            self.logo_prefix[rid] = 0
+            self.logo_tail[rid] = None
+        rest = {k: v for k, v in attrs.items() if k not in self.COLUMN_ATTRS} or None
+        if rest or extras or duration != -1:
+            self.sparse[rid] = (duration, rest, extras)
+        else:
+            self.sparse.pop(rid, None)
+
+    def set_fav(self, rid, value):
+        if value:
+            self.fav[rid] = 1
+            self.favs.add(rid)
+        else:
+            self.fav[rid] = 0
+            self.favs.discard(rid)
+
+    def set_health(self, rid, value):
+        self.health[rid] = value
+        if value == self.DEAD:
+            self.dead.add(rid)
+        else:
+            self.dead.discard(rid)
+
+    def set_name(self, rid, name):
+        self.names[rid] = name
+
+    # ------- iterating in row order -------
+    def rows(self):
+        # [name, url, fav] plus the attrs dict when there is one, then the
+        # duration and extra lines when they are not the defaults
+        sparse = self.sparse
+        for rid in self.order:
+            attrs = self.attrs(rid)
+            row = [self.names[rid], self.url(rid), self.fav[rid] != 0]
+            extra = sparse.get(rid)
+            if extra and (extra[0] != -1 or extra[2]):
+                row += [attrs, extra[0], list(extra[2])]
+            elif attrs:
+                row.append(attrs)
+            yield row
+
+    def channels(self, rids=None):
+        for rid in self.order if rids is None else rids:
+            yield self.channel(rid)
+
+    def scan(self, start, stop):
+        # (rid, group, source, tvg-id, tvg-country) of records start..stop-1,
+        # what the query index is built from
+        groups, sources, sparse = self.groups.strings, self.sources.strings, self.sparse
+        for rid in range(start, stop):
+            extra = sparse.get(rid)
+            country = extra[1].get("tvg-country") if extra and extra[1] else None
+            yield rid, groups[self.group_id[rid]], sources[self.source_id[rid]], self.tvg_ids[rid], country
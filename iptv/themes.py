@@ -0,0 +1,117 @@
+# Simple IPTV thing - theme stylesheets: rendered once, cached on disk
+# github.com/tugbaot/simple-iptv
+
+import hashlib
+import json
+import platform
+import shutil
+import sys
+import tempfile
+from importlib.util import find_spec
+from pathlib import Path
+from xml.etree import ElementTree
+
+
+def qt_material_dir():
+    # found without importing it: qt_material pulls in jinja2 and friends
+    return Path(find_spec("qt_material").origin).parent
+
+
+class ThemeCache:
+    # The final stylesheet of each qt_material theme in `themes`, rendered
+    # once with the app's font and kept in its own directory: theme.json
+    # (the QSS and the primary colour) and the theme's recoloured icons,
+    # which the QSS points at by path. Entries are keyed by the theme file,
+    # the font and qt_material's template, so changing any of them renders
+    # it again, and a hit needs neither qt_material nor jinja2. Rendering
+    # touches no Qt, so themes can be rendered on any thread.
+
+    def __init__(self, directory, themes, font_family, font_size):
+        self.directory = Path(directory)
+        self.themes = Path(themes)
+        self.font_family = font_family
+        self.font_size = font_size
+        self._template = None  # hash of qt_material's template
+
+    def names(self):
+        return sorted(path.stem for path in self.themes.glob("*.xml"))
+
+    def key(self, name):
+        if self._template is None:
+            self._template = hashlib.sha1((qt_material_dir() / "material.qss.template").read_bytes()).digest()
+        h = hashlib.sha1(self._template)
+        h.update((self.themes / f"{name}.xml").read_bytes())
+        h.update(f"\0{self.font_family}\0{self.font_size}\0{platform.system()}".encode("utf-8"))
+        return h.hexdigest()[:16]
+
+    def _path(self, name, key):
+        return self.directory / f"{name}-{key}"
+
+    def get(self, name):
+        # -> (qss, primary colour), or None when it isn't rendered yet
+        try:
+            data = json.loads((self._path(name, self.key(name)) / "theme.json").read_text("utf-8"))
+            return data["qss"], data["primary"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def load(self, name):
+        # -> (qss, primary colour), rendering it if needed; OSError for a
+        # theme that doesn't exist
+        return self.get(name) or self.render(name)
+
+    def render(self, name):
+        from qt_material import density, opacity
+        from qt_material.resources import ResourseGenerator
+        import jinja2
+
+        key = self.key(name)
+        root = ElementTree.parse(self.themes / f"{name}.xml").getroot()
+        theme = {color.get("name"): color.text for color in root.iter("color")}
+        # build_stylesheet's defaults, then the font
+        theme.setdefault("icon", None)
+        theme.setdefault("danger", "#dc3545")
+        theme.setdefault("warning", "#ffc107")
+        theme.setdefault("success", "#17a2b8")
+        theme.setdefault("density_scale", "0")
+        theme.setdefault("button_shape", "default")
+        theme.update(font_family=self.font_family, font_size=self.font_size)
+        system = platform.system()
+        theme.update(linux=system == "Linux", windows=system == "Windows", darwin=system == "Darwin",
+                     pyqt6="PyQt6" in sys.modules, pyside6="PySide6" in sys.modules)
+
+        env = jinja2.Environment(autoescape=False, loader=jinja2.FileSystemLoader(str(qt_material_dir())))
+        env.filters["opacity"] = opacity
+        env.filters["density"] = density
+        qss = env.get_template("material.qss.template").render(theme)
+
+        # built beside the final directory, then renamed into place, so a
+        # half-written entry is never read and two renders can't collide
+        self.directory.mkdir(parents=True, exist_ok=True)
+        final = self._path(name, key)
+        tmp = Path(tempfile.mkdtemp(dir=self.directory, prefix=".render-")).resolve()  # qt_material puts relative ones in ~
+        try:
+            ResourseGenerator(
+                primary=theme["primaryColor"],
+                secondary=theme["secondaryColor"],
+                disabled=theme["secondaryLightColor"],
+                source=str(qt_material_dir() / "resources" / "source"),
+                parent=str(tmp / "icons"),
+            ).generate()
+            qss = qss.replace("icon:/", (final / "icons").resolve().as_posix() + "/")
+            data = {"theme": name, "primary": theme["primaryColor"], "qss": qss}
+            (tmp / "theme.json").write_text(json.dumps(data), "utf-8")
+            try:
+                tmp.rename(final)
+            except OSError:
+                pass  # rendered meanwhile by someone else
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.prune(name, key)
+        return qss, theme["primaryColor"]
+
+    def prune(self, name, key):
+        # earlier renders of this theme, for an older file or font
+        for path in self.directory.glob(f"{name}-*"):
+            if path.name != f"{name}-{key}" and path.name.rpartition("-")[0] == name:
+                shutil.rmtree(path, ignore_errors=True)
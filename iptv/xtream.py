@@ -0,0 +1,136 @@
+# Simple IPTV thing - Xtream Codes live catalog
+# github.com/tugbaot/simple-iptv
+
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from iptv.cache import PlaylistCache
+from iptv.m3u import Channel
+
+_intern = sys.intern
+
+
+class XtreamError(Exception):
+    pass
+
+
+class ResponseCache(PlaylistCache):
+    # Raw player_api.php responses, reused for a while without asking the
+    # server again (the API sends no validators to revalidate with)
+    SUFFIX = ".json.gz"
+
+
+# ------- Client --------------------------------
+class XtreamClient:
+    # Only the live side of player_api.php: categories, then the streams of
+    # each category, fetched over at most `connections` connections since
+    # providers cap how many a login may hold open.
+
+    def __init__(self, url, username, password, cache=None, ttl=3600, connections=2, timeout=30):
+        self.url = url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.cache = cache
+        self.ttl = ttl
+        self.connections = max(1, connections)
+        self.timeout = timeout
+        self.stale = True  # every response so far came from the cache
+        self._session = None
+
+    def session(self):
+        if self._session is None:
+            import requests  # slow to import, only needed once something is fetched
+            from requests.adapters import HTTPAdapter
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.connections, pool_block=True)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def cache_key(self, action=None, **params):
+        # the request URL without the password, it ends up in the cache index
+        query = {"username": self.username}
+        if action:
+            query["action"] = action
+        query.update(params)
+        return f"{self.url}/player_api.php?" + urlencode(query)
+
+    def api(self, action=None, **params):
+        query = {"username": self.username, "password": self.password}
+        if action:
+            query["action"] = action
+        query.update(params)
+        key = self.cache_key(action, **params)
+        if action and self.cache is not None and self.cache.fresh(key, self.ttl):
+            with self.cache.open(key) as f:
+                return json.load(f)
+
+        r = self.session().get(f"{self.url}/player_api.php", params=query, timeout=self.timeout)
+        r.raise_for_status()
+        body = r.content
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise XtreamError(f"{action or 'login'}: not a JSON response") from None
+        if action:
+            self.stale = False
+        if action and self.cache is not None:
+            writer = self.cache.writer(key)
+            writer.write(body)
+            writer.commit()
+        return data
+
+    def authenticate(self):
+        info = self.api()
+        user = info.get("user_info") if isinstance(info, dict) else None
+        if not user or str(user.get("auth")) != "1":
+            raise XtreamError("Login failed.")
+        return user
+
+    def live_categories(self):
+        return self.api("get_live_categories") or []
+
+    def live_streams(self, category_id):
+        return self.api("get_live_streams", category_id=category_id) or []
+
+    def stream_url(self, stream_id, ext="ts"):
+        return f"{self.url}/live/{self.username}/{self.password}/{stream_id}.{ext}"
+
+    def _category(self, category):
+        group = _intern(category.get("category_name") or "")
+        channels = []
+        for s in self.live_streams(category.get("category_id")):
+            name = s.get("name")
+            stream_id = s.get("stream_id")
+            if not name or stream_id is None:
+                continue
+            attrs = {"tvg-name": name, "group-title": group}
+            if s.get("epg_channel_id"):
+                attrs["tvg-id"] = s["epg_channel_id"]
+            if s.get("stream_icon"):
+                attrs["tvg-logo"] = s["stream_icon"]
+            channels.append(Channel(name, self.stream_url(stream_id), -1, attrs))
+        return channels
+
+    def load_live(self, categories=None, cancelled=lambda: False):
+        # yields one list of Channel records per category, in the provider's
+        # category order, while later categories are still downloading
+        if categories is None:
+            categories = self.live_categories()
+        with ThreadPoolExecutor(self.connections) as pool:
+            futures = [pool.submit(self._category, c) for c in categories]
+            try:
+                for future in futures:
+                    if cancelled():
+                        return
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
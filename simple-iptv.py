@@ -2,35 +2,50 @@
 # Created: 02/02/2026 
 # Simple IPTV thing
 # github.com/tugbaot/simple-iptv
-#####################################
-# TO DO
-# save & restore favs on xtream load
-#####################################
 
 import sys
+from time import perf_counter
+STARTED = perf_counter()  # before the heavy imports, for --startup-profile
+
 import os
-import json
-import subprocess
 import configparser
-import requests
-from time import sleep
+import queue
+from bisect import bisect_left, bisect_right
+from array import array
+from collections import OrderedDict
+from time import monotonic, localtime, strftime, time
 from pathlib import Path
 from urllib.parse import urlparse, parse_qs
-from fake_useragent import UserAgent
-from pyxtream import XTream
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QPushButton, QFileDialog, QGridLayout,
     QVBoxLayout, QHBoxLayout, QInputDialog, QMessageBox,
     QLineEdit, QListView, QStyledItemDelegate, QAbstractItemView,
-    QStatusBar, QStyle, QDialog, QLabel
+    QStatusBar, QStyle, QDialog, QLabel, QTreeView, QStackedWidget
 )
-from PySide6.QtCore import Qt, QSize, QSortFilterProxyModel, QRect, QEvent, QModelIndex, QAbstractListModel, QMimeData, QByteArray, QDataStream, QIODevice, QTimer
-from PySide6.QtGui import QIcon, QPainter, QTextOption
+from PySide6.QtCore import Qt, QSize, QAbstractProxyModel, QPersistentModelIndex, QRect, QEvent, QModelIndex, QPoint, QAbstractItemModel, QAbstractListModel, QMimeData, QByteArray, QDataStream, QIODevice, QTimer, QThread, QObject, Signal, QBuffer
+from PySide6.QtGui import QIcon, QPainter, QTextOption, QFont, QShortcut, QKeySequence, QImage, QPixmap, QColor, QPalette, QFontDatabase
 
-from qt_material import apply_stylesheet
 import qtawesome as qta
 
+from iptv.cache import PlaylistCache, conditional_get
+from iptv.diff import diff_playlist
+from iptv.diskstore import DiskSearch, DiskState, DiskStore
+from iptv.epg import EpgGuide, build_epg
+from iptv.export import export
+from iptv.health import HealthCache, HealthChecker
+from iptv.logos import LogoFetcher, ThumbnailCache
+from iptv.m3u import CHUNK_SIZE, parse_m3u
+from iptv.metrics import metrics, rss_bytes
+from iptv.player import MpvController
+from iptv.query import QueryError, QueryIndex, highlight
+from iptv.search import SearchIndex
+from iptv.sources import SOURCE_ATTR, XTREAM, Deduper, SourceStats, parse_sources
+from iptv.state import StateStore, atomic_write, write_snapshot
+from iptv.store import ChannelStore
+from iptv.themes import ThemeCache, qt_material_dir
+from iptv.xtream import ResponseCache, XtreamClient
+
 # ------- Use script path -----------------------
 abspath = os.path.abspath(__file__)
 dname = os.path.dirname(abspath)
@@ -57,6 +72,26 @@ APP_HEIGHT       = config.getint('config', 'app_height', fallback=600)
 APP_WIDTH        = config.getint('config', 'app_width', fallback=480)
 FULLSCREEN       = config.getboolean('config', 'fullscreen', fallback=False)
 MINIMISE         = config.getboolean('config', 'minimise', fallback=False)
+AUTOSAVE_MS      = 2000            # quiet time after a bulk change before snapshotting
+COMPACT_MS       = 5 * 60 * 1000   # fold the journal into the snapshot this often
+COMPACT_OPS      = 1000            # ... or after this many journaled changes
+CACHE_DIR        = config.get('config', 'cache_dir', fallback='cache')
+CACHE_SIZE_MB    = config.getint('config', 'cache_size_mb', fallback=200)
+CHECK_CONCURRENCY = config.getint('config', 'check_concurrency', fallback=50)
+CHECK_PER_HOST   = config.getint('config', 'check_per_host', fallback=4)
+CHECK_TIMEOUT    = config.getfloat('config', 'check_timeout', fallback=8)
+CHECK_CACHE_HOURS = config.getfloat('config', 'check_cache_hours', fallback=6)
+SOURCES_FILE     = config.get('config', 'sources_file', fallback='sources.txt')
+EPG_URL          = config.get('config', 'epg_url', fallback='')
+EPG_REFRESH_HOURS = config.getfloat('config', 'epg_refresh_hours', fallback=12)
+SHOW_METRICS     = config.getboolean('config', 'show_metrics', fallback=False)
+TRACE_DIR        = config.get('config', 'trace_dir', fallback='traces')
+DISK_STORE       = config.get('config', 'disk_store', fallback='').strip()
+SHOW_LOGOS       = config.getboolean('config', 'show_logos', fallback=True)
+LOGO_CONNECTIONS = config.getint('config', 'logo_connections', fallback=6)
+LOGO_PER_HOST    = config.getint('config', 'logo_per_host', fallback=2)
+LOGO_CACHE_MB    = config.getint('config', 'logo_cache_mb', fallback=50)
+LOGO_PREFETCH    = 20              # rows above and below the view whose logos are fetched too
 
 # Star colors – loaded dynamically can be refreshed
 STAR_COLOR = None
@@ -74,6 +109,8 @@ IPTV_NAME        = config.get('xtream', 'IPTV_NAME')
 IPTV_URL         = config.get('xtream', 'IPTV_URL')
 IPTV_USER        = config.get('xtream', 'IPTV_USER')
 IPTV_PASS        = config.get('xtream', 'IPTV_PASS')
+XTREAM_CONNECTIONS = config.getint('xtream', 'connections', fallback=2)
+XTREAM_CACHE_MIN   = config.getint('xtream', 'cache_minutes', fallback=60)
 
 # ------- Button style --------------------------
 BUTTON_STYLE = (
@@ -81,17 +118,38 @@ BUTTON_STYLE = (
     "font-weight: normal; border-width: 0.5px"
 )
 
+# ------- Save dialog ---------------------------
+EXPORT_FILTERS = {  # file dialog filter -> suffix added when none was typed
+    "M3U (*.m3u *.m3u8)": ".m3u",
+    "Compressed M3U (*.m3u.gz)": ".m3u.gz",
+    "JSON Lines (*.jsonl *.jsonl.gz)": ".jsonl",
+    "XSPF (*.xspf)": ".xspf",
+}
+
+# ------- Search help ---------------------------
+SEARCH_HELP = """Plain text matches channel names. Or combine terms:
+  group:sports  source:name  country:uk  fav:yes  status:dead
+  name:"two words"  name:/hd$/  (a regex)
+  -term or NOT term,  a OR b,  (brackets)
+e.g.  group:sports fav:yes -adult country:uk name:/hd$/"""
+
 # ------- Info popup ----------------------------
 INFO = """A simple, lightweight IPTV manager using mpv to play channels.
 
 Features:
-• Search channels
+• Search channels, or query: group:news fav:yes -adult …
 • Favourites (toggle view / star items)
 • Open local M3U
 • Load from URL (m3u or Xstream)
-• Save m3u playlist (all or favourites only)
+• Sources: several playlists and Xtream merged, duplicates dropped
+• Save m3u playlist (all, favourites or the current view; also .m3u.gz, JSON Lines, XSPF)
 • Save json (playlist and favs)
+• Channel logos, fetched in the background
 • Drag to reorder
+• Check streams (hide dead channels)
+• Groups: browse by group / Xtream category
+• Guide: now / next from an XMLTV file or URL
+• Huge lists kept on disk (disk_store in config.txt)
 • Clear list
 • Theme selection
 
@@ -99,47 +157,181 @@ Customize via config.txt and theme.xml
 
 ⛬ https://github.com/tugbaot/simple-iptv"""
 
+def write_config():
+    atomic_write('config.txt', config.write)
+
+themes = ThemeCache(Path(CACHE_DIR) / "themes", "themes", APP_FONT, APP_FONT_SIZE)
+
+def apply_theme(app, theme):
+    # what qt_material's apply_stylesheet does, with the stylesheet from the
+    # theme cache: only a theme or font never used before is rendered
+    name = theme.removesuffix(".xml")
+    try:
+        with metrics.span("theme"):
+            qss, primary = themes.load(name)
+    except OSError as e:
+        metrics.error("Theme failed", e)
+        return
+    except Exception as e:
+        # the cache renders with qt_material's internals, pinned in
+        # requirements.txt; should another version break that, its own
+        # apply_stylesheet still works, only slower
+        metrics.error("Theme cache failed", e)
+        try:
+            from qt_material import apply_stylesheet
+            apply_stylesheet(app, theme=f"themes/{name}.xml",
+                             extra={"font_family": APP_FONT, "font_size": APP_FONT_SIZE})
+        except Exception as e:
+            metrics.error("Theme failed", e)
+        return
+    if app.style().name() != "fusion":
+        app.setStyle("Fusion")
+    palette = app.palette()
+    color = QColor(primary)
+    color.setAlpha(92)
+    palette.setColor(QPalette.Text, color)
+    app.setPalette(palette)
+    app.setStyleSheet(qss)
+
+def add_theme_fonts():
+    # qt_material ships Roboto, the rest are the system's
+    if "roboto" in APP_FONT.lower():
+        for font in (qt_material_dir() / "fonts" / "roboto").glob("*.ttf"):
+            QFontDatabase.addApplicationFont(str(font))
+
+# ------- Startup profile -----------------------
+STARTUP_PROFILE = "--startup-profile" in sys.argv
+TRACE_FILE = sys.argv[sys.argv.index("--trace") + 1] if "--trace" in sys.argv[:-1] else None
+startup_marks = [("start", STARTED)]
+
+def startup_mark(phase):
+    startup_marks.append((phase, perf_counter()))
+
+def startup_report():
+    metrics.gauge("startup_ms", {phase: round((t - prev) * 1000, 1)
+                                 for (_, prev), (phase, t) in zip(startup_marks, startup_marks[1:])})
+    if not STARTUP_PROFILE:
+        return
+    print("Startup profile:")
+    for (_, prev), (phase, t) in zip(startup_marks, startup_marks[1:]):
+        print(f"  {phase:<14}{(t - prev) * 1000:8.1f} ms")
+    print(f"  {'total':<14}{(startup_marks[-1][1] - STARTED) * 1000:8.1f} ms")
+
 # ------- Logging stuff -------------------------
 if sys.stdout is None:
     sys.stdout = open(os.devnull, 'w')
 if sys.stderr is None:
     sys.stderr = open(os.devnull, 'w')
+sys.excepthook = metrics.excepthook
 
 # ------- Custom Model --------------------------
 class PlaylistModel(QAbstractListModel):
-    NameRole = Qt.UserRole + 1
-    UrlRole  = Qt.UserRole + 2
-    FavRole  = Qt.UserRole + 3
-
-    def __init__(self, parent=None):
+    NameRole  = Qt.UserRole + 1
+    UrlRole   = Qt.UserRole + 2
+    FavRole   = Qt.UserRole + 3
+    GroupRole = Qt.UserRole + 4
+    TvgIdRole = Qt.UserRole + 5
+    LogoRole  = Qt.UserRole + 6
+    HealthRole = Qt.UserRole + 7   # True alive, False dead, None unchecked
+    EpgRole   = Qt.UserRole + 8    # (now, next) Programmes or None
+
+    MOVE_RUNS = 32  # more separate runs than this are moved as one layout change
+    COMPACT_MIN = 10000  # removed records kept as tombstones before a compaction is worth it
+
+    moved = Signal(object, int)  # rows, dest as passed to move_rows
+    compacted = Signal(object)   # old rid -> new rid, see ChannelStore.compact
+
+    def __init__(self, store=None, parent=None):
         super().__init__(parent)
-        self._playlist = []  # [name: str, url: str, favourite: bool]
+        # columnar, rows map to records via _store.order; a DiskStore keeps
+        # the records in a file and is searched there too
+        self._store = store if store is not None else ChannelStore()
+        self.epoch = 0                # bumped by clear() and compact(), rids from before are void
+        if isinstance(self._store, DiskStore):
+            self.search_index = DiskSearch(self._store)
+        else:
+            self.search_index = SearchIndex(self._store.names)
+        self.query_index = QueryIndex(self._store, self.search_index)  # what the search box runs
+        self.guide = None             # EpgGuide, set once there is one
+
+    def rid(self, row):
+        return self._store.order[row]
+
+    def row_of(self, rid):
+        return self._store.row_of(rid)
+
+    def favourite_rids(self):
+        # live set of favourite record ids, updated by setData(FavRole)
+        return self._store.favs
+
+    def dead_rids(self):
+        # live set of record ids whose last check failed
+        return self._store.dead
 
     def rowCount(self, parent=QModelIndex()):
-        return 0 if parent.isValid() else len(self._playlist)
+        return 0 if parent.isValid() else len(self._store)
 
     def data(self, index, role=Qt.DisplayRole):
         if not index.isValid():
             return None
-        item = self._playlist[index.row()]
+        store = self._store
+        rid = store.order[index.row()]
         if role in (Qt.DisplayRole, self.NameRole):
-            return item[0]
-        if role == self.UrlRole:
-            return item[1]
+            return store.names[rid]
         if role == self.FavRole:
-            return item[2]
+            return store.fav[rid] != 0
+        if role == self.UrlRole:
+            return store.url(rid)
+        if role == self.GroupRole:
+            return store.group(rid)
+        if role == self.TvgIdRole:
+            return store.tvg_id(rid)
+        if role == self.LogoRole:
+            return store.logo(rid)
+        if role == self.HealthRole:
+            health = store.health[rid]
+            return None if health == store.UNCHECKED else health == store.ALIVE
+        if role == self.EpgRole:
+            return self.now_next(rid)
+        if role == Qt.ToolTipRole:
+            guide = self.now_next(rid)
+            if guide is None:
+                return None
+            now, nxt = guide
+            lines = []
+            if now is not None:
+                lines.append(f"Now: {strftime('%H:%M', localtime(now.start))}–"
+                             f"{strftime('%H:%M', localtime(now.stop))} {now.title}")
+            if nxt is not None:
+                lines.append(f"Next: {strftime('%H:%M', localtime(nxt.start))} {nxt.title}")
+            return "\n".join(lines)
         return None
 
+    def now_next(self, rid):
+        # linked by tvg-id, or by the guide's display names when there is none
+        guide = self.guide
+        if not guide:
+            return None
+        store = self._store
+        channel = store.tvg_ids[rid]
+        if not channel:
+            channel = guide.channel_for_name(store.tvg_names[rid] or store.names[rid])
+            if channel is None:
+                return None
+        now, nxt = guide.now_next(channel)
+        return (now, nxt) if now is not None or nxt is not None else None
+
     def setData(self, index, value, role=Qt.EditRole):
         if not index.isValid():
             return False
-        row = index.row()
+        rid = self._store.order[index.row()]
         changed = False
         if role == self.FavRole:
-            self._playlist[row][2] = bool(value)
+            self._store.set_fav(rid, bool(value))
             changed = True
         elif role == self.NameRole:
-            self._playlist[row][0] = str(value).strip()
+            self._store.set_name(rid, str(value).strip())
+            self.search_index.rename(rid)
             changed = True
         if changed:
             self.dataChanged.emit(index, index, [role])
@@ -191,44 +383,187 @@ class PlaylistModel(QAbstractListModel):
         for _ in range(count):
             source_rows.append(stream.readInt32())
 
-        source_rows.sort(reverse=True)
-
-        dest_row = row
+        self.move_rows(source_rows, row)
+        return True
 
-        self.beginResetModel()  # safe for small-medium lists
-        for src_row in source_rows:
-            item = self._playlist.pop(src_row)
-            if src_row < dest_row:
-                dest_row -= 1
-            self._playlist.insert(dest_row, item)
-        self.endResetModel()
+    def move_rows(self, rows, dest):
+        # Contiguous runs are moved with beginMoveRows so the view keeps its
+        # selection, scroll position and layout. A scattered selection with
+        # many runs is applied in one pass as a single layout change.
+        rows = sorted(set(rows))
+        if not rows:
+            return
+        runs = []
+        for r in rows:
+            if runs and r == runs[-1][1] + 1 and r != dest:
+                runs[-1][1] = r
+            else:
+                runs.append([r, r])
+
+        if len(runs) > self.MOVE_RUNS:
+            self.layoutAboutToBeChanged.emit()
+            persistent = self.persistentIndexList()
+            rids = [self._store.order[i.row()] for i in persistent]
+            self._store.move_rows(rows, dest)
+            self.changePersistentIndexList(
+                persistent, [self.index(self._store.find_row(rid)) for rid in rids])
+            self.layoutChanged.emit()
+            self.moved.emit(rows, dest)
+            return
 
-        return True
+        # runs above the drop point are pulled down under it (closest
+        # first), runs below it are pulled up (closest first)
+        insert = dest
+        for first, last in reversed([r for r in runs if r[1] < dest]):
+            if last + 1 != insert:
+                self.beginMoveRows(QModelIndex(), first, last, QModelIndex(), insert)
+                self._store.move_block(first, last, insert)
+                self.endMoveRows()
+            insert -= last - first + 1
+        insert = dest
+        for first, last in (r for r in runs if r[0] >= dest):
+            if first != insert:
+                self.beginMoveRows(QModelIndex(), first, last, QModelIndex(), insert)
+                self._store.move_block(first, last, insert)
+                self.endMoveRows()
+            insert += last - first + 1
+        self.moved.emit(rows, dest)
 
     def append_items(self, items):
+        # items: Channel records or [name, url, fav] rows
         if not items:
             return
-        first = len(self._playlist)
+        first = len(self._store)
         last = first + len(items) - 1
-        self.beginInsertRows(QModelIndex(), first, last)
-        self._playlist.extend(items)
-        self.endInsertRows()
+        with metrics.span("model.insert"):
+            self.beginInsertRows(QModelIndex(), first, last)
+            self._store.append(items)
+            self.endInsertRows()
+
+    def apply_diff(self, diff):
+        # a refresh as row updates, removes and inserts, so favourites,
+        # the user's order, selection and scroll position all survive
+        store = self._store
+        if diff.updated:
+            for rid, channel in diff.updated:
+                renamed = store.names[rid] != channel.name
+                store.replace(rid, channel)
+                if renamed:
+                    self.search_index.rename(rid)
+            rows = [store.row_of(rid) for rid, _ in diff.updated]
+            self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)),
+                                  [self.NameRole, self.UrlRole, self.GroupRole, self.TvgIdRole, self.LogoRole])
+
+        # removed rids to runs of the rows they are on now
+        runs = []
+        for r in sorted(store.row_of(rid) for rid in diff.removed):
+            if runs and r == runs[-1][1] + 1:
+                runs[-1][1] = r
+            else:
+                runs.append([r, r])
+        for first, last in reversed(runs):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            rids = store.order[first:last + 1]
+            store.remove_block(first, last)
+            for rid in rids:
+                self.search_index.drop(rid)
+            self.endRemoveRows()
+
+        if diff.updated or diff.removed:
+            self.query_index.reset()  # groups and sources changed, or records went
+
+        # anchors are rids, so their rows are looked up after the removals;
+        # inserting bottom-up keeps the rows above valid
+        inserts = sorted((((0 if anchor is None else store.row_of(anchor) + 1), channels)
+                          for anchor, channels in diff.added), key=lambda ins: ins[0])
+        for row, channels in reversed(inserts):
+            self.beginInsertRows(QModelIndex(), row, row + len(channels) - 1)
+            store.insert(row, channels)
+            self.endInsertRows()
+
+        # every removal leaves a tombstone in each column and index; once
+        # they are a good part of the list the records are rewritten
+        if store.tombstones() > max(self.COMPACT_MIN, len(store) // 4):
+            self.compact()
+
+    def compact(self):
+        # rows stay as they are, only the rids change: anything holding
+        # rids remaps them from the signal, or is voided by the epoch
+        with metrics.span("model.compact"), self.query_index.lock:
+            remap = self._store.compact()
+            if remap is None:
+                return
+            self.epoch += 1
+            self.search_index.reset(self._store.names)
+            self.query_index.reset()
+        self.compacted.emit(remap)
+
+    def set_health(self, results):
+        # results: (rid, url, Health) from a check of this epoch; a record
+        # whose URL changed since (or that was removed) is left alone
+        store = self._store
+        rows = []
+        for rid, url, health in results:
+            if store.url(rid) != url:
+                continue
+            store.set_health(rid, store.ALIVE if health.alive else store.DEAD)
+            rows.append(store.row_of(rid))
+        # one signal per run of adjacent rows: a span over unchanged rows
+        # would have a filtering proxy re-check every row in it
+        rows = sorted(set(rows))
+        start = rows[0] if rows else None
+        for prev, row in zip(rows, rows[1:] + [None]):
+            if row != prev + 1:
+                self.dataChanged.emit(self.index(start), self.index(prev), [self.HealthRole])
+                start = row
 
     def clear(self):
-        if not self._playlist:
+        if not len(self._store):
             return
-        self.beginRemoveRows(QModelIndex(), 0, len(self._playlist) - 1)
-        self._playlist.clear()
+        self.beginRemoveRows(QModelIndex(), 0, len(self._store) - 1)
+        self.epoch += 1
+        with self.query_index.lock:  # new columns, not while the search thread reads
+            self._store.clear()
+            self.search_index.reset(self._store.names)
+            self.query_index.reset()
         self.endRemoveRows()
 
-    def get_playlist_copy(self):
-        return [item[:] for item in self._playlist]
+    def iter_rows(self):
+        return self._store.rows()
+
+    def snapshot(self):
+        # private copy of the columns for a background writer
+        return self._store.copy()
+
+    def iter_channels(self):
+        return self._store.channels()
+
+    def group_ids(self, rows):
+        # group-title ids of source rows, 0 = no group
+        order, group_id = self._store.order, self._store.group_id
+        return [group_id[order[row]] for row in rows]
+
+    def group_name(self, gid):
+        return self._store.groups.strings[gid]
 
 # ------- Custom Proxy for Favourites -----------
-class FavouriteFilterProxy(QSortFilterProxyModel):
+class FavouriteFilterProxy(QAbstractProxyModel):
+    # Filters the playlist by record-id sets (search hits, favourites).
+    # With no filter on, rows map 1:1 with no table at all. Otherwise the
+    # accepted source rows are kept sorted, built from the smallest set,
+    # so showing favourites costs O(favourites) rather than a pass over
+    # every row, and a star toggle inserts or removes just that row.
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self._show_only_favourites = False
+        self._hide_dead = False
+        self._search = None      # record ids matching the search, None = no search
+        self.search_text = ""
+        self._rows = None        # sorted accepted source rows, None = all rows
+        self._count = 0          # row count while unfiltered
+        self._removing = None
+        self._saved = []
 
     @property
     def show_only_favourites(self):
@@ -238,101 +573,656 @@ class FavouriteFilterProxy(QSortFilterProxyModel):
     def show_only_favourites(self, value: bool):
         if value != self._show_only_favourites:
             self._show_only_favourites = value
-            self.invalidate()
+            self.refilter()
 
-    def filterAcceptsRow(self, source_row, source_parent):
-
-        if not super().filterAcceptsRow(source_row, source_parent):
+    @property
+    def hide_dead(self):
+        return self._hide_dead
+
+    @hide_dead.setter
+    def hide_dead(self, value: bool):
+        if value != self._hide_dead:
+            self._hide_dead = value
+            self.refilter()
+
+    def set_search(self, text, rows):
+        self.search_text = text
+        self._search = rows
+        self.refilter()
+
+    def refilter(self):
+        self._begin_relayout()
+        self._end_relayout()
+
+    def source_rows(self):
+        # the source rows on show, in order
+        if self._rows is None:
+            return list(range(self._count))
+        return list(self._rows)
+
+    def source_row(self, row):
+        return row if self._rows is None else self._rows[row]
+
+    # ------- filtering -------
+    def _filtered(self):
+        return self._search is not None or self._show_only_favourites or self._hide_dead
+
+    def _accepts(self, rid):
+        if self._search is not None and rid not in self._search:
             return False
+        if self._hide_dead and rid in self.sourceModel().dead_rids():
+            return False
+        return not self._show_only_favourites or rid in self.sourceModel().favourite_rids()
 
-        if not self._show_only_favourites:
-            return True
+    def _build(self):
+        if not self._filtered():
+            self._count = self.sourceModel().rowCount()
+            return None
+        sets = [self._search] if self._search is not None else []
+        if self._show_only_favourites:
+            sets.append(self.sourceModel().favourite_rids())
+        model = self.sourceModel()
+        if not sets:
+            # only hiding dead channels: one pass over the rows
+            dead = model.dead_rids()
+            return [row for row in range(model.rowCount()) if model.rid(row) not in dead]
+        candidates = min(sets, key=len)
+        return sorted(model.row_of(rid) for rid in candidates if self._accepts(rid))
+
+    def _begin_relayout(self):
+        self.layoutAboutToBeChanged.emit()
+        self._saved = [(pi, QPersistentModelIndex(self.mapToSource(pi)))
+                       for pi in self.persistentIndexList()]
+
+    def _end_relayout(self):
+        with metrics.span("filter"):
+            self._rows = self._build()
+            saved, self._saved = self._saved, []
+            if saved:
+                self.changePersistentIndexList(
+                    [pi for pi, _ in saved],
+                    [self.mapFromSource(QModelIndex(si)) for _, si in saved])
+            self.layoutChanged.emit()
+
+    # ------- proxy plumbing -------
+    def setSourceModel(self, model):
+        self.beginResetModel()
+        super().setSourceModel(model)
+        model.rowsAboutToBeInserted.connect(self._on_rows_about_to_be_inserted)
+        model.rowsInserted.connect(self._on_rows_inserted)
+        model.rowsAboutToBeRemoved.connect(self._on_rows_about_to_be_removed)
+        model.rowsRemoved.connect(self._on_rows_removed)
+        model.rowsAboutToBeMoved.connect(self._on_rows_about_to_be_moved)
+        model.rowsMoved.connect(self._on_rows_moved)
+        model.modelAboutToBeReset.connect(self.beginResetModel)
+        model.modelReset.connect(self._on_model_reset)
+        model.layoutAboutToBeChanged.connect(self._begin_relayout)
+        model.layoutChanged.connect(self._end_relayout)
+        model.dataChanged.connect(self._on_data_changed)
+        model.compacted.connect(self._on_compacted)
+        self._rows = self._build()
+        self.endResetModel()
 
-        idx = self.sourceModel().index(source_row, 0, source_parent)
-        return self.sourceModel().data(idx, PlaylistModel.FavRole) is True
+    def index(self, row, column=0, parent=QModelIndex()):
+        if parent.isValid() or column != 0 or not 0 <= row < self.rowCount():
+            return QModelIndex()
+        return self.createIndex(row, column)
 
-# ------- Custom Delegate -----------------------
-class PlaylistDelegate(QStyledItemDelegate):
-    def __init__(self, height, icon, parent=None):
+    def parent(self, index=None):
+        if index is None:
+            return super().parent()  # QObject.parent()
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._count if self._rows is None else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1
+
+    def mapToSource(self, index):
+        if not index.isValid() or self.sourceModel() is None:
+            return QModelIndex()
+        row = index.row()
+        if self._rows is not None:
+            row = self._rows[row]
+        return self.sourceModel().index(row, 0)
+
+    def mapFromSource(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        row = index.row()
+        if self._rows is None:
+            return self.createIndex(row, 0) if row < self._count else QModelIndex()
+        pos = bisect_left(self._rows, row)
+        if pos < len(self._rows) and self._rows[pos] == row:
+            return self.createIndex(pos, 0)
+        return QModelIndex()
+
+    def dropMimeData(self, data, action, row, column, parent):
+        # below the last visible row of a filtered view means straight
+        # after that row, not the end of the whole list
+        if self._rows and row == len(self._rows) and not parent.isValid():
+            return self.sourceModel().dropMimeData(data, action, self._rows[-1] + 1, column, QModelIndex())
+        return super().dropMimeData(data, action, row, column, parent)
+
+    # ------- source changes -------
+    def _on_rows_about_to_be_inserted(self, parent, first, last):
+        if self._rows is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+    def _on_rows_inserted(self, parent, first, last):
+        if self._rows is None:
+            self._count += last - first + 1
+            self.endInsertRows()
+            return
+        count = last - first + 1
+        rows = self._rows
+        pos = bisect_left(rows, first)
+        for i in range(pos, len(rows)):
+            rows[i] += count
+        model = self.sourceModel()
+        new = [row for row in range(first, last + 1) if self._accepts(model.rid(row))]
+        if new:
+            self.beginInsertRows(QModelIndex(), pos, pos + len(new) - 1)
+            rows[pos:pos] = new
+            self.endInsertRows()
+
+    def _on_rows_about_to_be_removed(self, parent, first, last):
+        if self._search:
+            # removed records must not come back with the next rebuild
+            model = self.sourceModel()
+            self._search.difference_update(model.rid(row) for row in range(first, last + 1))
+        if self._rows is None:
+            self._removing = (first, last + 1)
+        else:
+            self._removing = (bisect_left(self._rows, first), bisect_right(self._rows, last))
+        start, end = self._removing
+        if start != end:
+            self.beginRemoveRows(QModelIndex(), start, end - 1)
+
+    def _on_rows_removed(self, parent, first, last):
+        (start, end), self._removing = self._removing, None
+        count = last - first + 1
+        if self._rows is None:
+            self._count -= count
+        else:
+            rows = self._rows
+            del rows[start:end]
+            for i in range(start, len(rows)):
+                rows[i] -= count
+        if start != end:
+            self.endRemoveRows()
+
+    def _on_rows_about_to_be_moved(self, parent, first, last, dest_parent, dest):
+        if self._rows is None:
+            self.beginMoveRows(QModelIndex(), first, last, QModelIndex(), dest)
+        else:
+            self._begin_relayout()
+
+    def _on_rows_moved(self, *args):
+        if self._rows is None:
+            self.endMoveRows()
+        else:
+            self._end_relayout()
+
+    def _on_compacted(self, remap):
+        # same rows under new rids, removed ones already left the set
+        if self._search is not None:
+            self._search = {remap[rid] for rid in self._search}
+
+    def _on_model_reset(self):
+        self._rows = self._build()
+        self.endResetModel()
+
+    def _on_data_changed(self, top_left, bottom_right, roles=()):
+        model = self.sourceModel()
+        first, last = top_left.row(), bottom_right.row()
+        if self._rows is not None and (not roles or PlaylistModel.FavRole in roles
+                                       or PlaylistModel.HealthRole in roles):
+            for row in range(first, last + 1):
+                rows = self._rows
+                pos = bisect_left(rows, row)
+                present = pos < len(rows) and rows[pos] == row
+                accepted = self._accepts(model.rid(row))
+                if accepted and not present:
+                    self.beginInsertRows(QModelIndex(), pos, pos)
+                    rows.insert(pos, row)
+                    self.endInsertRows()
+                elif present and not accepted:
+                    self.beginRemoveRows(QModelIndex(), pos, pos)
+                    del rows[pos]
+                    self.endRemoveRows()
+        top = self.mapFromSource(top_left) if first == last else None
+        if top is not None:
+            if top.isValid():
+                self.dataChanged.emit(top, top, roles)
+        elif self.rowCount():
+            # a range: forward it as the visible span it covers
+            if self._rows is None:
+                start, end = first, last
+            else:
+                start = bisect_left(self._rows, first)
+                end = bisect_right(self._rows, last) - 1
+            if start <= end:
+                self.dataChanged.emit(self.index(start), self.index(end), roles)
+
+# ------- Grouped tree --------------------------
+class GroupTreeModel(QAbstractItemModel):
+    # The filtered list as a two-level tree: groups (group-title / Xtream
+    # category) in the order they first appear, their channels below. Each
+    # group keeps its sorted source rows, so the counts are there as soon
+    # as the rows load, but the view is only given a page of children at a
+    # time through canFetchMore() / fetchMore(). Search, favourites and
+    # hide dead all come from the proxy underneath.
+    CountRole = Qt.UserRole + 9  # channels in a group, None on channel rows
+
+    PAGE = 500
+
+    def __init__(self, proxy, parent=None):
         super().__init__(parent)
-        self.height = height
-        self.icon = icon
-        self.star_on = qta.icon("mdi.star", color=STAR_COLOR)
-        self.star_off = qta.icon("mdi.star-outline", color=STAR_EMPTY_COLOR)
+        self.proxy = proxy
+        self.model = proxy.sourceModel()
+        self._gids = []      # group row -> group-title id
+        self._group = {}     # group-title id -> group row
+        self._rows = []      # group row -> array of source rows
+        self._fetched = []   # group row -> children handed to the view
+        self._seen = 0       # proxy rows indexed so far
+        self._rebuild()
+        proxy.rowsInserted.connect(self._on_rows_inserted)
+        proxy.rowsRemoved.connect(self._reset)
+        proxy.rowsMoved.connect(self._reset)
+        proxy.layoutChanged.connect(self._reset)
+        proxy.modelReset.connect(self._reset)
+        proxy.dataChanged.connect(self._on_data_changed)
+
+    def _rebuild(self):
+        # open groups keep the children already fetched
+        fetched = dict(zip(self._gids, self._fetched))
+        self._gids, self._group, self._rows, self._fetched = [], {}, [], []
+        self._seen = 0
+        rows = self.proxy.source_rows()
+        self._add(rows, self.model.group_ids(rows))
+        self._fetched = [min(fetched.get(gid, 0), len(rows)) for gid, rows in zip(self._gids, self._rows)]
+
+    def _add(self, rows, row_gids):
+        # appends source rows that come after every row already indexed
+        group, gids, groups = self._group, self._gids, self._rows
+        for row, gid in zip(rows, row_gids):
+            g = group.get(gid)
+            if g is None:
+                g = group[gid] = len(gids)
+                gids.append(gid)
+                groups.append(array("I"))
+                self._fetched.append(0)
+            groups[g].append(row)
+        self._seen += len(rows)
+
+    def _reset(self):
+        self.beginResetModel()
+        self._rebuild()
+        self.endResetModel()
 
-    def sizeHint(self, option, index):
-        return QSize(option.rect.width(), self.height)
+    def _on_rows_inserted(self, parent, first, last):
+        if first != self._seen:
+            self._reset()  # not an append, e.g. a star in the favourites view
+            return
+        source_row = self.proxy.source_row
+        rows = [source_row(row) for row in range(first, last + 1)]
+        gids = self.model.group_ids(rows)
+        groups = len(self._gids)
+        new = len(set(gids).difference(self._group))
+        if new:
+            self.beginInsertRows(QModelIndex(), groups, groups + new - 1)
+        self._add(rows, gids)
+        if new:
+            self.endInsertRows()
+        if groups:
+            self.dataChanged.emit(self.index(0), self.index(groups - 1), [self.CountRole])
+
+    def _on_data_changed(self, top_left, bottom_right, roles=()):
+        first, last = top_left.row(), bottom_right.row()
+        if last - first > 64:
+            # a bulk change (health results): every fetched child
+            for g, fetched in enumerate(self._fetched):
+                if fetched:
+                    parent = self.index(g, 0)
+                    self.dataChanged.emit(self.index(0, 0, parent), self.index(fetched - 1, 0, parent), roles)
+            return
+        rows = [self.proxy.source_row(row) for row in range(first, last + 1)]
+        for row, gid in zip(rows, self.model.group_ids(rows)):
+            g = self._group.get(gid)
+            if g is None:
+                continue
+            pos = bisect_left(self._rows[g], row)
+            if pos < self._fetched[g]:
+                index = self.index(pos, 0, self.index(g, 0))
+                self.dataChanged.emit(index, index, roles)
+
+    # ------- tree -------
+    def index(self, row, column=0, parent=QModelIndex()):
+        if column != 0 or row < 0:
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, 0, 0) if row < len(self._gids) else QModelIndex()
+        if parent.internalId() == 0 and row < self._fetched[parent.row()]:
+            return self.createIndex(row, 0, parent.row() + 1)
+        return QModelIndex()
+
+    def parent(self, index=None):
+        if index is None:
+            return super().parent()  # QObject.parent()
+        if not index.isValid() or index.internalId() == 0:
+            return QModelIndex()
+        return self.createIndex(index.internalId() - 1, 0, 0)
 
-    def paint(self, painter, option, index):
-        painter.save()
-        rect = option.rect
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self._gids)
+        if parent.internalId() == 0:
+            return self._fetched[parent.row()]
+        return 0
 
-        if option.state & QStyle.State_Selected:
-            painter.fillRect(rect, option.palette.highlight())
+    def columnCount(self, parent=QModelIndex()):
+        return 1
 
-        icon_size = 20
-        margin = 8
+    def hasChildren(self, parent=QModelIndex()):
+        return not parent.isValid() or parent.internalId() == 0
 
-        icon_rect = QRect(rect.left() + margin,
-                          rect.top() + (rect.height() - icon_size) // 2,
-                          icon_size, icon_size)
-        self.icon.paint(painter, icon_rect)
+    def canFetchMore(self, parent):
+        return parent.isValid() and parent.internalId() == 0 and \
+            self._fetched[parent.row()] < len(self._rows[parent.row()])
 
-        star_rect = QRect(rect.right() - 30,
-                          rect.top() + (rect.height() - icon_size) // 2,
-                          icon_size, icon_size)
-        fav = index.data(PlaylistModel.FavRole)
-        (self.star_on if fav else self.star_off).paint(painter, star_rect)
+    def fetchMore(self, parent):
+        if not self.canFetchMore(parent):
+            return
+        g = parent.row()
+        fetched = self._fetched[g]
+        count = min(self.PAGE, len(self._rows[g]) - fetched)
+        self.beginInsertRows(parent, fetched, fetched + count - 1)
+        self._fetched[g] += count
+        self.endInsertRows()
 
-        text_rect = QRect(icon_rect.right() + 8, rect.top() + 4,
-                          rect.width() - 80, rect.height() - 8)
-        text = index.data(Qt.DisplayRole) or ""
-        search = self._get_search_text(index)
+    # ------- data -------
+    def group_name(self, row):
+        return self.model.group_name(self._gids[row]) or "Ungrouped"
 
-        painter.setClipRect(text_rect)
+    def mapToSource(self, index):
+        # the PlaylistModel index of a channel row, invalid for a group
+        if not index.isValid() or index.internalId() == 0:
+            return QModelIndex()
+        return self.model.index(self._rows[index.internalId() - 1][index.row()])
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if index.internalId() == 0:
+            if role == Qt.DisplayRole:
+                return self.group_name(index.row())
+            if role == self.CountRole:
+                return len(self._rows[index.row()])
+            return None
+        return self.model.data(self.mapToSource(index), role)
+
+    def setData(self, index, value, role=Qt.EditRole):
+        source = self.mapToSource(index)
+        return source.isValid() and self.model.setData(source, value, role)
+
+    def flags(self, index):
+        if index.isValid() and index.internalId() == 0:
+            return Qt.ItemIsEnabled
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+
+# ------- Logos ---------------------------------
+class LogoLoader(QObject):
+    # tvg-logo pixmaps for the rows being painted. Downloading, decoding
+    # and scaling happen on the LogoFetcher's threads, thumbnails are kept
+    # on disk, and the last MEMORY pixmaps stay here. Views are repainted
+    # at most every REPAINT_MS as logos arrive.
+    ready   = Signal(str, QImage)  # from the fetcher threads
+    changed = Signal()
+
+    MEMORY = 1500
+    REPAINT_MS = 100
+
+    def __init__(self, size, parent=None):
+        super().__init__(parent)
+        self.size = size  # device pixels, the longer side of a thumbnail
+        self._pixmaps = OrderedDict()
+        cache = ThumbnailCache(Path(CACHE_DIR) / "logos", size, LOGO_CACHE_MB * 2**20)
+        self.fetcher = LogoFetcher(cache, self._thumbnail, self._on_ready, LOGO_CONNECTIONS, LOGO_PER_HOST)
+        self.ready.connect(self._add)
+        self._repaint = QTimer(self)
+        self._repaint.setSingleShot(True)
+        self._repaint.setInterval(self.REPAINT_MS)
+        self._repaint.timeout.connect(self.changed)
+
+    def _thumbnail(self, data):
+        # fetcher thread: scaled once, kept as PNG
+        image = QImage.fromData(data)
+        if image.isNull():
+            return None
+        if image.width() > self.size or image.height() > self.size:
+            image = image.scaled(self.size, self.size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        image.save(buffer, "PNG")
+        return bytes(buffer.data())
+
+    def _on_ready(self, url, thumb):
+        # fetcher thread; failures are remembered there, nothing to paint
+        if thumb is not None:
+            image = QImage.fromData(thumb)
+            if not image.isNull():
+                self.ready.emit(url, image)
+
+    def _add(self, url, image):
+        self._pixmaps[url] = QPixmap.fromImage(image)
+        if len(self._pixmaps) > self.MEMORY:
+            self._pixmaps.popitem(last=False)
+        if not self._repaint.isActive():
+            self._repaint.start()
+
+    def pixmap(self, url):
+        # None until it has been fetched, asking for it if need be
+        pixmap = self._pixmaps.get(url)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(url)
+            return pixmap
+        self.fetcher.request(url)
+        return None
+
+    def want(self, urls):
+        self.fetcher.want([url for url in urls if url not in self._pixmaps])
+
+    def close(self):
+        self.fetcher.stop()
+
+# ------- Custom Delegate -----------------------
+class PlaylistDelegate(QStyledItemDelegate):
+    ICON_SIZE   = 20
+    LAYOUT_SIZE = 2048   # cached row layouts
 
+    def __init__(self, height, icon, parent=None):
+        super().__init__(parent)
+        self.height = height
+        self.search_text = ""
+        self._pixmaps = {}               # (icon key, device pixel ratio) -> QPixmap
+        self._layouts = OrderedDict()    # (text, width, highlight) -> [(x, text, highlight width)]
+        self._font = None
+        self.logos = None                # LogoLoader, the icon slot widens to logo_size with one
+        self.logo_size = height - 10
+        self.set_icons(icon,
+                       qta.icon("mdi.star", color=STAR_COLOR),
+                       qta.icon("mdi.star-outline", color=STAR_EMPTY_COLOR))
+
+    def set_icons(self, icon, star_on, star_off):
+        self.icon = icon
+        self.star_on = star_on
+        self.star_off = star_off
+        self._pixmaps.clear()
+
+    def set_search_text(self, text):
+        if text != self.search_text:
+            self.search_text = text
+            self._layouts.clear()
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.height)
+
+    def _pixmap(self, key, icon, dpr):
+        pixmap = self._pixmaps.get((key, dpr))
+        if pixmap is None:
+            # rasterised once at the exact device size instead of every paint
+            pixmap = icon.pixmap(QSize(self.ICON_SIZE, self.ICON_SIZE), dpr)
+            self._pixmaps[(key, dpr)] = pixmap
+        return pixmap
+
+    def _layout(self, text, width, fm, highlight=True):
+        key = (text, width, highlight)
+        layout = self._layouts.get(key)
+        if layout is not None:
+            self._layouts.move_to_end(key)
+            return layout
+
+        text = fm.elidedText(text, Qt.ElideRight, width)
+        search = self.search_text if highlight else ""
+        layout = []
         if not search:
-            painter.drawText(text_rect, Qt.AlignVCenter | Qt.TextWordWrap, text)
+            layout.append((0, text, 0))
         else:
             lower_text = text.lower()
             lower_search = search.lower()
-
-            x = text_rect.left()
-            y = text_rect.top()
-
-            fm = painter.fontMetrics()
-
+            x = 0
             i = 0
             while i < len(text):
                 match_index = lower_text.find(lower_search, i)
-
                 if match_index == -1:
-                    chunk = text[i:]
-                    painter.drawText(x, y + fm.ascent() + 2, chunk)
+                    layout.append((x, text[i:], 0))
                     break
-
                 before = text[i:match_index]
-                painter.drawText(x, y + fm.ascent() + 2, before)
-                x += fm.horizontalAdvance(before)
-
+                if before:
+                    layout.append((x, before, 0))
+                    x += fm.horizontalAdvance(before)
                 match = text[match_index:match_index + len(search)]
+                advance = fm.horizontalAdvance(match)
+                layout.append((x, match, advance))
+                x += advance
+                i = match_index + len(search)
+
+        self._layouts[key] = layout
+        if len(self._layouts) > self.LAYOUT_SIZE:
+            self._layouts.popitem(last=False)
+        return layout
+
+    def _paint_group(self, painter, option, name, count):
+        painter.save()
+        rect = option.rect
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(rect, option.palette.highlight())
+        font = QFont(painter.font())
+        font.setBold(True)
+        painter.setFont(font)
+        fm = painter.fontMetrics()
+        count_text = f"{count:,}"
+        count_width = fm.horizontalAdvance(count_text)
+        name_rect = QRect(rect.left() + 4, rect.top(), rect.width() - count_width - 24, rect.height())
+        painter.setPen(option.palette.text().color())
+        painter.drawText(name_rect, Qt.AlignVCenter | Qt.AlignLeft,
+                         fm.elidedText(name, Qt.ElideRight, name_rect.width()))
+        painter.setPen(option.palette.placeholderText().color())
+        painter.drawText(QRect(rect.right() - count_width - 12, rect.top(), count_width, rect.height()),
+                         Qt.AlignVCenter | Qt.AlignRight, count_text)
+        painter.restore()
+
+    def paint(self, painter, option, index):
+        count = index.data(GroupTreeModel.CountRole)
+        if count is not None:
+            self._paint_group(painter, option, index.data(Qt.DisplayRole), count)
+            return
+        start = perf_counter()
+        painter.save()
+        rect = option.rect
+
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(rect, option.palette.highlight())
+        if index.data(PlaylistModel.HealthRole) is False:
+            painter.setOpacity(0.4)  # dead stream
 
-                highlight_rect = QRect(
-                    x,
-                    y + 2,
-                    fm.horizontalAdvance(match),
-                    fm.height()
-                )
+        icon_size = self.ICON_SIZE
+        margin = 8
+        dpr = painter.device().devicePixelRatioF()
+        icon_top = rect.top() + (rect.height() - icon_size) // 2
+
+        slot = icon_size
+        logo = None
+        if self.logos is not None:
+            slot = self.logo_size
+            url = index.data(PlaylistModel.LogoRole)
+            if url:
+                logo = self.logos.pixmap(url)
+        if logo is not None:
+            # thumbnails are in device pixels, centred in the slot
+            scale = min(1 / dpr, slot / max(logo.width(), logo.height()))
+            width, height = round(logo.width() * scale), round(logo.height() * scale)
+            painter.drawPixmap(QRect(rect.left() + margin + (slot - width) // 2,
+                                     rect.top() + (rect.height() - height) // 2, width, height), logo)
+        else:
+            painter.drawPixmap(QRect(rect.left() + margin + (slot - icon_size) // 2, icon_top, icon_size, icon_size),
+                               self._pixmap("icon", self.icon, dpr))
+
+        fav = index.data(PlaylistModel.FavRole)
+        painter.drawPixmap(QRect(rect.right() - 30, icon_top, icon_size, icon_size),
+                           self._pixmap("star_on", self.star_on, dpr) if fav
+                           else self._pixmap("star_off", self.star_off, dpr))
 
-                painter.fillRect(highlight_rect, option.palette.highlight())
+        text_rect = QRect(rect.left() + margin + slot + 8, rect.top() + 4,
+                          rect.width() - 80 - (slot - icon_size), rect.height() - 8)
+        text = index.data(Qt.DisplayRole) or ""
+        guide = index.data(PlaylistModel.EpgRole)
+        guide_rect = None
+        if guide is not None:
+            # the guide takes the right of the text area
+            guide_width = text_rect.width() * 2 // 5
+            guide_rect = QRect(text_rect.right() - guide_width + 1, text_rect.top(),
+                               guide_width, text_rect.height())
+            text_rect.setWidth(text_rect.width() - guide_width - 8)
+
+        font = painter.font()
+        if font != self._font:
+            self._font = QFont(font)
+            self._layouts.clear()
+        fm = painter.fontMetrics()
+        y = text_rect.top() + (text_rect.height() - fm.height()) // 2
+        baseline = y + fm.ascent()
+
+        # drawText at a baseline: drawStaticText leaks a reference to None
+        # on every call in PySide6 6.12 under Python 3.11
+        painter.setClipRect(text_rect)
+        for x, part, highlight in self._layout(text, text_rect.width(), fm):
+            if highlight:
+                painter.fillRect(QRect(text_rect.left() + x, y, highlight, fm.height()),
+                                 option.palette.highlight())
                 painter.setPen(option.palette.highlightedText().color())
-                painter.drawText(x, y + fm.ascent() + 2, match)
+                painter.drawText(text_rect.left() + x, baseline, part)
                 painter.setPen(option.palette.text().color())
+            else:
+                painter.drawText(text_rect.left() + x, baseline, part)
 
-                x += fm.horizontalAdvance(match)
-                i = match_index + len(search)
+        if guide_rect is not None:
+            now, nxt = guide
+            if now is not None:
+                guide_text = now.title
+            else:
+                guide_text = f"{strftime('%H:%M', localtime(nxt.start))} {nxt.title}"
+            painter.setClipRect(guide_rect)
+            painter.setPen(option.palette.placeholderText().color())
+            for x, part, _ in self._layout(guide_text, guide_rect.width(), fm, highlight=False):
+                painter.drawText(guide_rect.left() + x, baseline, part)
 
         painter.restore()
+        metrics.record("paint.row", perf_counter() - start)
 
     def editorEvent(self, event, model, option, index):
         if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
@@ -341,18 +1231,545 @@ class PlaylistDelegate(QStyledItemDelegate):
                               20, 20)
             if star_rect.contains(event.pos()):
                 fav = index.data(PlaylistModel.FavRole)
-                model.setData(index, not fav, PlaylistModel.FavRole)
-                return True
+                if fav is not None:  # not on a group row
+                    model.setData(index, not fav, PlaylistModel.FavRole)
+                    return True
         return super().editorEvent(event, model, option, index)
 
-    def _get_search_text(self, index):
-        view = self.parent()
-        if not view:
-            return ""
-        proxy = view.model()
-        if not proxy:
-            return ""
-        return proxy.filterRegularExpression().pattern()
+# ------- Group view ----------------------------
+class GroupView(QTreeView):
+    # Asks for a group's next page once its last fetched channels scroll
+    # into view, and keeps the open groups open when a filter change
+    # rebuilds the model
+    FETCH_AHEAD = 50
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._open = set()
+        self._scroll = 0
+        self.setHeaderHidden(True)
+        self.setUniformRowHeights(True)
+        self.setIndentation(12)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.verticalScrollBar().valueChanged.connect(self.fetch_visible)
+
+    def setModel(self, model):
+        super().setModel(model)
+        if model is not None:
+            model.modelAboutToBeReset.connect(self._save_open)
+            model.modelReset.connect(self._restore_open)
+
+    def _save_open(self):
+        model = self.model()
+        self._open = {model.group_name(row) for row in range(model.rowCount())
+                      if self.isExpanded(model.index(row))}
+        self._scroll = self.verticalScrollBar().value()
+
+    def _restore_open(self):
+        model = self.model()
+        if self._open:
+            for row in range(model.rowCount()):
+                if model.group_name(row) in self._open:
+                    self.setExpanded(model.index(row), True)
+        self.verticalScrollBar().setValue(self._scroll)
+
+    def fetch_visible(self):
+        # a screenful of rows, so walking them is cheap
+        model = self.model()
+        if model is None:
+            return
+        index = self.indexAt(QPoint(self.viewport().width() // 2, 0))
+        bottom = self.viewport().height()
+        while index.isValid() and self.visualRect(index).top() < bottom:
+            parent = index.parent()
+            if parent.isValid() and index.row() >= model.rowCount(parent) - self.FETCH_AHEAD \
+                    and model.canFetchMore(parent):
+                model.fetchMore(parent)
+                return
+            index = self.indexBelow(index)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.fetch_visible()
+
+# ------- Background loader ---------------------
+class PlaylistLoader(QThread):
+    batch    = Signal(object)          # list of Channel records
+    progress = Signal(int, int, float) # bytes read, total bytes (0 = unknown), bytes/sec
+
+    BATCH_ROWS = 5000
+    BATCH_SECS = 0.1
+
+    def __init__(self, source, kind, cache=None, revalidate=True, parent=None):
+        super().__init__(parent)
+        self.source = source  # local path or http(s) URL
+        self.kind = kind
+        self.cache = cache
+        self.revalidate = revalidate
+        self.count = 0
+        self.error = None
+        self.stale = False    # rows came from the cache copy
+        self.changed = False  # the server had a newer copy, now in the cache
+        self._writer = None
+        self._validators = (None, None)
+
+    def _open(self):
+        if not self.source.startswith(("http://", "https://")):
+            f = open(self.source, "rb")
+            return f, iter(lambda: f.read(CHUNK_SIZE), b""), os.path.getsize(self.source)
+
+        entry = self.cache.lookup(self.source) if self.cache else None
+        if entry:
+            self.stale = True
+            f = self.cache.open(self.source)
+            return f, iter(lambda: f.read(CHUNK_SIZE), b""), entry.get("length", 0)
+
+        r = conditional_get(self.source)
+        total = int(r.headers.get("Content-Length") or 0)
+        if r.headers.get("Content-Encoding"):
+            total = 0  # length is of the compressed body
+        chunks = r.iter_content(CHUNK_SIZE)
+        if self.cache is not None:
+            self._writer = self.cache.writer(self.source)
+            self._validators = (r.headers.get("ETag"), r.headers.get("Last-Modified"))
+            chunks = self._tee(chunks, self._writer)
+        return r, chunks, total
+
+    @staticmethod
+    def _tee(chunks, writer):
+        for chunk in chunks:
+            writer.write(chunk)
+            yield chunk
+
+    def _revalidate(self):
+        with conditional_get(self.source, self.cache) as r:
+            if r.status_code == 304:
+                self.cache.touch(self.source)
+                return
+            writer = self.cache.writer(self.source)
+            for chunk in r.iter_content(CHUNK_SIZE):
+                if self.isInterruptionRequested():
+                    writer.discard()
+                    return
+                writer.write(chunk)
+            self.changed = writer.commit(r.headers.get("ETag"), r.headers.get("Last-Modified"))
+
+    def run(self):
+        handle = None
+        try:
+            handle, chunks, total = self._open()
+            start = last = monotonic()
+            done = 0
+            read = 0.0  # time spent waiting on the file or network
+
+            def counted():
+                nonlocal done, last, read
+                mark = perf_counter()
+                for chunk in chunks:
+                    read += perf_counter() - mark
+                    if self.isInterruptionRequested():
+                        return
+                    done += len(chunk)
+                    now = monotonic()
+                    if now - last >= self.BATCH_SECS:
+                        last = now
+                        self.progress.emit(done, total, done / max(now - start, 1e-6))
+                    yield chunk
+                    mark = perf_counter()
+
+            rows = []
+            flushed = monotonic()
+            for ch in parse_m3u(counted()):
+                rows.append(ch)
+                if len(rows) >= self.BATCH_ROWS or monotonic() - flushed >= self.BATCH_SECS:
+                    self.count += len(rows)
+                    self.batch.emit(rows)
+                    rows = []
+                    flushed = monotonic()
+                if self.isInterruptionRequested():
+                    return
+            if self.isInterruptionRequested():
+                return
+            if rows:
+                self.count += len(rows)
+                self.batch.emit(rows)
+            self.progress.emit(done, total, done / max(monotonic() - start, 1e-6))
+            metrics.record("load.read", read)
+            metrics.record("load.parse", monotonic() - start - read)
+
+            if self._writer is not None:
+                self._writer.commit(*self._validators)
+                self._writer = None
+            if self.stale and self.revalidate:
+                try:
+                    self._revalidate()
+                except Exception as e:
+                    metrics.error("Revalidate failed", e)  # keep showing the cached copy
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            if self._writer is not None:
+                self._writer.discard()
+            if handle is not None:
+                handle.close()
+
+class XtreamLoader(QThread):
+    # Live channels straight from player_api.php, one batch per category
+    batch    = Signal(object)    # list of Channel records
+    progress = Signal(int, int)  # categories loaded, total
+
+    def __init__(self, client, parent=None):
+        super().__init__(parent)
+        self.client = client
+        self.source = client.url
+        self.kind = "Xtream"
+        self.count = 0
+        self.error = None
+        self.stale = False
+        self.changed = False
+
+    def run(self):
+        try:
+            self.client.authenticate()
+            categories = self.client.live_categories()
+            self.progress.emit(0, len(categories))
+            done = 0
+            mark = perf_counter()
+            for rows in self.client.load_live(categories, self.isInterruptionRequested):
+                metrics.record("xtream.category", perf_counter() - mark)
+                done += 1
+                if rows:
+                    self.count += len(rows)
+                    self.batch.emit(rows)
+                self.progress.emit(done, len(categories))
+                mark = perf_counter()
+            self.stale = self.client.stale
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.client.close()
+
+class SourcesLoader(QThread):
+    # Several playlists and the Xtream account at once, each on its own
+    # loader thread. Batches are de-duplicated as they arrive and come out
+    # as one load, so the rest of the window treats it like any other.
+    batch       = Signal(object)    # list of Channel records, tagged with their source
+    progress    = Signal(int, int)  # sources done, total
+    source_done = Signal(object)    # SourceStats
+
+    def __init__(self, sources, cache, xtream, keep=None, revalidate=True, parent=None):
+        super().__init__(parent)
+        self.sources = sources      # [(name, url, path or XTREAM)]
+        self.cache = cache
+        self.xtream = xtream        # () -> XtreamClient
+        self.keep = keep            # store snapshot: a failed source keeps its channels
+        self.revalidate = revalidate
+        self.source = SOURCES_FILE
+        self.kind = f"{len(sources)} sources"
+        self.count = 0
+        self.error = None
+        self.stale = False
+        self.changed = False
+        self.stats = []
+
+    def _loader(self, location):
+        if location.lower() == XTREAM:
+            return XtreamLoader(self.xtream())
+        kind = "URL" if location.startswith(("http://", "https://")) else "file"
+        return PlaylistLoader(location, kind, self.cache, self.revalidate)
+
+    def _emit(self, dedup, stats, rows):
+        kept, dropped = dedup.filter(stats.name, rows)
+        stats.batch(len(kept), dropped)
+        if kept:
+            self.batch.emit(kept)
+
+    def _finish(self, dedup, stats, loader):
+        stats.done(loader.error, loader.stale)
+        if loader.error and self.keep is not None:
+            store = self.keep
+            self._emit(dedup, stats, [store.channel(rid) for rid in store.order
+                                      if store.source(rid) == stats.name])
+        self.changed = self.changed or loader.changed
+        self.source_done.emit(stats)
+
+    def run(self):
+        dedup = Deduper()
+        pending = []
+        try:
+            for name, location in self.sources:
+                stats = SourceStats(name, location)
+                loader = self._loader(location)
+                # handled on the source's own thread, Deduper is thread-safe
+                loader.batch.connect(lambda rows, stats=stats: self._emit(dedup, stats, rows),
+                                     Qt.DirectConnection)
+                self.stats.append(stats)
+                pending.append((loader, stats))
+        except Exception as e:
+            self.error = str(e)
+            return
+        for loader, _ in pending:
+            loader.start()
+        total = len(pending)
+        self.progress.emit(0, total)
+        while pending:
+            if self.isInterruptionRequested():
+                for loader, _ in pending:
+                    loader.requestInterruption()
+                for loader, _ in pending:
+                    loader.wait()  # they must not outlive this thread's objects
+                return
+            running = []
+            for loader, stats in pending:
+                if loader.isFinished():
+                    self._finish(dedup, stats, loader)
+                else:
+                    running.append((loader, stats))
+            if len(running) != len(pending):
+                pending = running
+                self.progress.emit(total - len(pending), total)
+            else:
+                self.msleep(50)
+        self.count = sum(stats.channels for stats in self.stats)
+        self.stale = any(stats.stale for stats in self.stats)
+        failed = [stats for stats in self.stats if stats.error]
+        if len(failed) == total:
+            self.error = "\n".join(stats.summary() for stats in failed)
+        elif failed:
+            self.kind += f", {len(failed)} failed"
+
+class RefreshDiffer(QThread):
+    # Works out a refresh against a snapshot of the store, the GUI thread
+    # then only applies the result
+    def __init__(self, store, epoch, channels, source, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.epoch = epoch
+        self.channels = channels
+        self.source = source
+        self.diff = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.diff = diff_playlist(self.store, self.channels)
+        except Exception as e:
+            self.error = str(e)
+
+class StateEvents(QObject):
+    # StateStore reports failures from its save thread and the loader,
+    # this queues them over to the GUI thread
+    error = Signal(str, str)  # where, message
+
+class StateLoader(QThread):
+    # Reads the snapshot and replays the journal off the GUI thread, then
+    # hands the rows over in batches so the window paints first
+    loaded = Signal(object)  # meta, before any rows
+    batch  = Signal(object)  # list of [name, url, fav(, attrs)] rows
+
+    BATCH_ROWS = 5000
+
+    def __init__(self, state, parent=None):
+        super().__init__(parent)
+        self.state = state
+        self.count = 0
+        self.error = None
+
+    def run(self):
+        try:
+            with metrics.span("state.load"):
+                rows, meta = self.state.load()
+        except Exception as e:
+            self.error = e
+            return
+        self.loaded.emit(meta)
+        for i in range(0, len(rows), self.BATCH_ROWS):
+            if self.isInterruptionRequested():
+                return
+            chunk = rows[i:i + self.BATCH_ROWS]
+            self.count += len(chunk)
+            self.batch.emit(chunk)
+
+class EpgLoader(QThread):
+    # Streams an XMLTV file or URL into a new guide database next to the
+    # live one; the GUI thread swaps it in when done
+    progress = Signal(int)  # programmes stored so far
+
+    def __init__(self, source, path, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.path = path      # where the new database is built
+        self.count = None
+        self.error = None
+
+    def run(self):
+        try:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            if self.source.startswith(("http://", "https://")):
+                handle = conditional_get(self.source, timeout=60)
+                handle.raw.decode_content = True  # undo any transfer compression
+                stream = handle.raw
+            else:
+                handle = stream = open(self.source, "rb")
+            with handle:
+                start = perf_counter()
+                self.count = build_epg(self.path, stream, self.isInterruptionRequested, self.progress.emit)
+            if self.count is not None:
+                metrics.record("epg.build", perf_counter() - start)
+        except Exception as e:
+            self.error = str(e)
+
+class ExportWorker(QThread):
+    # Writes a point-in-time copy of the list, so the window stays usable
+    # and later edits don't end up half in the file
+    progress = Signal(int)  # channels written so far
+
+    PROGRESS_ROWS = 10000
+
+    def __init__(self, path, store, rows=None, favourites=False, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.store = store            # ChannelStore.copy()
+        self.rows = rows              # rows to write, None for all of them
+        self.favourites = favourites
+        self.count = None
+        self.error = None
+
+    def _channels(self):
+        store = self.store
+        rids = store.order if self.rows is None else [store.order[row] for row in self.rows]
+        if self.favourites:
+            rids = [rid for rid in rids if store.fav[rid]]
+        for i, channel in enumerate(store.channels(rids)):
+            if i % self.PROGRESS_ROWS == 0:
+                if self.isInterruptionRequested():
+                    raise InterruptedError
+                self.progress.emit(i)
+            yield channel
+
+    def run(self):
+        start = perf_counter()
+        try:
+            self.count = export(self.path, self._channels(), skip=(SOURCE_ATTR,))
+            metrics.record("export", perf_counter() - start)
+        except InterruptedError:
+            pass
+        except Exception as e:
+            self.error = str(e)
+
+class ThemeRenderer(QThread):
+    # Renders the themes not in the theme cache yet, so a pick in the theme
+    # dialog only has to read a file
+
+    def run(self):
+        for name in themes.names():
+            if self.isInterruptionRequested():
+                return
+            try:
+                if themes.get(name) is None:
+                    with metrics.span("theme.render"):
+                        themes.render(name)
+            except Exception as e:
+                metrics.error(f"Theme {name} failed", e)
+
+# ------- Stream checks -------------------------
+class HealthWorker(QThread):
+    # Runs the asyncio checker on its own thread; results reach the GUI
+    # in batches a few times a second rather than one signal per stream
+    results  = Signal(object)    # list of (rid, url, Health)
+    progress = Signal(int, int)  # checked, total
+
+    FLUSH_SECONDS = 0.25
+
+    def __init__(self, store, epoch, parent=None):
+        super().__init__(parent)
+        self.store = store  # ChannelStore.copy(), its URLs are read here
+        self.total = len(store.order)
+        self.epoch = epoch
+        self.alive = 0
+        self.dead = 0
+        self.error = None
+
+    def run(self):
+        pending = []
+        flushed = monotonic()
+
+        def on_result(rid, url, health):
+            nonlocal flushed
+            pending.append((rid, url, health))
+            if health.alive:
+                self.alive += 1
+            else:
+                self.dead += 1
+            if monotonic() - flushed >= self.FLUSH_SECONDS:
+                self.results.emit(pending[:])
+                self.progress.emit(self.alive + self.dead, self.total)
+                pending.clear()
+                flushed = monotonic()
+
+        try:
+            cache = HealthCache(Path(CACHE_DIR) / "health.json", CHECK_CACHE_HOURS * 3600)
+            checker = HealthChecker(cache, CHECK_CONCURRENCY, CHECK_PER_HOST, CHECK_TIMEOUT)
+            store = self.store
+            checker.run(((rid, store.url(rid)) for rid in store.order), on_result, self.isInterruptionRequested)
+        except Exception as e:
+            self.error = str(e)
+        if pending:
+            self.results.emit(pending)
+        self.progress.emit(self.alive + self.dead, self.total)
+
+# ------- Search worker -------------------------
+class SearchWorker(QThread):
+    results = Signal(int, object)  # query generation, set of record ids or None
+    invalid = Signal(int, str)     # query generation, why it doesn't parse
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.generation = 0
+        self._queue = queue.Queue()
+
+    def submit(self, text):
+        self.generation += 1
+        self._queue.put((self.generation, text))
+
+    def cancel(self):
+        self.generation += 1
+
+    def warm(self):
+        self._queue.put((None, None))  # build the index ahead of the first query
+
+    def stop(self):
+        self.cancel()
+        self._queue.put(None)
+        self.wait()
+
+    def run(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            generation, text = task
+            if generation is None:
+                self.index.catch_up()
+                continue
+            if generation != self.generation:
+                continue  # a newer query is already queued
+            try:
+                with metrics.span("search"):
+                    rows = self.index.search(text, lambda: generation != self.generation)
+            except QueryError as e:
+                self.invalid.emit(generation, str(e))
+                continue
+            if generation == self.generation:
+                self.results.emit(generation, rows)
+
+# ------- Player --------------------------------
+class PlayerEvents(QObject):
+    # MpvController reports from its reader thread, this queues the events
+    # over to the GUI thread
+    event = Signal(object)
 
 # ------- Main Window ---------------------------
 class M3UPlayer(QMainWindow):
@@ -366,18 +1783,104 @@ class M3UPlayer(QMainWindow):
 
         self.statusBar = QStatusBar()
         self.setStatusBar(self.statusBar)
-
-        self.model = PlaylistModel()
+        self.btn_cancel = QPushButton("Cancel")
+        self.btn_cancel.setIcon(qta.icon("mdi.close-circle-outline"))
+        self.btn_cancel.setCursor(Qt.PointingHandCursor)
+        self.btn_cancel.setStyleSheet(BUTTON_STYLE)
+        self.btn_cancel.setFlat(FLAT)
+        self.btn_cancel.clicked.connect(self.cancel_load)
+        self.btn_cancel.hide()
+        self.statusBar.addPermanentWidget(self.btn_cancel)
+        self.player_label = QLabel()
+        self.statusBar.addPermanentWidget(self.player_label)
+        self.metrics_label = QLabel()
+        self.metrics_label.setVisible(SHOW_METRICS)
+        self.statusBar.addPermanentWidget(self.metrics_label)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(1000)
+        self.metrics_timer.timeout.connect(self.update_metrics)
+        if SHOW_METRICS:
+            self.metrics_timer.start()
+        # F12 shows the metrics, Ctrl+Shift+P starts/stops a profile,
+        # Ctrl+Shift+T writes a trace
+        for keys, slot in (("F12", self.toggle_metrics), ("Ctrl+Shift+P", self.toggle_profile),
+                           ("Ctrl+Shift+T", self.dump_trace)):
+            QShortcut(QKeySequence(keys), self).activated.connect(slot)
+
+        if DISK_STORE:
+            # a playlist bigger than memory: rows are read from the file as
+            # they are shown, and the file is the saved state
+            store = DiskStore(DISK_STORE)
+            self.model = PlaylistModel(store)
+            self.state = DiskState(store)
+        else:
+            self.model = PlaylistModel()
+            self.state_events = StateEvents(self)
+            self.state_events.error.connect(self.on_state_error)
+            self.state = StateStore(STATE_FILE, on_error=self.state_events.error.emit)
 
         self.proxy_model = FavouriteFilterProxy()
         self.proxy_model.setSourceModel(self.model)
-        self.proxy_model.setFilterCaseSensitivity(Qt.CaseInsensitive)
-        self.proxy_model.setFilterRole(PlaylistModel.NameRole)
+
+        self.search_worker = SearchWorker(self.model.query_index, self)
+        self.search_worker.results.connect(self.on_search_results)
+        self.search_worker.invalid.connect(self.on_search_invalid)
+        self.search_worker.start()
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)  # debounce keystrokes
+        self.search_timer.timeout.connect(self.run_search)
+        self.model.rowsInserted.connect(self.on_rows_inserted)
+        self.model.compacted.connect(self.on_compacted)
+
+        # favourites, renames and moves go to the journal as they happen,
+        # bulk changes are snapshotted once things go quiet
+        self.state_ready = False  # the journal is not ours until load() is done
+        self._journal_paused = False
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setSingleShot(True)
+        self.autosave_timer.setInterval(AUTOSAVE_MS)
+        self.autosave_timer.timeout.connect(self.autosave)
+        self.compact_timer = QTimer(self)
+        self.compact_timer.setInterval(COMPACT_MS)
+        self.compact_timer.timeout.connect(self.autosave)
+        self.compact_timer.start()
+        self.model.dataChanged.connect(self.on_state_data_changed)
+        self.model.moved.connect(self.on_state_moved)
+        self.model.rowsInserted.connect(self.on_state_bulk_change)
+        self.model.rowsRemoved.connect(self.on_state_bulk_change)
+        self.model.modelReset.connect(self.on_state_bulk_change)
 
         self.show_favourites = False
+        self.loader = None
+        self.checker = None  # stream health checks run beside any loader
+        self.epg_loader = None
+        self.epg_builds = 0
+        self.exporter = None
+        self.guide = EpgGuide(str(Path(CACHE_DIR) / "epg.sqlite"))
+        self.model.guide = self.guide
+        self.guide_timer = QTimer(self)
+        self.guide_timer.setInterval(60 * 1000)  # now/next moves on as programmes end
+        self.guide_timer.timeout.connect(self.update_guide)
+        self.guide_timer.start()
+
+        # one mpv for every channel, switched over IPC
+        self.player_events = PlayerEvents(self)
+        self.player_events.event.connect(self.on_player_event)
+        self.player = MpvController(MPV_PATH if os.name == "nt" else "mpv", MPV_ARGS,
+                                    on_event=self.player_events.event.emit)
+        self.player_info = {}
+        self.minimise_pending = False
+        self.refresh_rows = None  # a reload of a non-empty list collects here, then diffs
+        self.list_source = None   # where the list was loaded from, loading it again refreshes
+        self.load_started = monotonic()
+        self.cache = PlaylistCache(Path(CACHE_DIR) / "playlists", CACHE_SIZE_MB * 2**20)
+        self.xtream_cache = ResponseCache(Path(CACHE_DIR) / "xtream", CACHE_SIZE_MB * 2**20)
 
         self.init_ui()
-        self.load_state()
+        QTimer.singleShot(0, self.load_state)  # once the window is up
+        self.theme_renderer = ThemeRenderer(self)
+        QTimer.singleShot(5000, lambda: self.theme_renderer.start(QThread.LowestPriority))
 
     def init_ui(self):
         central = QWidget()
@@ -388,14 +1891,14 @@ class M3UPlayer(QMainWindow):
         left = QVBoxLayout()
         self.search = QLineEdit()
         self.search.setPlaceholderText("Search channels…")
+        self.search.setToolTip(SEARCH_HELP)
         self.search.setClearButtonEnabled(True)
-        self.search.textChanged.connect(self.proxy_model.setFilterFixedString)
+        self.search.textChanged.connect(self.on_search_text)
         left.addWidget(self.search)
 
         self.list_view = QListView()
         self.list_view.setModel(self.proxy_model)
         self.list_view.doubleClicked.connect(self.play_selected)
-        self.search.textChanged.connect(self.list_view.viewport().update)
         self.list_view.setDragDropMode(QListView.InternalMove)
         self.list_view.setDefaultDropAction(Qt.MoveAction)
         self.list_view.setDropIndicatorShown(True)
@@ -404,12 +1907,43 @@ class M3UPlayer(QMainWindow):
         self.list_view.viewport().setAcceptDrops(True)
         self.list_view.setDragDropOverwriteMode(False)
         self.list_view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        self.list_view.setItemDelegate(
-            PlaylistDelegate(ROW_HEIGHT, qta.icon(PLAYLIST_ICON), self.list_view)
-        )
+        self.list_view.setUniformItemSizes(True)
+        if DISK_STORE:
+            # the rows are all there at startup, lay them out a batch per
+            # event loop pass so the window shows at once
+            self.list_view.setLayoutMode(QListView.Batched)
+            self.list_view.setBatchSize(20000)
+        self.delegate = PlaylistDelegate(ROW_HEIGHT, qta.icon(PLAYLIST_ICON), self.list_view)
+        self.list_view.setItemDelegate(self.delegate)
         self.list_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
 
-        left.addWidget(self.list_view, 1)
+        # the same rows by group, only built while it is shown
+        self.group_model = None
+        self.group_view = GroupView()
+        self.group_view.setItemDelegate(self.delegate)
+        self.group_view.doubleClicked.connect(self.play_selected)
+        self.views = QStackedWidget()
+        self.views.addWidget(self.list_view)
+        self.views.addWidget(self.group_view)
+
+        # logos for what is on screen and a little either side, asked for
+        # once scrolling or a filter change settles
+        self.logos = None
+        if SHOW_LOGOS:
+            self.logos = LogoLoader(round(self.delegate.logo_size * self.devicePixelRatioF()), self)
+            self.logos.changed.connect(self.repaint_rows)
+            self.delegate.logos = self.logos
+            self.logo_timer = QTimer(self)
+            self.logo_timer.setSingleShot(True)
+            self.logo_timer.setInterval(50)
+            self.logo_timer.timeout.connect(self.want_logos)
+            for view in (self.list_view, self.group_view):
+                view.verticalScrollBar().valueChanged.connect(self.queue_logos)
+            for signal in (self.proxy_model.modelReset, self.proxy_model.layoutChanged,
+                           self.proxy_model.rowsInserted, self.proxy_model.rowsRemoved, self.views.currentChanged):
+                signal.connect(self.queue_logos)
+
+        left.addWidget(self.views, 1)
         main.addLayout(left, 1)
 
         controls = QVBoxLayout()
@@ -420,9 +1954,16 @@ class M3UPlayer(QMainWindow):
         btn_open      = self.make_button(" Open M3U", "mdi.folder-open", self.open_m3u)
         btn_url       = self.make_button(" M3U URL", "mdi.link", self.load_m3u)
         btn_xtream    = self.make_button(" Xtreme", "mdi.television", self.get_xtream)
+        btn_sources   = self.make_button(" Sources", "mdi.source-merge", self.edit_sources)
         btn_savem3u   = self.make_button(" Save M3U", "mdi.content-save-outline", self.save_m3u)
         btn_savejson  = self.make_button(" Save json", "mdi.code-json", self.save_json)
         btn_clear     = self.make_button(" Clear list", "mdi.delete-outline", self.clearlist)
+        self.btn_check = self.make_button(" Check streams", "mdi.heart-pulse", self.toggle_check)
+        self.btn_dead = self.make_button(" Hide dead", "mdi.eye-off-outline", self.toggle_hide_dead)
+        self.btn_dead.setCheckable(True)
+        self.btn_groups = self.make_button(" Groups", "mdi.file-tree", self.toggle_groups)
+        self.btn_groups.setCheckable(True)
+        btn_guide     = self.make_button(" Guide", "mdi.calendar-clock", self.load_epg)
         btn_theme     = self.make_button(" Theme", "mdi.palette-outline", self.theme)
         btn_info      = self.make_button(" Info", "mdi.information", self.show_info)
         btn_quit      = self.make_button(" Quit", "mdi.exit-to-app", self.close)
@@ -432,9 +1973,14 @@ class M3UPlayer(QMainWindow):
         controls.addWidget(btn_open)
         controls.addWidget(btn_url)
         controls.addWidget(btn_xtream)
+        controls.addWidget(btn_sources)
         controls.addWidget(btn_savem3u)
         controls.addWidget(btn_savejson)
         controls.addWidget(btn_clear)
+        controls.addWidget(self.btn_check)
+        controls.addWidget(self.btn_dead)
+        controls.addWidget(self.btn_groups)
+        controls.addWidget(btn_guide)
         controls.addWidget(btn_theme)
         controls.addStretch()
 
@@ -451,7 +1997,7 @@ class M3UPlayer(QMainWindow):
         bottom_row.addWidget(btn_quit)
 
         if FLAT:
-            buttons = [btn_search, self.btn_fav, btn_open, btn_url, btn_xtream, btn_savem3u, btn_savejson, btn_clear, btn_theme, btn_info, btn_quit]
+            buttons = [btn_search, self.btn_fav, btn_open, btn_url, btn_xtream, btn_sources, btn_savem3u, btn_savejson, btn_clear, self.btn_check, self.btn_dead, self.btn_groups, btn_guide, btn_theme, btn_info, btn_quit]
             for i, button in enumerate(buttons):
                 button.setFlat(True)
 
@@ -476,10 +2022,112 @@ class M3UPlayer(QMainWindow):
     def toggle_favourites(self):
         self.show_favourites = not self.show_favourites
         self.proxy_model.show_only_favourites = self.show_favourites
+        if self.state_ready:
+            self.state.record(["meta", "show_favourites", self.show_favourites])
 
         self.update_fav_button_icon()
 
-        self.proxy_model.invalidate()
+    def toggle_hide_dead(self):
+        self.proxy_model.hide_dead = self.btn_dead.isChecked()
+        if self.state_ready:
+            self.state.record(["meta", "hide_dead", self.proxy_model.hide_dead])
+
+    def toggle_groups(self):
+        self.set_grouped(self.btn_groups.isChecked())
+        if self.state_ready:
+            self.state.record(["meta", "groups", self.btn_groups.isChecked()])
+
+    def set_grouped(self, grouped):
+        if grouped and self.group_model is None:
+            self.group_model = GroupTreeModel(self.proxy_model, self)
+            self.group_view.setModel(self.group_model)
+        elif not grouped and self.group_model is not None:
+            self.group_view.setModel(None)
+            self.group_model.deleteLater()
+            self.group_model = None
+        self.views.setCurrentWidget(self.group_view if grouped else self.list_view)
+
+    def queue_logos(self, *args):
+        if not self.logo_timer.isActive():  # not restarted, so a long scroll still fetches
+            self.logo_timer.start()
+
+    def want_logos(self):
+        view = self.views.currentWidget()
+        top = view.indexAt(QPoint(view.viewport().width() // 2, 0))
+        if not top.isValid():
+            return
+        shown = view.viewport().height() // ROW_HEIGHT + 1
+        if view is self.list_view:
+            first = top.row()
+            rows = list(range(first, min(first + shown, self.proxy_model.rowCount())))
+            rows += range(first + shown, min(first + shown + LOGO_PREFETCH, self.proxy_model.rowCount()))
+            rows += range(first - 1, max(first - LOGO_PREFETCH, 0) - 1, -1)
+            indexes = [self.proxy_model.index(row, 0) for row in rows]
+        else:
+            # the tree's rows in view order, then the margin above
+            indexes = []
+            index = top
+            while index.isValid() and len(indexes) < shown + LOGO_PREFETCH:
+                indexes.append(index)
+                index = view.indexBelow(index)
+            index = view.indexAbove(top)
+            for _ in range(LOGO_PREFETCH):
+                if not index.isValid():
+                    break
+                indexes.append(index)
+                index = view.indexAbove(index)
+        # visible rows first, they are fetched first
+        urls = [url for url in (index.data(PlaylistModel.LogoRole) for index in indexes) if url]
+        self.logos.want(list(dict.fromkeys(urls)))
+
+    def repaint_rows(self):
+        self.list_view.viewport().update()
+        self.group_view.viewport().update()
+
+    def toggle_check(self):
+        if self.checker is not None:
+            self.stop_check()
+            return
+        if not self.model.rowCount():
+            return
+        self.checker = HealthWorker(self.model.snapshot(), self.model.epoch, self)
+        self.checker.results.connect(self.on_check_results)
+        self.checker.progress.connect(self.on_check_progress)
+        self.checker.finished.connect(self.on_check_finished)
+        self.btn_check.setText(" Stop check")
+        self.statusBar.showMessage(f"Checking {self.checker.total:,} streams…")
+        self.checker.start()
+
+    def stop_check(self, wait=200):
+        checker, self.checker = self.checker, None
+        self.btn_check.setText(" Check streams")
+        if checker is None:
+            return
+        checker.requestInterruption()  # in-flight probes end at their timeout
+        checker.wait(wait)
+        self.statusBar.showMessage(f"Stream check stopped: {checker.alive:,} alive, {checker.dead:,} dead", 6000)
+
+    def on_check_results(self, results):
+        checker = self.sender()
+        if checker is self.checker and checker.epoch == self.model.epoch:
+            self.model.set_health(results)
+
+    def on_check_progress(self, done, total):
+        if self.sender() is self.checker:
+            self.statusBar.showMessage(f"Checking streams… {done:,} / {total:,} · {self.checker.dead:,} dead")
+
+    def on_check_finished(self):
+        checker = self.sender()
+        checker.deleteLater()
+        if checker is not self.checker:
+            return
+        self.checker = None
+        self.btn_check.setText(" Check streams")
+        if checker.error:
+            QMessageBox.critical(self, "Error", f"Could not check streams:\n{checker.error}")
+        else:
+            self.statusBar.showMessage(f"Checked {checker.alive + checker.dead:,} streams: "
+                                       f"{checker.alive:,} alive, {checker.dead:,} dead", 8000)
 
     def update_fav_button_icon(self):
         if self.show_favourites:
@@ -497,40 +2145,55 @@ class M3UPlayer(QMainWindow):
             self.search.show()
             self.search.setFocus()
 
+    def on_search_text(self, text):
+        if text.strip():
+            self.search_timer.start()
+        else:
+            self.search_timer.stop()
+            self.search_worker.cancel()
+            self.proxy_model.set_search("", None)
+            self.delegate.set_search_text("")
+            self.repaint_rows()
+
+    def run_search(self):
+        self.search_worker.submit(self.search.text())
+
+    def on_search_results(self, generation, rows):
+        if generation != self.search_worker.generation:
+            return
+        text = self.search.text().strip()
+        self.proxy_model.set_search(text, rows)
+        self.delegate.set_search_text(highlight(text))
+        self.repaint_rows()
+        if self.group_model is not None and text and self.proxy_model.rowCount() <= GroupTreeModel.PAGE:
+            self.group_view.expandAll()  # few enough hits to show them all
+
+    def on_search_invalid(self, generation, message):
+        # the last good filter stays on until the query is fixed
+        if generation == self.search_worker.generation:
+            self.statusBar.showMessage(f"Search: {message}", 4000)
+
+    def on_rows_inserted(self):
+        if self.search.text().strip():
+            self.search_timer.start()
+
+    def on_compacted(self):
+        # a query in flight answers in the old rids: drop it and ask again
+        self.search_worker.cancel()
+        if self.search.text().strip():
+            self.search_timer.start()
+
     def update_star_icons(self):
-        delegate = self.list_view.itemDelegate()
-        if isinstance(delegate, PlaylistDelegate):
-            delegate.star_on = qta.icon("mdi.star", color=STAR_COLOR)
-            delegate.star_off = qta.icon("mdi.star-outline", color=STAR_EMPTY_COLOR)
-            self.list_view.viewport().update()
-
-    def _parse_m3u_content(self, lines: list[str]) -> list:
-        playlist = []
-        name = None
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith("#EXTM3U"):
-                continue
-            if line.startswith("#EXTINF"):
-                name = line.split(",", 1)[-1].strip()
-            else:
-                display = name if name else os.path.basename(line or "Untitled")
-                playlist.append([display, line, False])
-                name = None
-        return playlist
+        self.delegate.set_icons(self.delegate.icon,
+                                qta.icon("mdi.star", color=STAR_COLOR),
+                                qta.icon("mdi.star-outline", color=STAR_EMPTY_COLOR))
+        self.repaint_rows()
 
     def open_m3u(self):
         path, _ = QFileDialog.getOpenFileName(self, "Open M3U", "", "M3U Files (*.m3u *.m3u8)")
         if not path:
             return
-        try:
-            with open(path, "r", encoding="utf-8", errors="replace") as f:
-                items = self._parse_m3u_content(f.readlines())
-            self.model.clear()
-            self.model.append_items(items)
-            self.statusBar.showMessage(f"Loaded {len(items)} channels from file", 4000)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        self.start_load(path, "file")
         self.setFocus()
 
     def load_m3u(self):
@@ -557,24 +2220,291 @@ class M3UPlayer(QMainWindow):
         else:
             return
 
+        self.start_load(url, "URL")
+        self.setFocus()
+
+    def edit_sources(self):
         try:
-            self.statusBar.showMessage(f"Loading, please wait...", 4000)
-            r = requests.get(url, timeout=15)
-            r.raise_for_status()
-            items = self._parse_m3u_content(r.text.splitlines())
-            self.model.clear()
-            self.model.append_items(items)
-            self.statusBar.showMessage(f"Loaded {len(items)} channels from URL", 4000)
+            with open(SOURCES_FILE, encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            text = f"# name = playlist URL, file or {XTREAM} (the account in config.txt), one per line\n"
+        dialog = QInputDialog(self)
+        dialog.setWindowTitle("Sources")
+        dialog.setLabelText("Load and merge these sources:")
+        dialog.setOption(QInputDialog.UsePlainTextEditForTextInput)
+        dialog.setTextValue(text)
+        dialog.setOkButtonText("Load")
+        dialog.setCancelButtonText("Cancel")
+        dialog.resize(520, 300)
+
+        for btn in dialog.findChildren(QPushButton):
+            btn.setCursor(Qt.PointingHandCursor)
+            btn.setMinimumWidth(100)
+            btn.setStyleSheet(BUTTON_STYLE)
+            if FLAT:
+                btn.setFlat(True)
+
+        if not dialog.exec():
+            return
+        text = dialog.textValue()
+        try:
+            sources = parse_sources(text)
+            atomic_write(SOURCES_FILE, lambda f: f.write(text))
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"Could not load:\n{e}")
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        if sources:
+            self.start_sources(sources)
+        self.setFocus()
+
+    def start_sources(self, sources, revalidate=True):
+        def xtream():
+            return XtreamClient(IPTV_URL, IPTV_USER, IPTV_PASS, self.xtream_cache,
+                                XTREAM_CACHE_MIN * 60, XTREAM_CONNECTIONS)
+        keep = self.model.snapshot() if self.is_reload(SOURCES_FILE) else None
+        loader = SourcesLoader(sources, self.cache, xtream, keep, revalidate, self)
+        loader.progress.connect(self.on_sources_progress)
+        loader.source_done.connect(self.on_source_done)
+        self.statusBar.setToolTip("")
+        self.run_loader(loader)
+
+    def on_sources_progress(self, done, total):
+        if self.sender() is self.loader:
+            self.statusBar.showMessage(
+                f"Loading sources… {self.loaded_count():,} channels · {done} / {total} sources")
+
+    def on_source_done(self, stats):
+        # hover the status bar for how each source did
+        if stats.error:
+            metrics.error("Source", stats.summary())
+        else:
+            metrics.record("source.load", stats.elapsed)
+        if self.sender() is self.loader:
+            tip = self.statusBar.toolTip()
+            self.statusBar.setToolTip(f"{tip}\n{stats.summary()}" if tip else stats.summary())
+
+    def start_load(self, source, kind, revalidate=True):
+        loader = PlaylistLoader(source, kind, self.cache, revalidate, self)
+        loader.progress.connect(self.on_load_progress)
+        self.run_loader(loader)
+
+    def is_reload(self, source):
+        # only the source the list came from is diffed against it, any
+        # other playlist replaces the list
+        return bool(self.model.rowCount()) and self.list_source == str(source)
+
+    def set_list_source(self, source):
+        self.list_source = source
+        if self.state_ready:
+            self.state.record(["meta", "source", source])
+
+    def run_loader(self, loader):
+        self.cancel_load()
+        self.loader = loader
+        self.loader.batch.connect(self.on_load_batch)
+        self.loader.finished.connect(self.on_load_finished)
+        self.btn_cancel.show()
+        if self.is_reload(loader.source):
+            self.refresh_rows = []
+            self.statusBar.showMessage("Refreshing, please wait...")
+        else:
+            if self.model.rowCount():
+                self.stop_check()
+                self.model.clear()
+            self.set_list_source(str(loader.source))
+            self.statusBar.showMessage("Loading, please wait...")
+        self.load_started = monotonic()
+        self.loader.start()
+
+    def cancel_load(self, wait=200):
+        loader, self.loader = self.loader, None
+        self.refresh_rows = None
+        if loader is None:
+            return
+        loader.requestInterruption()
+        loader.wait(wait)  # a blocked read finishes in the background
+        self.btn_cancel.hide()
+        self.statusBar.showMessage(f"Loading cancelled, {self.model.rowCount()} channels loaded", 4000)
+
+    def on_load_batch(self, rows):
+        if self.sender() is not self.loader:
+            return
+        if self.refresh_rows is not None:
+            self.refresh_rows.extend(rows)
+        else:
+            self.model.append_items(rows)
+
+    def loaded_count(self):
+        if self.refresh_rows is not None:
+            return len(self.refresh_rows)
+        return self.model.rowCount()
+
+    def on_load_progress(self, done, total, rate):
+        if self.sender() is not self.loader:
+            return
+        text = f"Loading… {self.loaded_count():,} channels · {done / 1e6:.1f}"
+        if total:
+            text += f" / {total / 1e6:.1f} MB ({done * 100 // total}%)"
+        else:
+            text += " MB"
+        self.statusBar.showMessage(f"{text} · {rate / 1e6:.1f} MB/s")
+
+    def on_xtream_progress(self, done, total):
+        if self.sender() is self.loader:
+            self.statusBar.showMessage(
+                f"Loading Xtream… {self.loaded_count():,} channels · {done} / {total} categories")
+
+    def on_load_finished(self):
+        loader = self.sender()
+        if loader is not self.loader:
+            loader.deleteLater()
+            return
+        self.loader = None
+        rows, self.refresh_rows = self.refresh_rows, None
+        loader.deleteLater()
+        self.btn_cancel.hide()
+        if loader.error:
+            self.statusBar.clearMessage()
+            metrics.error("Load failed", loader.error)
+            QMessageBox.critical(self, "Error", f"Could not load:\n{loader.error}")
+        elif loader.changed:
+            self.statusBar.showMessage("Playlist changed on the server, reloading…")
+            if isinstance(loader, SourcesLoader):
+                self.start_sources(loader.sources, revalidate=False)
+            else:
+                self.start_load(loader.source, loader.kind, revalidate=False)
+            return
+        elif rows is not None:
+            cached = " (cached)" if loader.stale else ""
+            self.start_refresh(rows, f"{loader.kind}{cached}")
+            return
+        else:
+            cached = " (cached)" if loader.stale else ""
+            self.statusBar.showMessage(f"Loaded {loader.count} channels from {loader.kind}{cached}", 4000)
+            metrics.record("load", monotonic() - self.load_started)
+        self.search_worker.warm()
+
+    def start_refresh(self, channels, source):
+        # the diff runs in the loader slot, so a new load or closing cancels it
+        self.loader = RefreshDiffer(self.model.snapshot(), self.model.epoch, channels, source, self)
+        self.loader.finished.connect(self.on_refresh_finished)
+        self.statusBar.showMessage(f"Comparing {len(channels):,} channels…")
+        self.loader.start()
+
+    def on_refresh_finished(self):
+        differ = self.sender()
+        differ.deleteLater()
+        if differ is not self.loader:
+            return
+        self.loader = None
+        if differ.error:
+            metrics.error("Refresh failed", differ.error)
+            QMessageBox.critical(self, "Error", f"Could not refresh:\n{differ.error}")
+        elif differ.epoch == self.model.epoch:
+            diff = differ.diff
+            if diff:
+                # one bulk change for the journal, not a name op per row
+                self._journal_paused = True
+                try:
+                    with metrics.span("model.diff"):
+                        self.model.apply_diff(diff)
+                finally:
+                    self._journal_paused = False
+                self.state.reset()
+                self.autosave_timer.start()
+            self.statusBar.showMessage(f"Refreshed from {differ.source}: {diff.summary()}", 8000)
+            metrics.record("load", monotonic() - self.load_started)
+        self.search_worker.warm()
+
+    def load_epg(self):
+        dialog = QInputDialog(self)
+        dialog.setWindowTitle("Load guide")
+        dialog.setLabelText("XMLTV file or URL (.xml or .xml.gz):")
+        dialog.setTextValue(EPG_URL)
+        dialog.setOkButtonText("Load")
+        dialog.setCancelButtonText("Cancel")
+        dialog.resize(400, 120)
+
+        for btn in dialog.findChildren(QPushButton):
+            btn.setCursor(Qt.PointingHandCursor)
+            btn.setMinimumWidth(100)
+            btn.setStyleSheet(BUTTON_STYLE)
+            if FLAT:
+                btn.setFlat(True)
+
+        if not dialog.exec():
+            return
+        source = dialog.textValue().strip()
+        if source:
+            self.start_epg(source)
         self.setFocus()
 
+    def start_epg(self, source):
+        if self.epg_loader is not None:
+            self.epg_loader.requestInterruption()
+        self.epg_builds += 1
+        self.epg_loader = EpgLoader(source, f"{self.guide.path}.new{self.epg_builds}", self)
+        self.epg_loader.progress.connect(self.on_epg_progress)
+        self.epg_loader.finished.connect(self.on_epg_finished)
+        self.statusBar.showMessage("Loading guide…")
+        self.epg_loader.start()
+
+    def refresh_epg(self):
+        # the configured guide, once it is older than epg_refresh_hours
+        if not EPG_URL or self.epg_loader is not None:
+            return
+        try:
+            age = time() - os.path.getmtime(self.guide.path)
+        except OSError:
+            age = None
+        if age is None or age > EPG_REFRESH_HOURS * 3600:
+            self.start_epg(EPG_URL)
+
+    def on_epg_progress(self, count):
+        if self.sender() is self.epg_loader:
+            self.statusBar.showMessage(f"Loading guide… {count:,} programmes")
+
+    def on_epg_finished(self):
+        global EPG_URL
+        loader = self.sender()
+        loader.deleteLater()
+        current = loader is self.epg_loader
+        if current:
+            self.epg_loader = None
+        if not current or loader.error or loader.count is None:
+            try:
+                os.remove(loader.path)  # superseded, failed or cancelled
+            except OSError:
+                pass
+            if current and loader.error:
+                self.statusBar.clearMessage()
+                metrics.error("Guide failed", loader.error)
+                QMessageBox.critical(self, "Error", f"Could not load guide:\n{loader.error}")
+        else:
+            self.guide.replace(loader.path)
+            if loader.source != EPG_URL:
+                EPG_URL = loader.source
+                config.set("config", "epg_url", EPG_URL)
+            self.repaint_rows()
+            self.statusBar.showMessage(f"Guide loaded: {loader.count:,} programmes", 4000)
+
+    def update_guide(self):
+        if self.guide:
+            self.repaint_rows()
+
     def get_xtream(self):
         global IPTV_NAME, IPTV_URL, IPTV_USER, IPTV_PASS
 
         msg = QMessageBox(self)
         msg.setWindowTitle("Load IPTV Xtream")
-        msg.setText(f"This will remove all current channels and favs, and reload from your IPTV provider.\n\n"
+        if self.is_reload(IPTV_URL.rstrip("/")):
+            action = "refresh the channel list from your IPTV provider, keeping your favourites and order"
+        elif self.model.rowCount():
+            action = "replace the channel list with the one from your IPTV provider"
+        else:
+            action = "load the channel list from your IPTV provider"
+        msg.setText(f"This will {action}.\n\n"
                     f"Provider: {IPTV_NAME}\nURL: {IPTV_URL}\nUsername: {IPTV_USER}\nPassword: ************")
         msg.setIcon(QMessageBox.Icon.Question)
         msg.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
@@ -595,64 +2525,63 @@ class M3UPlayer(QMainWindow):
         reply = msg.exec()
 
         if reply == QMessageBox.Yes:
-            try:
-                self.statusBar.showMessage("Connecting to Xtream…", 3000)
-                xt = XTream(IPTV_NAME, IPTV_USER, IPTV_PASS, IPTV_URL)
-                xt.authenticate()
-
-                if not xt.authorization:
-                    QMessageBox.critical(self, "Xtream Error", "Login failed.")
-                    return
-
-                xt.load_iptv()
-                items = []
-
-                for ch in xt.channels:
-                    try:
-                        name = getattr(ch, "name", None)
-                        stream_id = getattr(ch, "stream_id", None) or getattr(ch, "streamId", None) or getattr(ch, "id", None)
-                        if not name or not stream_id:
-                            continue
-                        url = f"{IPTV_URL}/live/{IPTV_USER}/{IPTV_PASS}/{stream_id}.ts"
-                        items.append([name, url, False])
-                    except Exception as e:
-                        print("Skipped:", e)
-
-                if not items:
-                    QMessageBox.warning(self, "Xtream", "No channels found.")
-                    return
-
-                self.model.clear()
-                self.model.append_items(items)
-                QMessageBox.information(self, "Complete", "Xtream channels loaded.")
-            except Exception as e:
-                QMessageBox.critical(self, "Xtream Error", str(e))
+            client = XtreamClient(IPTV_URL, IPTV_USER, IPTV_PASS, self.xtream_cache,
+                                  XTREAM_CACHE_MIN * 60, XTREAM_CONNECTIONS)
+            loader = XtreamLoader(client, self)
+            loader.progress.connect(self.on_xtream_progress)
+            self.run_loader(loader)
+            self.statusBar.showMessage("Connecting to Xtream…")
         self.setFocus()
 
     def save_m3u(self):
-        path, _ = QFileDialog.getSaveFileName(self, "Save playlist", "playlist.m3u", "M3U Files (*.m3u)")
+        if self.exporter is not None:
+            self.statusBar.showMessage("Still saving the last playlist…", 3000)
+            return
+        scopes = ["All channels"]
+        if self.model.favourite_rids():
+            scopes.append("Favourites")
+        shown = self.proxy_model.rowCount()
+        if shown != self.model.rowCount():
+            scopes.append(f"Current view ({shown:,} channels)")
+        scope = scopes[0]
+        if len(scopes) > 1:
+            scope, ok = QInputDialog.getItem(self, "Save playlist", "Channels to save:", scopes, 0, False)
+            if not ok:
+                return
+        path, chosen = QFileDialog.getSaveFileName(self, "Save playlist", "playlist.m3u", ";;".join(EXPORT_FILTERS))
         if not path:
             return
-        try:
-            with open(path, "w", encoding="utf-8") as f:
-                f.write("#EXTM3U\n")
-                for item in self.model.get_playlist_copy():
-                    name, url, _ = item
-                    f.write(f"#EXTINF:-1,{name}\n{url}\n")
-            self.statusBar.showMessage("Playlist saved", 3000)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        if "." not in Path(path).name and chosen in EXPORT_FILTERS:
+            path += EXPORT_FILTERS[chosen]
+        rows = self.proxy_model.source_rows() if scope.startswith("Current") else None
+        self.exporter = ExportWorker(path, self.model.snapshot(), rows, scope == "Favourites", self)
+        self.exporter.progress.connect(self.on_export_progress)
+        self.exporter.finished.connect(self.on_export_finished)
+        self.exporter.start()
+
+    def on_export_progress(self, count):
+        if count:
+            self.statusBar.showMessage(f"Saving playlist… {count:,} channels")
+
+    def on_export_finished(self):
+        exporter, self.exporter = self.exporter, None
+        exporter.deleteLater()
+        if exporter.error:
+            self.statusBar.clearMessage()
+            metrics.error("Save failed", exporter.error)
+            QMessageBox.critical(self, "Error", exporter.error)
+        elif exporter.count is not None:
+            self.statusBar.showMessage(f"Playlist saved, {exporter.count:,} channels", 3000)
 
     def save_json(self):
         path, _ = QFileDialog.getSaveFileName(self, "Save json file", "playlist.json", "json files (*.json)")
         if not path:
             return
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump({
-                    "playlist": self.model.get_playlist_copy(),
-                    "show_favourites": self.show_favourites,
-                }, f, indent=2)
+            if Path(path).resolve() == self.state.path.resolve():
+                self.state.save(self.model.iter_rows(), self.state_meta())
+            else:
+                write_snapshot(path, self.model.iter_rows(), self.state_meta())
             self.statusBar.showMessage("json saved", 3000)
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
@@ -681,7 +2610,9 @@ class M3UPlayer(QMainWindow):
         reply = msg.exec()
 
         if reply == QMessageBox.Ok:
+            self.stop_check()
             self.model.clear()
+            self.set_list_source(None)
             self.statusBar.showMessage("List cleared", 3000)
         self.setFocus()
 
@@ -698,7 +2629,7 @@ class M3UPlayer(QMainWindow):
 
         grid = QGridLayout()
 
-        theme_names = ["amaranth", "charcoal", "ebony", "granite", "grape", "gunmetal", "plum", "sapphire", "blizzard", "bubblegum", "cream", "platinum"]
+        theme_names = themes.names()
 
         selected_theme = [None]
 
@@ -742,13 +2673,7 @@ class M3UPlayer(QMainWindow):
             chosen_name = selected_theme[0]
             chosen = chosen_name + ".xml"
 
-            apply_stylesheet(
-                QApplication.instance(),
-                theme=f"themes/{chosen}",
-                extra={"font_family": APP_FONT, "font_size": APP_FONT_SIZE}
-            )
-            QApplication.instance().setStyle(QApplication.style())
-            self.style().polish(self)
+            apply_theme(QApplication.instance(), chosen)
 
             APP_THEME = chosen
 
@@ -756,14 +2681,13 @@ class M3UPlayer(QMainWindow):
             self.update_star_icons()
             self.update_fav_button_icon()
 
-            self.list_view.viewport().update()
+            self.repaint_rows()
             self.update()
 
             self.statusBar.showMessage(f"Theme changed to {chosen_name}", 8000)
 
             config.set('config', 'app_theme', chosen_name)
-            with open('config.txt', 'w') as cfgfile:
-                config.write(cfgfile)
+            write_config()
 
         else:
             ""
@@ -771,21 +2695,115 @@ class M3UPlayer(QMainWindow):
         self.setFocus()
 
     def play_selected(self):
-        idx = self.list_view.currentIndex()
-        if not idx.isValid():
+        if self.group_model is not None:
+            src_idx = self.group_model.mapToSource(self.group_view.currentIndex())
+        else:
+            src_idx = self.proxy_model.mapToSource(self.list_view.currentIndex())
+        if not src_idx.isValid():
             return
-        src_idx = self.proxy_model.mapToSource(idx)
         url = self.model.data(src_idx, PlaylistModel.UrlRole)
         try:
-            if os.name == "nt":
-                subprocess.Popen([MPV_PATH, *MPV_ARGS, url])
-            else:
-                subprocess.Popen(["mpv", *MPV_ARGS, url])
-            if MINIMISE:
-                sleep(5)
-                self.showMinimized()
+            with metrics.span("play"):
+                self.player.play(url)
         except FileNotFoundError:
             QMessageBox.critical(self, "mpv not found", f"Check MPV_PATH\nCurrently: {MPV_PATH}")
+            return
+        self.player_info = {"channel": self.model.data(src_idx, PlaylistModel.NameRole)}
+        self.update_player_label()
+        self.minimise_pending = MINIMISE  # once the first frame is up
+
+    def on_player_event(self, msg):
+        event = msg.get("event")
+        if event == "property-change":
+            self.player_info[msg.get("name")] = msg.get("data")
+        elif event == "zap":
+            self.player_info["zap"] = msg["latency"]
+            metrics.record("play.zap", msg["latency"])
+            if self.minimise_pending:
+                self.minimise_pending = False
+                self.showMinimized()
+        elif event == "end-file" and msg.get("reason") == "error":
+            self.statusBar.showMessage(
+                f"Could not play {self.player_info.get('channel', '')}: {msg.get('file_error', 'error')}", 8000)
+        elif event == "ipc-failed":
+            # mpv runs but can't be controlled, the next channel starts another one
+            self.statusBar.showMessage("No IPC connection to mpv", 8000)
+            if self.minimise_pending:
+                self.minimise_pending = False
+                self.showMinimized()
+        elif event == "ipc-closed":
+            self.player_info = {}
+        else:
+            return
+        self.update_player_label()
+
+    def update_player_label(self):
+        info = self.player_info
+        if not info:
+            self.player_label.clear()
+            return
+        parts = [info.get("channel") or info.get("media-title") or ""]
+        if info.get("pause"):
+            parts.append("paused")
+        if info.get("demuxer-cache-duration") is not None:
+            parts.append(f"cache {info['demuxer-cache-duration']:.1f}s")
+        bitrate = (info.get("video-bitrate") or 0) + (info.get("audio-bitrate") or 0)
+        if bitrate:
+            parts.append(f"{bitrate / 1e6:.1f} Mb/s")
+        if info.get("zap") is not None:
+            parts.append(f"zap {info['zap'] * 1000:.0f} ms")
+        self.player_label.setText(" · ".join(p for p in parts if p))
+
+    # ------- Metrics -------
+    def toggle_metrics(self):
+        visible = not self.metrics_label.isVisible()
+        self.metrics_label.setVisible(visible)
+        if visible:
+            self.update_metrics()
+            self.metrics_timer.start()
+        else:
+            self.metrics_timer.stop()
+
+    def update_metrics(self):
+        rows, shown = self.model.rowCount(), self.proxy_model.rowCount()
+        metrics.gauge("rows", rows)
+        metrics.gauge("rows_shown", shown)
+        metrics.gauge("favourites", len(self.model.favourite_rids()))
+        metrics.gauge("dead", len(self.model.dead_rids()))
+        parts = [f"{shown:,} / {rows:,} rows" if shown != rows else f"{rows:,} rows"]
+        filter_ms = metrics.last_ms("filter")
+        if filter_ms is not None:
+            parts.append(f"filter {filter_ms:.1f} ms")
+        load_ms = metrics.last_ms("load")
+        if load_ms is not None:
+            parts.append(f"load {load_ms / 1000:.1f} s")
+        parts.append(f"{rss_bytes() / 2**20:.0f} MB")
+        if metrics.profiling:
+            parts.append("profiling")
+        self.metrics_label.setText(" · ".join(parts))
+
+    def toggle_profile(self):
+        if metrics.profiling:
+            self.dump_trace()
+            return
+        metrics.start_profile()
+        self.update_metrics()
+        self.statusBar.showMessage("Profiling, Ctrl+Shift+P again to stop and write the trace", 4000)
+
+    def dump_trace(self, path=None):
+        # timings, gauges and errors, plus the profile if one is running
+        if path is None:
+            path = str(Path(TRACE_DIR) / f"trace-{strftime('%Y%m%d-%H%M%S')}.json")
+        self.update_metrics()
+        try:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            profile = metrics.stop_profile(str(Path(path).with_suffix(".prof"))) if metrics.profiling else None
+            metrics.dump(path, profile)
+        except OSError as e:
+            metrics.error("Trace failed", e)
+            return
+        self.update_metrics()
+        self.statusBar.showMessage(f"Trace written to {path}", 8000)
 
     def show_info(self):
         msg = QMessageBox(self)
@@ -803,52 +2821,135 @@ class M3UPlayer(QMainWindow):
         msg.exec()
 
     def load_state(self):
-        path = Path(STATE_FILE)
-        if not path.exists():
+        # shares the loader slot, so opening a playlist cancels the restore
+        self.loader = StateLoader(self.state, self)
+        self.loader.loaded.connect(self.on_state_loaded)
+        self.loader.batch.connect(self.on_state_batch)
+        self.loader.finished.connect(self.on_state_finished)
+        self.loader.start()
+
+    def on_state_loaded(self, meta):
+        self.state_ready = True
+        self.show_favourites = meta.get("show_favourites", False)
+        self.proxy_model.show_only_favourites = self.show_favourites
+        self.update_fav_button_icon()
+        self.btn_dead.setChecked(meta.get("hide_dead", False))
+        self.proxy_model.hide_dead = self.btn_dead.isChecked()
+        self.btn_groups.setChecked(meta.get("groups", False))
+        self.set_grouped(self.btn_groups.isChecked())
+        self.list_source = meta.get("source")
+
+    def on_state_batch(self, rows):
+        if self.sender() is not self.loader:
             return
+        self._journal_paused = True
         try:
-            with path.open(encoding="utf-8") as f:
-                data = json.load(f)
-            if isinstance(data, list):
-                items = [[n, u, False] for n, u in data]
-            else:
-                items = data.get("playlist", [])
-                self.show_favourites = data.get("show_favourites", False)
-            self.model.append_items(items)
-            self.proxy_model.show_only_favourites = self.show_favourites
-            self.update_fav_button_icon()
-            self.statusBar.showMessage(f"Restored {len(items)} channels", 4000)
-        except Exception as e:
-            print("State load failed:", e)
+            self.model.append_items(rows)
+        finally:
+            self._journal_paused = False
+
+    def on_state_finished(self):
+        loader = self.sender()
+        loader.deleteLater()
+        self.state_ready = True
+        if loader is self.loader:
+            self.loader = None
+            if loader.error:
+                metrics.error("State load failed", loader.error)
+            elif loader.count:
+                self.statusBar.showMessage(f"Restored {loader.count} channels", 4000)
+            self.search_worker.warm()
+        if self.state.dirty:
+            self.autosave_timer.start()
+        startup_mark("state restore")
+        startup_report()
+        self.refresh_epg()
+
+    def state_meta(self):
+        return {"show_favourites": self.show_favourites, "hide_dead": self.proxy_model.hide_dead,
+                "groups": self.btn_groups.isChecked(), "source": self.list_source}
+
+    def on_state_data_changed(self, top_left, bottom_right, roles=()):
+        if self._journal_paused:
+            return
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            if PlaylistModel.FavRole in roles:
+                fav = self.model.data(self.model.index(row), PlaylistModel.FavRole)
+                self.state.record(["fav", row, int(fav)])
+            if PlaylistModel.NameRole in roles:
+                self.state.record(["name", row, self.model.data(self.model.index(row), PlaylistModel.NameRole)])
+        if self.state.ops >= COMPACT_OPS:
+            self.autosave_timer.start()
+
+    def on_state_error(self, where, message):
+        metrics.error(where, message)
+        self.statusBar.showMessage(f"{where}: {message}", 8000)
+
+    def on_state_moved(self, rows, dest):
+        self.state.record(["move", rows, dest])
+
+    def on_state_bulk_change(self):
+        if self._journal_paused:
+            return
+        self.state.reset()
+        self.autosave_timer.start()
+
+    def autosave(self):
+        if self.state.dirty or self.state.ops:
+            self.state.save_async(self.model.snapshot().rows(), self.state_meta())
 
     def update_config(self):
-        cfgfile = open('config.txt', 'w')
         config.set("config", "app_height", str(self.height()))
         config.set("config", "app_width", str(self.width()))
-        config.write(cfgfile)
-        cfgfile.close()  
+        write_config()
 
     def closeEvent(self, event):
-        try:
-            with open(STATE_FILE, "w", encoding="utf-8") as f:
-                json.dump({
-                    "playlist": self.model.get_playlist_copy(),
-                    "show_favourites": self.show_favourites,
-                }, f, indent=2)
-        except Exception:
-            pass
+        restoring = isinstance(self.loader, StateLoader)
+        self.cancel_load(wait=0)
+        self.stop_check(wait=0)
+        if self.exporter is not None:
+            self.exporter.wait()  # a save the user asked for is let finish
+        # superseded loaders and checks too, a cancelled one can still be
+        # blocked in a read: none may be destroyed with the window while
+        # it runs, and reads time out
+        threads = [thread for thread in self.findChildren(QThread)
+                   if isinstance(thread, (PlaylistLoader, XtreamLoader, SourcesLoader, StateLoader,
+                                          RefreshDiffer, HealthWorker, EpgLoader))]
+        for thread in threads:
+            thread.requestInterruption()
+        for thread in threads:
+            thread.wait()
+        self.guide.close()
+        self.theme_renderer.requestInterruption()
+        self.theme_renderer.wait()
+        if self.logos is not None:
+            self.logos.close()
+        self.search_worker.stop()
+        # everything but an unsaved bulk change is already in the journal,
+        # and a half-restored list must not replace the snapshot
+        self.state.wait()
+        if self.state.dirty and not restoring:
+            try:
+                self.state.save(self.model.iter_rows(), self.state_meta())
+            except Exception as e:
+                metrics.error("State save failed", e)
+        self.state.close()
+        self.player.close()
+        if TRACE_FILE or metrics.profiling:
+            self.dump_trace(TRACE_FILE)
 
         self.update_config()
         super().closeEvent(event)
 
 # ---------- Entry Point ------------------------
 if __name__ == "__main__":
+    startup_mark("imports")
     app = QApplication(sys.argv)
-    apply_stylesheet(
-        app,
-        theme="themes/" + APP_THEME + ".xml",
-        extra={"font_family": APP_FONT, "font_size": APP_FONT_SIZE}
-    )
+    add_theme_fonts()
+    apply_theme(app, APP_THEME)
+    startup_mark("stylesheet")
     window = M3UPlayer()
     window.show()
+    startup_mark("window")
+    QTimer.singleShot(0, lambda: startup_mark("first paint"))
     sys.exit(app.exec())
\ No newline at end of file
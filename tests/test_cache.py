@@ -0,0 +1,68 @@
+# Simple IPTV thing - tests: playlist cache and conditional revalidation
+# github.com/tugbaot/simple-iptv
+
+from iptv.cache import PlaylistCache, conditional_get
+
+BODY = b"#EXTM3U\n#EXTINF:-1,One\nhttp://h/1\n"
+
+
+def download(cache, url):
+    # what PlaylistLoader does: 304 keeps the cached copy, 200 replaces it
+    with conditional_get(url, cache, timeout=5) as r:
+        if r.status_code == 304:
+            return 304, None
+        writer = cache.writer(url)
+        for chunk in r.iter_content(7):
+            writer.write(chunk)
+        changed = writer.commit(r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        return r.status_code, changed
+
+
+def etag_route(body, etag):
+    def route(handler):
+        if handler.headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"ETag": etag, "Last-Modified": "Mon, 05 Oct 2026 10:00:00 GMT"}, body
+    return route
+
+
+def test_revalidates_with_etag(server, tmp_path):
+    url = server.url("/list.m3u")
+    server.routes["/list.m3u"] = etag_route(BODY, '"v1"')
+    cache = PlaylistCache(tmp_path)
+
+    assert download(cache, url) == (200, True)
+    assert "If-None-Match" not in server.requests[-1][1]
+    assert download(cache, url) == (304, None)
+    headers = server.requests[-1][1]
+    assert headers["If-None-Match"] == '"v1"'
+    assert headers["If-Modified-Since"] == "Mon, 05 Oct 2026 10:00:00 GMT"
+    with cache.open(url) as f:
+        assert f.read() == BODY
+
+    # a new body under a new tag replaces it, the same body is no change
+    server.routes["/list.m3u"] = etag_route(BODY + b"#EXTINF:-1,Two\nhttp://h/2\n", '"v2"')
+    assert download(cache, url) == (200, True)
+    server.routes["/list.m3u"] = etag_route(BODY + b"#EXTINF:-1,Two\nhttp://h/2\n", '"v3"')
+    assert download(cache, url) == (200, False)
+
+
+def test_index_survives_reopening(server, tmp_path):
+    url = server.url("/list.m3u")
+    server.routes["/list.m3u"] = etag_route(BODY, '"v1"')
+    download(PlaylistCache(tmp_path), url)
+    cache = PlaylistCache(tmp_path)
+    assert cache.validators(url)["If-None-Match"] == '"v1"'
+    assert cache.fresh(url, 60) and not cache.fresh(url, 0)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = PlaylistCache(tmp_path, max_bytes=1)
+    for url in ("http://a", "http://b"):
+        writer = cache.writer(url)
+        writer.write(BODY)
+        writer.commit()
+    assert cache.lookup("http://a") is None
+    assert cache.lookup("http://b") is not None
+    assert sorted(p.name for p in tmp_path.iterdir() if p.name.endswith(".gz")) == [
+        PlaylistCache.key("http://b") + PlaylistCache.SUFFIX]
@@ -0,0 +1,90 @@
+# Simple IPTV thing - tests: the command line
+# github.com/tugbaot/simple-iptv
+
+import gzip
+import io
+
+import pytest
+
+from iptv.cli import main
+from iptv.m3u import parse_m3u
+
+UK = b"""#EXTM3U
+#EXTINF:-1 tvg-id="bbc1.uk" group-title="UK",BBC One
+#EXTVLCOPT:http-user-agent=Foo
+http://a/1.ts
+#EXTINF:-1 group-title="UK",BBC One SD
+http://a/2.ts
+#EXTINF:-1 group-title="FR",TF1
+http://a/3.ts
+"""
+MORE = b"""#EXTM3U
+#EXTINF:-1 tvg-id="bbc1.uk" group-title="UK",BBC One HD
+http://b/1.ts
+#EXTINF:-1 group-title="UK",Dave
+HTTP://A:80/2.ts
+#EXTINF:-1 group-title="UK",ITV
+http://b/2.ts
+"""
+
+
+def names(path):
+    with open(path, "rb") as f:
+        return [ch.name for ch in parse_m3u(f)]
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    (tmp_path / "uk.m3u").write_bytes(UK)
+    (tmp_path / "more.m3u.gz").write_bytes(gzip.compress(MORE))
+    return tmp_path
+
+
+def test_filters(inputs):
+    out = inputs / "out.m3u"
+    assert main([str(inputs / "uk.m3u"), "-o", str(out), "--group", "^uk$", "--exclude", r"\bSD\b", "-q"]) == 0
+    assert names(out) == ["BBC One"]
+    assert "#EXTVLCOPT:http-user-agent=Foo" in out.read_text("utf-8")
+
+
+def test_merge_with_dedup_to_gzip(inputs):
+    out = inputs / "all.m3u.gz"
+    assert main([str(inputs / "uk.m3u"), str(inputs / "more.m3u.gz"), "--dedup", "-o", str(out), "-q"]) == 0
+    with gzip.open(out) as f:
+        assert [ch.name for ch in parse_m3u(f)] == ["BBC One", "BBC One SD", "TF1", "ITV"]
+
+
+def test_json_round_trip_keeps_favourites(inputs):
+    saved = inputs / "playlist.json"
+    assert main([str(inputs / "uk.m3u"), "-o", str(saved), "-q"]) == 0
+    text = saved.read_text("utf-8").replace("false", "true", 1)
+    saved.write_text(text, "utf-8")
+    out = inputs / "favs.m3u"
+    assert main([str(saved), "--favourites", "-o", str(out), "-q"]) == 0
+    with open(out, "rb") as f:
+        (bbc,) = parse_m3u(f)
+    with open(inputs / "uk.m3u", "rb") as f:
+        assert bbc == next(parse_m3u(f))
+
+
+def test_url_input(server, inputs):
+    server.routes["/list.m3u"] = (200, {}, UK)
+    out = inputs / "out.m3u"
+    assert main([server.url("/list.m3u"), "--name", "tf", "-o", str(out), "-q"]) == 0
+    assert names(out) == ["TF1"]
+
+
+def test_stdout_and_summary(inputs, capsys):
+    assert main([str(inputs / "uk.m3u"), "--group", "FR"]) == 0
+    out, err = capsys.readouterr()
+    assert [ch.name for ch in parse_m3u(io.StringIO(out))] == ["TF1"]
+    assert err.startswith("3 read, 2 filtered out, 0 duplicates, 1 written")
+
+
+def test_errors(inputs, capsys):
+    assert main([str(inputs / "missing.m3u"), "-o", str(inputs / "out.m3u")]) == 1
+    assert "error:" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        main([str(inputs / "uk.m3u"), "--name", "("])
+    with pytest.raises(SystemExit):
+        main([])
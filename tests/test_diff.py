@@ -0,0 +1,63 @@
+# Simple IPTV thing - tests: refreshing a playlist by diffing
+# github.com/tugbaot/simple-iptv
+
+from iptv.diff import diff_playlist, normalise_url
+from iptv.m3u import Channel
+from iptv.store import ChannelStore
+
+
+def store_of(channels):
+    store = ChannelStore()
+    store.append(channels)
+    return store
+
+
+def test_normalise_url():
+    assert normalise_url(" HTTP://Host.EXAMPLE:80/a/B?x=1#frag") == "http://host.example/a/B?x=1"
+    assert normalise_url("https://h:443/x") == "https://h/x"
+    assert normalise_url("https://h:8443/x") == "https://h:8443/x"
+    assert normalise_url("rtmp://h/x") == "rtmp://h/x"
+
+
+def test_same_playlist_is_no_change():
+    channels = [Channel("A", "http://h/a", 120, {"tvg-id": "a"}, ("#EXTVLCOPT:x=y",)),
+                Channel("B", "http://h/b")]
+    assert not diff_playlist(store_of(channels), list(channels))
+
+
+def test_added_removed_updated():
+    store = store_of([Channel("A", "http://h/a"), Channel("B", "http://h/b"),
+                      Channel("C", "http://h/c")])
+    diff = diff_playlist(store, [Channel("New", "http://h/new"), Channel("A", "http://h/a"),
+                                 Channel("C renamed", "http://h/c"), Channel("D", "http://h/d")])
+    assert diff.removed == [1]
+    assert diff.updated == [(2, Channel("C renamed", "http://h/c"))]
+    assert diff.added == [(None, [Channel("New", "http://h/new")]), (2, [Channel("D", "http://h/d")])]
+    assert diff.summary() == "2 added, 1 removed, 1 changed"
+
+
+def test_changed_extras_are_an_update():
+    store = store_of([Channel("A", "http://h/a", -1, None, ("#EXTVLCOPT:x=1",))])
+    new = Channel("A", "http://h/a", -1, None, ("#EXTVLCOPT:x=2",))
+    assert diff_playlist(store, [new]).updated == [(0, new)]
+
+
+def test_xtream_password_change_keeps_records():
+    old = [Channel("One", "http://x/live/user/old/101.ts"), Channel("Two", "http://x/live/user/old/102.ts")]
+    new = [Channel("One", "http://x/live/user/new/101.ts"), Channel("Two", "http://x/live/user/new/102.ts")]
+    diff = diff_playlist(store_of(old), new)
+    assert not diff.removed and not diff.added
+    assert [rid for rid, _ in diff.updated] == [0, 1]
+
+
+def test_tvg_id_matches_a_moved_stream():
+    store = store_of([Channel("BBC", "http://old/bbc", -1, {"tvg-id": "bbc.uk"})])
+    new = Channel("BBC", "http://new/bbc", -1, {"tvg-id": "bbc.uk"})
+    diff = diff_playlist(store, [new])
+    assert diff.updated == [(0, new)] and not diff.removed
+
+
+def test_duplicates_pair_up_in_row_order():
+    store = store_of([Channel("A1", "http://h/a"), Channel("A2", "http://h/a")])
+    diff = diff_playlist(store, [Channel("A1", "http://h/a")])
+    assert diff.removed == [1] and not diff.updated
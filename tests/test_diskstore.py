@@ -0,0 +1,117 @@
+# Simple IPTV thing - tests: the on-disk channel store
+# github.com/tugbaot/simple-iptv
+
+import re
+import threading
+
+from iptv.diskstore import DiskSearch, DiskState, DiskStore
+from iptv.m3u import Channel
+
+CHANNELS = [Channel(f"Channel {i}", f"http://h/{i}.ts", -1, {"group-title": f"G{i % 3}"})
+            for i in range(1000)]
+CHANNELS[5] = Channel("Télé 5", "http://h/5.ts", 60, {"tvg-id": "tele5.fr"}, ("#EXTVLCOPT:x=y",))
+
+
+def filled(tmp_path):
+    store = DiskStore(tmp_path / "store.db")
+    store.append(CHANNELS)
+    return store
+
+
+def test_reads_back_every_channel(tmp_path):
+    store = filled(tmp_path)
+    assert len(store) == 1000
+    assert [store.channel(rid) for rid in (999, 0, 5, 600)] == [CHANNELS[i] for i in (999, 0, 5, 600)]
+    assert store.group(7) == "G1"
+    assert list(store.channels()) == CHANNELS
+    store.close()
+
+
+def test_reopening_keeps_order_and_favourites(tmp_path):
+    store = filled(tmp_path)
+    store.move_rows([0, 1], 10)
+    store.set_fav(3, True)
+    store.set_name(4, "Four")
+    store.flush()
+    order = list(store.order)
+    store.close()
+
+    again = DiskStore(tmp_path / "store.db")
+    assert list(again.order) == order
+    assert again.favs == {3}
+    assert again.name(4) == "Four"
+    again.close()
+
+
+def test_unflushed_changes_rebuild_the_order(tmp_path):
+    store = filled(tmp_path)
+    store.move_rows([0], 3)
+    store.flush()
+    order = list(store.order)
+    store.remove_block(0, 1)
+    store.append([Channel("New", "http://h/new")])
+    store.close()  # no flush, as after a crash
+
+    again = DiskStore(tmp_path / "store.db")
+    assert list(again.order) == order[2:] + [1000]
+    assert again.name(1000) == "New"
+    again.close()
+
+
+def test_replace_and_rows(tmp_path):
+    store = filled(tmp_path)
+    store.replace(1, Channel("One", "http://h/one", -1, {"group-title": "New"}))
+    assert store.channel(1) == Channel("One", "http://h/one", -1, {"group-title": "New"})
+    assert store.group(1) == "New"
+    rows = list(store.rows())
+    assert rows[5] == ["Télé 5", "http://h/5.ts", False, {"tvg-id": "tele5.fr"}, 60, ["#EXTVLCOPT:x=y"]]
+    assert rows[0] == ["Channel 0", "http://h/0.ts", False, {"group-title": "G0"}]
+    store.close()
+
+
+def test_copy_reads_on_another_thread(tmp_path):
+    store = filled(tmp_path)
+    copy = store.copy()
+    store.set_fav(2, True)
+    names = []
+
+    def read():
+        names.extend(copy.name(rid) for rid in copy.order)
+        copy.close()
+    thread = threading.Thread(target=read)
+    thread.start()
+    thread.join()
+    assert names == [ch.name for ch in CHANNELS]
+    assert not copy.favs
+    store.close()
+
+
+def test_search(tmp_path):
+    store = filled(tmp_path)
+    search = DiskSearch(store)
+    assert search.search("TELE") == {5}
+    assert search.search("channel 99") == {99} | set(range(990, 1000))
+    assert search.search("  ") is None
+    store.close()
+
+
+def test_regex_and_cancelled_scans(tmp_path):
+    store = DiskStore(tmp_path / "big.db")
+    store.append(Channel(f"Channel {i}", f"http://h/{i}.ts") for i in range(20000))
+    store.flush()
+    search = DiskSearch(store)
+    assert search.regex(re.compile(r"^channel 1999\d$", re.I)) == set(range(19990, 20000))
+    assert search.regex(re.compile("7$"), {7, 8, 17}) == {7, 17}
+    assert search.regex(re.compile("x"), cancelled=lambda: True) is None
+    assert search.search("channel", cancelled=lambda: True) is None
+    store.close()
+
+
+def test_state_keeps_meta_in_the_file(tmp_path):
+    store = filled(tmp_path)
+    state = DiskState(store)
+    state.record(["meta", "show_favourites", True])
+    state.close()
+    again = DiskStore(tmp_path / "store.db")
+    assert DiskState(again).load() == ([], {"show_favourites": True})
+    again.close()
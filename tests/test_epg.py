@@ -0,0 +1,63 @@
+# Simple IPTV thing - tests: XMLTV parsing and now/next lookups
+# github.com/tugbaot/simple-iptv
+
+import gzip
+import io
+import time
+
+from iptv import epg as epg_module
+from iptv.epg import EpgGuide, Programme, build_epg, parse_xmltv, xmltv_time
+
+
+def stamp(t):
+    return time.strftime("%Y%m%d%H%M%S +0000", time.gmtime(t))
+
+
+def guide(now):
+    hour = 3600
+    progs = [("bbc1.uk", now - 2 * hour, now - hour, "Over"),
+             ("bbc1.uk", now - hour, now + hour, "News"),
+             ("bbc1.uk", now + hour, now + 2 * hour, "Weather"),
+             ("ITV1.uk", now + hour, now + 2 * hour, "Later")]
+    xml = ['<?xml version="1.0"?><tv>',
+           '<channel id="bbc1.uk"><display-name>BBC One</display-name></channel>',
+           '<channel id="ITV1.uk"><display-name>ITV 1</display-name></channel>']
+    xml += [f'<programme channel="{ch}" start="{stamp(a)}" stop="{stamp(b)}"><title> {title} </title></programme>'
+            for ch, a, b, title in progs]
+    xml.append("</tv>")
+    return "".join(xml).encode("utf-8")
+
+
+def test_xmltv_time():
+    assert xmltv_time("20260118203000") == xmltv_time("20260118203000 +0000")
+    assert xmltv_time("20260118203000 +0100") == xmltv_time("20260118193000 +0000")
+    assert xmltv_time("20260118203000 -0030") == xmltv_time("20260118210000")
+    assert xmltv_time("202601182030") == xmltv_time("20260118203000")
+
+
+def test_parse_plain_and_gzipped():
+    now = int(time.time())
+    data = guide(now)
+    items = list(parse_xmltv(io.BytesIO(data), since=now))
+    assert items[:2] == [("channel", "bbc1.uk", "BBC One"), ("channel", "ITV1.uk", "ITV 1")]
+    assert [item[4] for item in items[2:]] == ["News", "Weather", "Later"]  # "Over" has ended
+    assert list(parse_xmltv(io.BytesIO(gzip.compress(data)), since=now)) == items
+
+
+def test_now_next(tmp_path):
+    now = int(time.time())
+    path = tmp_path / "epg.db"
+    assert build_epg(path, io.BytesIO(guide(now))) == 3
+    epg = EpgGuide(path)
+    current, nxt = epg.now_next("BBC1.UK", now)
+    assert current == Programme(now - 3600, now + 3600, "News")
+    assert nxt.title == "Weather"
+    assert epg.now_next("itv1.uk", now) == (None, Programme(now + 3600, now + 7200, "Later"))
+    assert epg.now_next("none", now) == (None, None)
+    assert epg.channel_for_name("bbc one") == "bbc1.uk"
+    epg.close()
+
+
+def test_cancelled_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(epg_module, "INSERT_ROWS", 1)
+    assert build_epg(tmp_path / "epg.db", io.BytesIO(guide(int(time.time()))), cancelled=lambda: True) is None
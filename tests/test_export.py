@@ -0,0 +1,65 @@
+# Simple IPTV thing - tests: exporting playlists
+# github.com/tugbaot/simple-iptv
+
+import gzip
+import json
+from xml.etree import ElementTree
+
+import pytest
+
+from iptv.export import export, export_format
+from iptv.m3u import Channel, parse_m3u
+
+CHANNELS = [Channel("BBC <One>", "http://h/1?a=1&b=2", -1,
+                    {"tvg-logo": "http://l/1.png", "group-title": "UK", "x-source": "a"}),
+            Channel("Film", "http://h/2", 120, None, ("#EXTVLCOPT:http-user-agent=Foo",)),
+            Channel("Plain", "http://h/3")]
+
+
+def test_export_format():
+    assert export_format("a.M3U8") == ("m3u", False)
+    assert export_format("a.jsonl.gz") == ("jsonl", True)
+    assert export_format("a.xspf") == ("xspf", False)
+    assert export_format("a.txt.gz") == ("m3u", True)
+
+
+@pytest.mark.parametrize("name", ["out.m3u", "out.m3u.gz"])
+def test_m3u_round_trip(tmp_path, name):
+    path = tmp_path / name
+    assert export(path, iter(CHANNELS), skip=("x-source",)) == 3
+    with (gzip.open if name.endswith(".gz") else open)(path, "rb") as f:
+        channels = list(parse_m3u(f))
+    assert channels[1:] == CHANNELS[1:]
+    assert channels[0].attrs == {"tvg-logo": "http://l/1.png", "group-title": "UK"}
+
+
+def test_jsonl(tmp_path):
+    path = tmp_path / "out.jsonl"
+    assert export(path, CHANNELS) == 3
+    rows = [json.loads(line) for line in path.read_text("utf-8").splitlines()]
+    assert rows[1] == {"name": "Film", "url": "http://h/2", "duration": 120,
+                       "extras": ["#EXTVLCOPT:http-user-agent=Foo"]}
+    assert rows[2] == {"name": "Plain", "url": "http://h/3"}
+
+
+def test_xspf(tmp_path):
+    path = tmp_path / "out.xspf"
+    assert export(path, CHANNELS) == 3
+    ns = {"x": "http://xspf.org/ns/0/"}
+    tracks = ElementTree.parse(path).getroot().findall("x:trackList/x:track", ns)
+    assert [t.findtext("x:title", namespaces=ns) for t in tracks] == ["BBC <One>", "Film", "Plain"]
+    assert tracks[0].findtext("x:location", namespaces=ns) == "http://h/1?a=1&b=2"
+    assert tracks[0].findtext("x:album", namespaces=ns) == "UK"
+
+
+def test_failed_export_keeps_the_old_file(tmp_path):
+    path = tmp_path / "out.m3u"
+    path.write_text("old", "utf-8")
+
+    def broken():
+        yield CHANNELS[0]
+        raise OSError("gone")
+    with pytest.raises(OSError):
+        export(path, broken())
+    assert path.read_text("utf-8") == "old"
+    assert [p.name for p in tmp_path.iterdir()] == ["out.m3u"]
@@ -0,0 +1,96 @@
+# Simple IPTV thing - tests: stream checks against local endpoints
+# github.com/tugbaot/simple-iptv
+
+import asyncio
+import threading
+import time
+
+from iptv.health import HealthCache, HealthChecker, probe
+
+TS = (200, {"Content-Type": "video/mp2t"}, b"\x47" * 188)
+HLS = {"Content-Type": "application/vnd.apple.mpegurl"}
+
+
+def check(url):
+    return asyncio.run(probe(url))
+
+
+def test_plain_stream(server):
+    server.routes["/live/1.ts"] = TS
+    health = check(server.url("/live/1.ts"))
+    assert health.alive and health.status == 200 and health.ttfb is not None
+
+
+def test_http_errors_are_dead(server):
+    health = check(server.url("/missing.ts"))
+    assert not health.alive and health.error == "HTTP 404"
+
+
+def test_hls_is_followed_down_to_a_segment(server):
+    server.routes["/master.m3u8"] = (200, HLS, b"#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=1\nmedia.m3u8\n")
+    server.routes["/media.m3u8"] = (200, HLS, b"#EXTM3U\n#EXTINF:6,\nseg/1.ts\n")
+    server.routes["/seg/1.ts"] = TS
+    assert check(server.url("/master.m3u8")).alive
+    # a live playlist whose segments are gone is as dead as a 404
+    server.routes["/seg/1.ts"] = (404, {}, b"")
+    assert check(server.url("/master.m3u8")).error == "HTTP 404"
+    server.routes["/media.m3u8"] = (200, HLS, b"#EXTM3U\n")
+    assert check(server.url("/master.m3u8")).error == "empty playlist"
+
+
+def test_redirects_are_followed(server):
+    server.routes["/old.ts"] = (302, {"Location": "/new.ts"}, b"")
+    server.routes["/new.ts"] = TS
+    assert check(server.url("/old.ts")).alive
+
+
+def test_refused_connection_is_dead():
+    assert not check("http://127.0.0.1:9/x.ts").alive
+
+
+def test_checker_limits_each_server_and_times_out(server):
+    running = {"now": 0, "most": 0}
+    lock = threading.Lock()
+
+    def slow(handler):
+        with lock:
+            running["now"] += 1
+            running["most"] = max(running["most"], running["now"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= 1
+        return TS
+
+    server.routes.update({f"/{i}.ts": slow for i in range(12)})
+    server.routes["/hang.ts"] = lambda handler: time.sleep(2) or TS
+    items = [(i, server.url(f"/{i}.ts")) for i in range(12)] + [("hang", server.url("/hang.ts"))]
+    results = {}
+    HealthChecker(None, concurrency=10, per_host=3, timeout=0.5).run(
+        items, lambda key, url, health: results.__setitem__(key, health))
+    assert 1 < running["most"] <= 3
+    assert all(results[i].alive for i in range(12))
+    assert results["hang"].error == "timed out"
+
+
+def test_cached_results_are_reused(server, tmp_path):
+    server.routes["/1.ts"] = TS
+    cache = HealthCache(tmp_path / "health.json", ttl=60)
+    url = server.url("/1.ts")
+    HealthChecker(cache).run([(1, url)], lambda *args: None)
+    asked = len(server.requests)
+    results = []
+    HealthChecker(HealthCache(tmp_path / "health.json", ttl=60)).run(
+        [(1, url)], lambda key, url, health: results.append(health))
+    assert len(server.requests) == asked
+    assert results[0].alive
+
+
+def test_cancel_stops_promptly(server):
+    server.routes.update({f"/{i}.ts": lambda handler: time.sleep(0.2) or TS for i in range(100)})
+    items = [(i, server.url(f"/{i}.ts")) for i in range(100)]
+    start = time.monotonic()
+    results = []
+    HealthChecker(None, concurrency=8, per_host=4, timeout=5).run(
+        items, lambda *args: results.append(args), lambda: time.monotonic() - start > 0.3)
+    assert time.monotonic() - start < 2
+    assert len(results) < 100
@@ -0,0 +1,68 @@
+# Simple IPTV thing - tests: M3U parsing and writing
+# github.com/tugbaot/simple-iptv
+
+import io
+
+from iptv.m3u import Channel, parse_extinf, parse_m3u, write_m3u
+
+PLAYLIST = b"""#EXTM3U x-tvg-url="http://guide/epg.xml"
+#EXTINF:-1 tvg-id="bbc1.uk" tvg-logo="http://logo/bbc1.png" group-title="UK, News",BBC One
+#EXTVLCOPT:http-user-agent=Foo
+http://host/live/1.ts
+#EXTINF:120,Plain, with comma
+#EXTGRP:Films
+#KODIPROP:inputstream=adaptive
+http://host/vod/2.mp4
+
+#EXTINF:-1 tvg-name="Three",
+http://host/live/three.m3u8
+http://host/bare/four.ts
+"""
+
+
+def test_extinf_attributes_and_quoted_commas():
+    duration, attrs, name = parse_extinf('#EXTINF:-1 tvg-id="x" group-title="A, B",Channel')
+    assert (duration, name) == (-1, "Channel")
+    assert attrs == {"tvg-id": "x", "group-title": "A, B"}
+
+
+def test_extinf_odd_lines():
+    assert parse_extinf("#EXTINF:5.5,Name") == (5, None, "Name")
+    assert parse_extinf("#EXTINF:-1 TVG-ID='y' bare=z,Name")[1] == {"tvg-id": "y", "bare": "z"}
+    assert parse_extinf('#EXTINF:tvg-id="x",Name') == (-1, {"tvg-id": "x"}, "Name")
+    assert parse_extinf("#EXTINF:-1") == (-1, None, "")
+
+
+def test_extinf_unbalanced_quote_uses_last_comma():
+    assert parse_extinf('#EXTINF:-1 tvg-name="abc,Name')[2] == "Name"
+
+
+def test_parse_playlist():
+    channels = list(parse_m3u(io.BytesIO(PLAYLIST)))
+    assert [ch.name for ch in channels] == ["BBC One", "Plain, with comma", "three.m3u8", "four.ts"]
+    bbc, plain, three, bare = channels
+    assert bbc.attr("group-title") == "UK, News"
+    assert bbc.extras == ("#EXTVLCOPT:http-user-agent=Foo",)
+    assert plain.duration == 120
+    assert plain.extras == ("#EXTGRP:Films", "#KODIPROP:inputstream=adaptive")
+    assert three.attrs == {"tvg-name": "Three"}
+    assert bare == Channel("four.ts", "http://host/bare/four.ts")
+
+
+def test_parse_is_independent_of_chunking_bom_and_line_ends():
+    data = b"\xef\xbb\xbf" + PLAYLIST.replace(b"\n", b"\r\n")
+    whole = list(parse_m3u(io.BytesIO(PLAYLIST)))
+    for size in (1, 7, 64):
+        assert list(parse_m3u(io.BytesIO(data), chunk_size=size)) == whole
+
+
+def test_utf8_split_across_chunks():
+    data = "#EXTM3U\n#EXTINF:-1,Café Télé\nhttp://h/1\n".encode("utf-8")
+    assert [ch.name for ch in parse_m3u(io.BytesIO(data), chunk_size=3)] == ["Café Télé"]
+
+
+def test_write_round_trip():
+    channels = list(parse_m3u(io.BytesIO(PLAYLIST)))
+    out = io.StringIO()
+    write_m3u(out, channels)
+    assert list(parse_m3u(io.BytesIO(out.getvalue().encode("utf-8")))) == channels
@@ -0,0 +1,74 @@
+# Simple IPTV thing - tests: the window's model, filter proxy and theming
+# github.com/tugbaot/simple-iptv
+
+import importlib.util
+import os
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PySide6.QtWidgets")
+pytest.importorskip("qtawesome")
+from iptv.diff import diff_playlist
+from iptv.m3u import Channel
+
+CHANNELS = [Channel(f"Channel {i}", f"http://h/{i}.ts") for i in range(20)]
+
+
+@pytest.fixture(scope="module")
+def app():
+    # simple-iptv.py, which chdirs to the repo and reads config.txt on import
+    cwd = os.getcwd()
+    spec = importlib.util.spec_from_file_location(
+        "simple_iptv", Path(__file__).resolve().parent.parent / "simple-iptv.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    os.chdir(cwd)
+    module.qapp = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    return module
+
+
+def filled(app):
+    model = app.PlaylistModel()
+    model.append_items(CHANNELS)
+    return model
+
+
+def names(model):
+    return [model.index(row).data(model.NameRole) for row in range(model.rowCount())]
+
+
+def test_diff_applies_to_rows_moved_meanwhile(app):
+    model = filled(app)
+    keep = CHANNELS[:3] + CHANNELS[5:]  # drops channels 3 and 4
+    diff = diff_playlist(model.snapshot(), keep)
+    model.move_rows([3, 4], 0)
+    model.apply_diff(diff)
+    assert names(model) == [ch.name for ch in keep]
+
+
+def test_compaction_keeps_search_hits(app, monkeypatch):
+    monkeypatch.setattr(app.PlaylistModel, "COMPACT_MIN", 5)
+    model = filled(app)
+    proxy = app.FavouriteFilterProxy()
+    proxy.setSourceModel(model)
+    proxy.set_search("1", model.query_index.search("1"))
+    model.apply_diff(diff_playlist(model.snapshot(), CHANNELS[10:]))
+    assert len(model._store.names) == 10  # compacted
+    shown = [proxy.index(row).data(model.NameRole) for row in range(proxy.rowCount())]
+    assert shown == [f"Channel {i}" for i in range(10, 20)]
+
+
+def test_theme_falls_back_to_qt_material(app, monkeypatch, tmp_path):
+    generate = pytest.importorskip("qt_material.resources.generate")
+    monkeypatch.setattr(generate, "RESOURCES_PATH", str(tmp_path))  # its icons, not in ~
+
+    def broken(name):
+        raise AttributeError("qt_material changed")
+    monkeypatch.setattr(app.themes, "load", broken)
+    monkeypatch.chdir(Path(app.__file__).parent)
+    app.qapp.setStyleSheet("")
+    app.apply_theme(app.qapp, "amaranth.xml")
+    assert "QPushButton" in app.qapp.styleSheet()
+    app.qapp.setStyleSheet("")
@@ -0,0 +1,36 @@
+# Simple IPTV thing - tests: painting doesn't eat references to None
+# github.com/tugbaot/simple-iptv
+
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PySide6.QtWidgets")
+from PySide6.QtCore import QRect
+from PySide6.QtGui import QImage, QPainter, QPixmap
+
+
+def test_painter_calls_keep_none_alive():
+    # PySide6 6.12 drops a reference to None on most QPainter calls, which
+    # aborts Pythons before 3.12 after a few thousand rows: see requirements.txt
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    image = QImage(200, 40, QImage.Format_ARGB32)
+    pixmap = QPixmap(20, 20)
+    palette = app.palette()
+    painter = QPainter(image)
+    try:
+        before = sys.getrefcount(None)
+        for _ in range(1000):
+            painter.save()
+            painter.fillRect(QRect(0, 0, 20, 20), palette.highlight())
+            painter.setOpacity(0.4)
+            painter.drawPixmap(QRect(0, 0, 20, 20), pixmap)
+            painter.setClipRect(QRect(0, 0, 100, 20))
+            painter.setPen(palette.text().color())
+            painter.drawText(4, 14, "channel")
+            painter.restore()
+        assert sys.getrefcount(None) > before - 100
+    finally:
+        painter.end()
@@ -0,0 +1,113 @@
+# Simple IPTV thing - tests: mpv control against a fake mpv
+# github.com/tugbaot/simple-iptv
+
+import json
+import os
+import queue
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+from iptv.player import OBSERVED, MpvController
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="fake mpv listens on a Unix socket")
+
+# answers every request, logs what it was sent and reports the first frame
+# of whatever it is asked to play
+FAKE_MPV = """#!{python}
+import json, socket, sys
+path = next(a.split("=", 1)[1] for a in sys.argv if a.startswith("--input-ipc-server="))
+server = socket.socket(socket.AF_UNIX)
+server.bind(path)
+server.listen(1)
+conn, _ = server.accept()
+send = lambda msg: conn.sendall(json.dumps(msg).encode() + b"\\n")
+if not sys.argv[-1].startswith("--"):
+    send({{"event": "playback-restart"}})
+buf = b""
+with open(path + ".log", "w") as log:
+    while True:
+        data = conn.recv(65536)
+        if not data:
+            break
+        *lines, buf = (buf + data).split(b"\\n")
+        for line in lines:
+            log.write(line.decode() + "\\n")
+            log.flush()
+            msg = json.loads(line)
+            command = msg["command"]
+            if command[0] == "loadfile":
+                send({{"event": "playback-restart"}})
+            if "request_id" in msg:
+                reply = {{"request_id": msg["request_id"], "error": "success"}}
+                if command[0] == "get_property":
+                    reply["data"] = "Fake " + command[1]
+                send(reply)
+"""
+
+
+@pytest.fixture
+def mpv():
+    # socket paths have to stay short, so not pytest's tmp_path
+    folder = tempfile.mkdtemp(prefix="iptv-")
+    exe = os.path.join(folder, "mpv")
+    with open(exe, "w") as f:
+        f.write(FAKE_MPV.format(python=sys.executable))
+    os.chmod(exe, 0o755)
+    events = queue.Queue()
+    player = MpvController(exe, ipc_path=os.path.join(folder, "mpv.sock"), on_event=events.put)
+    yield player, events
+    player.close()
+    if player._proc is not None:
+        player._proc.wait(5)
+    shutil.rmtree(folder)
+
+
+def wait_for(events, name):
+    while True:
+        event = events.get(timeout=5)
+        if event.get("event") == name:
+            return event
+
+
+def sent(player):
+    with open(player.ipc_path + ".log") as f:
+        return [json.loads(line)["command"] for line in f]
+
+
+def test_starts_once_and_zaps_with_loadfile(mpv):
+    player, events = mpv
+    player.play("http://h/1.ts")
+    wait_for(events, "ipc-connected")
+    assert wait_for(events, "zap")["latency"] >= 0
+    player.play("http://h/2.ts")
+    assert wait_for(events, "zap")["latency"] == player.last_zap
+    values = queue.Queue()
+    player.get_property("media-title", values.put)
+    assert values.get(timeout=5) == "Fake media-title"
+    commands = sent(player)
+    assert commands[:len(OBSERVED)] == [["observe_property", i, name] for i, name in enumerate(OBSERVED, 1)]
+    assert ["loadfile", "http://h/2.ts", "replace"] in commands
+
+
+def test_commands_wait_for_the_connection(mpv):
+    player, events = mpv
+    player.command("set_property", "volume", 50)
+    player.play("http://h/1.ts")
+    wait_for(events, "ipc-connected")
+    values = queue.Queue()
+    player.get_property("pause", values.put)
+    assert values.get(timeout=5) == "Fake pause"
+    assert sent(player)[len(OBSERVED)] == ["set_property", "volume", 50]
+
+
+def test_attaching_without_a_player_fails_cleanly():
+    events = queue.Queue()
+    player = MpvController(ipc_path=os.path.join(tempfile.gettempdir(), "iptv-missing.sock"),
+                           on_event=events.put)
+    player.CONNECT_TIMEOUT = 0.2
+    player.play("http://h/1.ts")
+    assert wait_for(events, "ipc-failed")
+    assert not player.connected
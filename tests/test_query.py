@@ -0,0 +1,166 @@
+# Simple IPTV thing - tests: filter query parsing and evaluation
+# github.com/tugbaot/simple-iptv
+
+import re
+import threading
+
+import pytest
+
+from iptv import search as search_module
+from iptv.m3u import Channel
+from iptv.query import QueryError, QueryIndex, Term, country_of, highlight, parse
+from iptv.search import SearchIndex, normalise
+from iptv.store import ChannelStore
+
+
+def name(text):
+    return Term("name", text, None, True)
+
+
+def test_plain_text_is_one_substring():
+    assert parse("  bbc one hd ") == name("bbc one hd")
+    assert parse("") is None
+
+
+def test_fields_operators_and_grouping():
+    node = parse("group:sport -fav:yes (bbc | sky)")
+    assert node == ("and", [
+        Term("group", "sport", None, False),
+        ("not", Term("fav", "yes", None, False)),
+        ("or", [name("bbc"), name("sky")]),
+    ])
+    assert parse("a OR b") == ("or", [name("a"), name("b")])
+    assert parse("NOT a") == ("not", name("a"))
+
+
+def test_quotes_and_patterns():
+    node = parse('"bbc one" name:/hd$/')
+    assert node[1][0] == Term("name", "bbc one", None, False)
+    assert node[1][1].regex.pattern == "hd$"
+    assert parse(r'"say \"hi\"" x')[1][0].text == 'say "hi"'
+
+
+@pytest.mark.parametrize("text", [
+    "group:(news)", "name:|x", "group:)", "(a", "a |", "fav:maybe", "status:zombie",
+    '"open', "/[/ x", "a ) b",
+])
+def test_errors_are_query_errors(text):
+    with pytest.raises(QueryError):
+        parse(text)
+
+
+def test_highlight():
+    assert highlight("group:uk -news bbc") == "bbc"
+    assert highlight("group:(") == ""
+    assert highlight("bbc one") == "bbc one"
+
+
+def test_country_of():
+    assert country_of("UK,IE", "x.fr", "DE | News") == ["uk", "ie"]
+    assert country_of("", "bbcone.uk", "DE | News") == ["uk"]
+    assert country_of("", "", "DE | News") == ["de"]
+    assert country_of("", "", "News") == []
+
+
+# ------- evaluation ----------------------------
+def make_store():
+    store = ChannelStore()
+    channels = []
+    for i in range(300):
+        group = ("UK | Sport", "UK | News", "FR | Films", "")[i % 4]
+        attrs = {"group-title": group} if group else {}
+        if i % 5 == 0:
+            attrs["tvg-country"] = "IE"
+        name_ = f"{('BBC', 'Sky', 'Canal')[i % 3]} {i}{' HD' if i % 2 else ''}"
+        channels.append(Channel(name_, f"http://h{i % 7}/{i}.ts", -1, attrs or None))
+    store.append(channels)
+    for rid in range(0, 300, 6):
+        store.set_fav(rid, True)
+    for rid in range(0, 300, 10):
+        store.set_health(rid, store.DEAD)
+    for rid in range(1, 300, 10):
+        store.set_health(rid, store.ALIVE)
+    return store
+
+
+def brute(store, check):
+    return {rid for rid in store.order if check(rid)}
+
+
+def test_index_matches_brute_force():
+    store = make_store()
+    index = QueryIndex(store, SearchIndex(store.names))
+
+    def country(rid):
+        extra = store.sparse.get(rid)
+        tvg = extra[1].get("tvg-country") if extra and extra[1] else None
+        return country_of(tvg, store.tvg_ids[rid], store.groups[store.group_id[rid]])
+
+    def group(rid):
+        return store.groups[store.group_id[rid]]
+
+    cases = {
+        "bbc": lambda r: "bbc" in normalise(store.names[r]),
+        "group:sport -fav:yes": lambda r: "sport" in normalise(group(r)) and not store.fav[r],
+        "country:ie | country:fr": lambda r: bool({"ie", "fr"} & set(country(r))),
+        "status:dead": lambda r: store.health[r] == store.DEAD,
+        "status:unchecked sky": lambda r: store.health[r] == store.UNCHECKED
+                                          and "sky" in normalise(store.names[r]),
+        "(bbc | canal) name:/hd$/ -group:news": lambda r: (
+            ("bbc" in normalise(store.names[r]) or "canal" in normalise(store.names[r]))
+            and re.search("hd$", store.names[r], re.IGNORECASE)
+            and "news" not in normalise(group(r))),
+        "NOT status:alive": lambda r: store.health[r] != store.ALIVE,
+    }
+    for text, check in cases.items():
+        assert index.search(text) == brute(store, check), text
+
+
+def test_index_follows_appends_and_resets():
+    store = make_store()
+    index = QueryIndex(store, SearchIndex(store.names))
+    assert index.search("group:extra") == set()
+    store.append([Channel("New", "http://n/1", -1, {"group-title": "Extra"})])
+    assert index.search("group:extra") == {300}
+    store.remove_block(0, 9)
+    index.reset()
+    assert len(index.search("-status:dead")) == len(store.order) - len(store.dead)
+
+
+def test_cancelled_scans(monkeypatch):
+    monkeypatch.setattr(search_module, "SCAN_STEP", 10)
+    store = make_store()
+    names = SearchIndex(store.names)
+    assert names.regex(re.compile("bbc", re.I), cancelled=lambda: True) is None
+    assert names.search("hd", cancelled=lambda: True) is None
+    assert len(names.search("hd")) == len(names.regex(re.compile("hd", re.I)))
+    assert QueryIndex(store, names).search("name:/hd/", cancelled=lambda: True) is None
+
+
+def test_columns_swapped_under_the_lock_while_searching():
+    # what PlaylistModel.clear() does while the search thread runs queries
+    store = make_store()
+    names = SearchIndex(store.names)
+    index = QueryIndex(store, names)
+    rows = list(store.rows())
+    errors = []
+    stop = threading.Event()
+
+    def search():
+        while not stop.is_set():
+            try:
+                index.search("group:sport | status:alive | -fav:yes")
+            except Exception as e:
+                errors.append(e)
+                return
+    thread = threading.Thread(target=search)
+    thread.start()
+    for _ in range(300):
+        with index.lock:
+            store.clear()
+            names.reset(store.names)
+            index.reset()
+        store.append(rows)
+    stop.set()
+    thread.join()
+    assert not errors
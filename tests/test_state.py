@@ -0,0 +1,109 @@
+# Simple IPTV thing - tests: snapshot plus journal playlist state
+# github.com/tugbaot/simple-iptv
+
+import json
+
+from iptv.m3u import Channel
+from iptv.state import StateStore, move_list
+from iptv.store import ChannelStore
+
+ROWS = [["A", "http://h/a", False, {"group-title": "G"}],
+        ["B", "http://h/b", True],
+        ["C", "http://h/c", False, {}, 120, ["#EXTVLCOPT:http-user-agent=Foo"]],
+        ["D", "http://h/d", False]]
+
+
+def saved(tmp_path, rows=ROWS, meta=None):
+    state = StateStore(tmp_path / "playlist.json")
+    state.load()
+    state.save(rows, meta or {"show_favourites": False})
+    return state
+
+
+def test_snapshot_round_trip(tmp_path):
+    saved(tmp_path).close()
+    rows, meta = StateStore(tmp_path / "playlist.json").load()
+    assert rows == ROWS
+    assert meta == {"show_favourites": False}
+
+
+def test_journal_replays_on_load(tmp_path):
+    state = saved(tmp_path)
+    state.record(["fav", 0, 1])
+    state.record(["name", 3, "Dee"])
+    state.record(["move", [0], 4])
+    state.record(["meta", "show_favourites", True])
+    state.close()
+
+    again = StateStore(tmp_path / "playlist.json")
+    rows, meta = again.load()
+    assert [row[0] for row in rows] == ["B", "C", "Dee", "A"]
+    assert rows[3][2] is True
+    assert meta["show_favourites"] is True
+    assert again.dirty  # folded into the next snapshot
+
+
+def test_torn_last_line_and_bad_ops_are_skipped(tmp_path):
+    state = saved(tmp_path)
+    state.record(["fav", 1, 0])
+    state.record(["fav", 99, 1])  # a row that doesn't exist
+    state.close()
+    segment = next(tmp_path.glob("playlist.json.journal.*"))
+    with segment.open("a", encoding="utf-8") as f:
+        f.write('["name", 0, "tor')
+    errors = []
+    rows, _ = StateStore(tmp_path / "playlist.json", on_error=lambda *e: errors.append(e)).load()
+    assert rows[1][2] is False
+    assert rows[0][0] == "A"
+    assert errors == [("State journal", "skipped 1 ops that no longer fit the playlist")]
+
+
+def test_reset_stops_replay(tmp_path):
+    state = saved(tmp_path)
+    state.record(["name", 0, "kept"])
+    state.reset()
+    state.record(["name", 0, "after the reset"])
+    state.close()
+    again = StateStore(tmp_path / "playlist.json")
+    rows, _ = again.load()
+    assert rows[0][0] == "kept"
+    assert again.dirty
+
+
+def test_snapshot_claims_only_older_segments(tmp_path):
+    state = saved(tmp_path)
+    state.record(["name", 0, "one"])
+    state.save_async([list(row) for row in ROWS], {})  # rotates before writing
+    state.record(["name", 1, "two"])  # lands in the new segment
+    state.close()
+    rows, _ = StateStore(tmp_path / "playlist.json").load()
+    assert [row[0] for row in rows[:2]] == ["A", "two"]
+    assert json.loads((tmp_path / "playlist.json").read_text("utf-8"))["journal"] == state.gen
+
+
+def test_failed_background_save_is_reported(tmp_path):
+    errors = []
+    state = StateStore(tmp_path / "playlist.json", on_error=lambda *e: errors.append(e))
+    state.save_async([["A", object(), False]], {})  # not JSON
+    state.wait()
+    assert [where for where, _ in errors] == ["State save failed"]
+    assert state.dirty and not (tmp_path / "playlist.json").exists()
+
+
+def test_store_rows_keep_duration_and_extras(tmp_path):
+    channels = [Channel("A", "http://h/a", 120, {"tvg-id": "a.uk"}, ("#EXTVLCOPT:x=y",)),
+                Channel("B", "http://h/b", -1, None, ("#KODIPROP:z",)),
+                Channel("C", "http://h/c")]
+    store = ChannelStore()
+    store.append(channels)
+    saved(tmp_path, list(store.rows())).close()
+    rows, _ = StateStore(tmp_path / "playlist.json").load()
+    restored = ChannelStore()
+    restored.append(rows)
+    assert list(restored.channels()) == channels
+
+
+def test_move_list():
+    rows = list("abcdef")
+    move_list(rows, [4, 1], 3)
+    assert rows == list("acbedf")
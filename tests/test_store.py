@@ -0,0 +1,32 @@
+# Simple IPTV thing - tests: the columnar channel store
+# github.com/tugbaot/simple-iptv
+
+from iptv.m3u import Channel
+from iptv.store import NO_RID, ChannelStore
+
+CHANNELS = [Channel(f"Channel {i}", f"http://h/{i}.ts", -1, {"group-title": f"G{i % 3}"})
+            for i in range(10)]
+CHANNELS[4] = Channel("Four", "http://h/4.ts", 60, {"tvg-id": "four", "x-a": "b"}, ("#EXTVLCOPT:x=y",))
+
+
+def test_compact_drops_tombstones():
+    store = ChannelStore()
+    store.append(CHANNELS)
+    store.move_rows([9], 0)
+    store.set_fav(4, True)
+    store.set_health(6, store.DEAD)
+    store.remove_block(2, 3)  # rids 1 and 2
+    before = list(store.channels())
+    assert store.tombstones() == 2
+
+    remap = store.compact()
+    assert store.tombstones() == 0 and len(store.names) == 8
+    assert list(store.channels()) == before
+    assert list(store.order) == list(range(8))
+    assert remap[1] == remap[2] == NO_RID
+    assert remap[9] == 0 and store.favs == {remap[4]} and store.dead == {remap[6]}
+    assert store.is_fav(remap[4]) and store.health[remap[6]] == store.DEAD
+    assert store.row_of(remap[7]) == 6
+
+    store.append([Channel("New", "http://h/new")])
+    assert store.channel(8) == Channel("New", "http://h/new")
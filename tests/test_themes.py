@@ -0,0 +1,49 @@
+# Simple IPTV thing - tests: the rendered theme cache
+# github.com/tugbaot/simple-iptv
+
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("qt_material")
+pytest.importorskip("jinja2")
+from iptv.themes import ThemeCache
+
+THEMES = Path(__file__).resolve().parent.parent / "themes"
+
+
+@pytest.fixture
+def themes(tmp_path):
+    folder = tmp_path / "themes"
+    folder.mkdir()
+    shutil.copy(THEMES / "amaranth.xml", folder)
+    return folder
+
+
+def test_render_once_then_hit(tmp_path, themes):
+    cache = ThemeCache(tmp_path / "cache", themes, "Roboto", "13px")
+    assert cache.names() == ["amaranth"]
+    assert cache.get("amaranth") is None
+    qss, primary = cache.load("amaranth")
+    entry = tmp_path / "cache" / f"amaranth-{cache.key('amaranth')}"
+    assert json.loads((entry / "theme.json").read_text("utf-8"))["qss"] == qss
+    assert "icon:/" not in qss and (entry / "icons").resolve().as_posix() in qss
+    assert any((entry / "icons").rglob("*.svg"))
+    assert "Roboto" in qss and primary.startswith("#")
+    assert ThemeCache(tmp_path / "cache", themes, "Roboto", "13px").get("amaranth") == (qss, primary)
+
+
+def test_font_change_renders_again_and_prunes(tmp_path, themes):
+    ThemeCache(tmp_path / "cache", themes, "Roboto", "13px").load("amaranth")
+    cache = ThemeCache(tmp_path / "cache", themes, "Arial", "15px")
+    assert cache.get("amaranth") is None
+    qss, _ = cache.load("amaranth")
+    assert "Arial" in qss
+    assert [p.name for p in (tmp_path / "cache").iterdir()] == [f"amaranth-{cache.key('amaranth')}"]
+
+
+def test_missing_theme(tmp_path, themes):
+    with pytest.raises(OSError):
+        ThemeCache(tmp_path / "cache", themes, "Roboto", "13px").load("nope")
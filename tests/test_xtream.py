@@ -0,0 +1,73 @@
+# Simple IPTV thing - tests: Xtream player_api.php against a local stand-in
+# github.com/tugbaot/simple-iptv
+
+import json
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from iptv.xtream import ResponseCache, XtreamClient, XtreamError
+
+CATEGORIES = [{"category_id": "1", "category_name": "UK"}, {"category_id": "2", "category_name": "FR"}]
+STREAMS = {
+    "1": [{"name": "BBC One", "stream_id": 101, "epg_channel_id": "bbc1.uk", "stream_icon": "http://l/1.png"},
+          {"name": "", "stream_id": 102}],
+    "2": [{"name": "TF1", "stream_id": 201}],
+}
+
+
+def player_api(handler):
+    query = {k: v[0] for k, v in parse_qs(urlsplit(handler.path).query).items()}
+    if query.get("password") != "secret":
+        return 200, {}, json.dumps({"user_info": {"auth": 0}}).encode()
+    action = query.get("action")
+    if action is None:
+        data = {"user_info": {"auth": 1, "username": query["username"]}}
+    elif action == "get_live_categories":
+        data = CATEGORIES
+    elif action == "get_live_streams":
+        data = STREAMS.get(query.get("category_id"), [])
+    else:
+        return 200, {}, b"<html>"
+    return 200, {"Content-Type": "application/json"}, json.dumps(data).encode()
+
+
+@pytest.fixture
+def xtream(server):
+    server.routes["/player_api.php"] = player_api
+    return server
+
+
+def test_login(xtream):
+    client = XtreamClient(xtream.url(""), "me", "secret")
+    assert client.authenticate()["username"] == "me"
+    with pytest.raises(XtreamError):
+        XtreamClient(xtream.url(""), "me", "wrong").authenticate()
+
+
+def test_load_live(xtream):
+    client = XtreamClient(xtream.url("/"), "me", "secret", connections=2)
+    batches = list(client.load_live())
+    assert [[ch.name for ch in batch] for batch in batches] == [["BBC One"], ["TF1"]]
+    bbc = batches[0][0]
+    assert bbc.url == xtream.url("/live/me/secret/101.ts")
+    assert bbc.attrs == {"tvg-name": "BBC One", "group-title": "UK", "tvg-id": "bbc1.uk",
+                         "tvg-logo": "http://l/1.png"}
+    assert not client.stale
+    client.close()
+
+
+def test_responses_are_cached_without_the_password(xtream, tmp_path):
+    cache = ResponseCache(tmp_path)
+    first = list(XtreamClient(xtream.url(""), "me", "secret", cache=cache).load_live())
+    asked = len(xtream.requests)
+    client = XtreamClient(xtream.url(""), "me", "secret", cache=cache, ttl=60)
+    assert list(client.load_live()) == first
+    assert len(xtream.requests) == asked  # all from the cache
+    assert client.stale
+    assert b"secret" not in (tmp_path / "index.json").read_bytes()
+
+
+def test_not_json_is_an_xtream_error(xtream):
+    with pytest.raises(XtreamError):
+        XtreamClient(xtream.url(""), "me", "secret").api("get_vod_streams")